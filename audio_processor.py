@@ -102,7 +102,7 @@ def create_pipeline(
 
 
 def process_audio(
-    input_file: str, language: str, task: str, pipeline: Pipeline
+    input_file: str, language: str, task: str, pipeline: Pipeline, timestamps: str = "segment"
 ) -> dict:
     """
     Process the audio file using the provided pipeline.
@@ -112,6 +112,8 @@ def process_audio(
         language (str): Language of the audio.
         task (str): Task to perform ('transcribe' or 'translate').
         pipeline (Pipeline): The speech recognition pipeline.
+        timestamps (str): 'none', 'segment' or 'word'. Word-level alignment
+            is extra work for every chunk, so it is only done when asked for.
 
     Returns:
         dict: The result containing transcriptions and other metadata.
@@ -122,7 +124,7 @@ def process_audio(
     try:
         result = pipeline(
             input_file,
-            return_timestamps="word",
+            return_timestamps={"none": False, "segment": True, "word": "word"}[timestamps],
             generate_kwargs={"language": language, "task": task},
         )
         logging.info(f"Task '{task}' completed successfully")
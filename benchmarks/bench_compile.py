@@ -0,0 +1,123 @@
+# benchmarks/bench_compile.py
+"""
+Compare decoding throughput of the eager and the compiled model.
+
+The windows of the test set are generated once by the eager model and once
+by the model loaded with ``compile=True`` (static KV cache, compiled encoder
+and decoder). The report shows the time spent compiling, which is small when
+the compile cache already holds the kernels, the generated tokens per second
+of each, the speedup and whether the tokens are identical.
+
+Each variant runs in its own process, so the compiled kernels and the eager
+run do not share warm-up state. Without ``--model`` a tiny random checkpoint
+is generated; it measures the code path, not the speedup of a real model,
+whose decoder does far more work per token.
+
+Usage:
+    python -m benchmarks.bench_compile
+    python -m benchmarks.bench_compile --model openai/whisper-large-v3 --device cuda --test-set data/testset/
+"""
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List
+from config.settings import CONFIG
+from benchmarks.bench_precision import make_test_set
+
+
+def run_variant(
+        model: str,
+        device: str,
+        precision: str,
+        compile: bool,
+        files: List[str],
+        language: str,
+        batch_size: int
+) -> Dict[str, Any]:
+    """Decode ``files`` with the eager or the compiled model; runs in a child process."""
+    import logging
+    import torch
+    from benchmarks.bench_speculative import decode_windows
+    from core.chunking import Chunker
+    from core.model_handler import ModelHandler
+
+    logging.basicConfig(level=logging.WARNING)
+
+    start = time.perf_counter()
+    resources = ModelHandler.initialize(model, device, precision, batch_size=batch_size, compile=compile)
+    load_seconds = time.perf_counter() - start
+    # Warm up kernels and allocators outside the timed region
+    decode_windows(resources, files[:1], language, batch_size)
+    decoded = decode_windows(resources, files, language, batch_size)
+    tokens = sum(Chunker.count_generated(resources, row) for row in decoded["tokens"])
+    return {
+        "compile": compile,
+        "load_seconds": round(load_seconds, 3),
+        "decode_seconds": round(decoded["seconds"], 3),
+        "tokens": tokens,
+        "tokens_per_second": round(tokens / decoded["seconds"], 2),
+        "token_ids": [row.tolist() for row in decoded["tokens"]],
+        "torch": torch.__version__,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare eager and compiled decoding throughput")
+    parser.add_argument("--model", help="Model name or path (default: a freshly generated tiny checkpoint)")
+    parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"], default="cpu",
+                        help="Device to benchmark")
+    parser.add_argument("--precision", default=CONFIG['processing'].precision,
+                        help="Inference precision")
+    parser.add_argument("--test-set", nargs="+", help="Audio files, directories or manifests")
+    parser.add_argument("--language", default=CONFIG['processing'].default_language,
+                        help="Language of the test set")
+    parser.add_argument("--batch-size", type=int, default=CONFIG['processing'].batch_size,
+                        help="Windows per generate call")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        model = args.model
+        if not model:
+            from utils.tiny_checkpoint import create_tiny_checkpoint
+            model = str(create_tiny_checkpoint(tmp_dir / "tiny-whisper"))
+
+        if args.test_set:
+            from utils.inputs import InputResolver
+            files = [str(path) for path in InputResolver.resolve(args.test_set)]
+        else:
+            files = [str(path) for path in make_test_set(tmp_dir, [30, 90])]
+
+        runs = []
+        for compile in (False, True):
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                runs.append(executor.submit(
+                    run_variant, model, args.device, args.precision, compile, files, args.language, args.batch_size
+                ).result())
+
+    eager, compiled = runs
+    compiled["speedup"] = round(compiled["tokens_per_second"] / eager["tokens_per_second"], 3)
+    compiled["identical"] = compiled["token_ids"] == eager["token_ids"]
+    for run in runs:
+        del run["token_ids"]
+
+    print(f"{'variant':<10} {'load s':>8} {'decode s':>9} {'tokens':>7} {'tok/s':>9} {'speedup':>8} {'identical':>10}")
+    for run in runs:
+        name = "compiled" if run["compile"] else "eager"
+        speedup = f"{run.get('speedup', 1.0):.2f}x"
+        print(f"{name:<10} {run['load_seconds']:>8.1f} {run['decode_seconds']:>9.2f} {run['tokens']:>7} "
+              f"{run['tokens_per_second']:>9.1f} {speedup:>8} {str(run.get('identical', '-')):>10}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"model": model, "device": args.device, "runs": runs}, indent=2),
+                               encoding='utf-8')
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
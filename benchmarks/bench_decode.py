@@ -0,0 +1,68 @@
+# benchmarks/bench_decode.py
+"""
+Compare the MP3 round-trip decode path against streaming PCM from ffmpeg.
+
+Usage:
+    python -m benchmarks.bench_decode --durations 60 600 --repeat 3
+"""
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+from core.audio_converter import AudioConverter
+
+
+def make_sample(directory: Path, seconds: int, suffix: str) -> Path:
+    """Generate a synthetic stereo 44.1 kHz recording in the requested container."""
+    path = directory / f"sample_{seconds}s{suffix}"
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:sample_rate=44100:duration={seconds}:amplitude=0.05",
+        "-filter_complex", "[0:a][1:a]amerge=inputs=2",
+        str(path)
+    ], check=True)
+    return path
+
+
+def time_decode(path: Path, mode: str, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        AudioConverter.load_audio(path, mode)
+        timings.append(time.perf_counter() - start)
+        # The MP3 path leaves its intermediate file behind; remove it so every
+        # repetition pays the full conversion cost
+        path.with_suffix('.mp3').unlink(missing_ok=True)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark MP3 round-trip vs in-memory PCM decoding")
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 300, 1800],
+                        help="Lengths of the synthetic recordings in seconds")
+    parser.add_argument("--suffix", default=".m4a", help="Container to generate")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per measurement")
+    args = parser.parse_args()
+
+    print(f"{'duration':>9} {'mp3 (s)':>9} {'pcm (s)':>9} {'speedup':>8} {'samples':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for seconds in args.durations:
+            sample = make_sample(directory, seconds, args.suffix)
+            mp3 = statistics.median(time_decode(sample, 'mp3', args.repeat))
+            pcm = statistics.median(time_decode(sample, 'pcm', args.repeat))
+            samples = len(AudioConverter.load_audio(sample, 'pcm'))
+            print(f"{seconds:>8}s {mp3:>9.2f} {pcm:>9.2f} {mp3 / pcm:>7.1f}x {samples:>11}")
+
+            sample.unlink()
+            leftovers = sorted(p.name for p in directory.iterdir())
+            if leftovers:
+                print(f"  unexpected files left behind: {', '.join(leftovers)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/bench_engines.py
+"""
+Compare the inference engines on the same recordings.
+
+Every recording is decoded to PCM once and then transcribed by the
+transformers pipeline, the overlap engine and the direct engine. The report
+shows the seconds each engine spends per recording set, its real-time factor,
+the windows it decodes per second, its speedup over the pipeline and whether
+its results are identical to those of the pipeline.
+
+Each engine runs in its own process, so none of them inherits warm kernels
+or allocator state from another. Without ``--model`` a tiny random checkpoint
+is generated, whose small encoder and decoder leave the per-window overhead of
+each engine a larger share of the time. With a real model most of the time
+goes to ``generate`` and the engines move closer together.
+
+Usage:
+    python -m benchmarks.bench_engines
+    python -m benchmarks.bench_engines --model openai/whisper-large-v3 --device cuda --test-set data/testset/
+"""
+import argparse
+import json
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List
+from config.settings import CONFIG, TIMESTAMP_MODES
+from benchmarks.bench_precision import make_test_set
+
+ENGINES = ("pipeline", "overlap", "direct")
+
+
+def run_engine(
+        model: str,
+        device: str,
+        precision: str,
+        engine: str,
+        files: List[str],
+        language: str,
+        batch_size: int,
+        timestamps: str
+) -> Dict[str, Any]:
+    """Transcribe ``files`` with one engine; runs in a child process."""
+    import logging
+    import torch
+    from core.audio_converter import AudioConverter
+    from core.audio_processor import AudioProcessor
+    from core.chunking import Chunker
+    from core.model_handler import ModelHandler
+
+    logging.basicConfig(level=logging.WARNING)
+
+    resources = ModelHandler.initialize(model, device, precision, batch_size=batch_size)
+    recordings = [AudioConverter.decode_to_pcm(path) for path in files]
+
+    def transcribe(audio) -> Dict[str, Any]:
+        if engine == "pipeline":
+            result = AudioProcessor.process_audio(resources.pipeline, audio, language, "transcribe", timestamps)
+            result.setdefault("chunks", [])
+            return result
+        if engine == "overlap":
+            return AudioProcessor.process_audio_overlapped(
+                resources, audio, language, "transcribe", batch_size=batch_size, timestamps=timestamps
+            )
+        return AudioProcessor.process_audio_direct(
+            resources, audio, language, "transcribe", batch_size=batch_size, timestamps=timestamps
+        )
+
+    # Warm up kernels and allocators outside the timed region
+    transcribe(recordings[0])
+    start = time.perf_counter()
+    results = [transcribe(audio) for audio in recordings]
+    seconds = time.perf_counter() - start
+
+    audio_seconds = sum(len(audio) for audio in recordings) / CONFIG['audio'].sample_rate
+    windows = sum(len(Chunker.window_grid(len(audio))[0]) for audio in recordings)
+    return {
+        "engine": engine,
+        "seconds": round(seconds, 3),
+        "real_time_factor": round(audio_seconds / seconds, 3),
+        "windows": windows,
+        "windows_per_second": round(windows / seconds, 2),
+        "results": [{"text": result["text"], "chunks": [list(chunk.items()) for chunk in result["chunks"]]}
+                    for result in results],
+        "torch": torch.__version__,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the pipeline, overlap and direct inference engines")
+    parser.add_argument("--model", help="Model name or path (default: a freshly generated tiny checkpoint)")
+    parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"], default="cpu",
+                        help="Device to benchmark")
+    parser.add_argument("--precision", default=CONFIG['processing'].precision,
+                        help="Inference precision")
+    parser.add_argument("--test-set", nargs="+", help="Audio files, directories or manifests")
+    parser.add_argument("--language", default=CONFIG['processing'].default_language,
+                        help="Language of the test set")
+    parser.add_argument("--batch-size", type=int, default=CONFIG['processing'].batch_size,
+                        help="Windows per generate call")
+    parser.add_argument("--timestamps", choices=TIMESTAMP_MODES, default=CONFIG['processing'].timestamps,
+                        help="Timestamp granularity")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES),
+                        help="Engines to compare; the first one is the reference")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        model = args.model
+        if not model:
+            from utils.tiny_checkpoint import create_tiny_checkpoint
+            model = str(create_tiny_checkpoint(tmp_dir / "tiny-whisper"))
+
+        if args.test_set:
+            from utils.inputs import InputResolver
+            files = [str(path) for path in InputResolver.resolve(args.test_set)]
+        else:
+            files = [str(path) for path in make_test_set(tmp_dir, [30, 300])]
+
+        runs = []
+        for engine in args.engines:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                runs.append(executor.submit(
+                    run_engine, model, args.device, args.precision, engine, files, args.language,
+                    args.batch_size, args.timestamps
+                ).result())
+
+    reference = runs[0]
+    for run in runs:
+        run["speedup"] = round(reference["seconds"] / run["seconds"], 3)
+        run["identical"] = run["results"] == reference["results"]
+    for run in runs:
+        del run["results"]
+
+    print(f"{'engine':<10} {'seconds':>8} {'RTF':>8} {'windows':>8} {'win/s':>8} {'speedup':>8} {'identical':>10}")
+    for run in runs:
+        print(f"{run['engine']:<10} {run['seconds']:>8.2f} {run['real_time_factor']:>8.1f} {run['windows']:>8} "
+              f"{run['windows_per_second']:>8.1f} {run['speedup']:>7.2f}x {str(run['identical']):>10}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"model": model, "device": args.device, "runs": runs}, indent=2),
+                               encoding='utf-8')
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
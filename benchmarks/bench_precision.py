@@ -0,0 +1,179 @@
+# benchmarks/bench_precision.py
+"""
+Compare inference precisions on speed, memory and word error rate.
+
+Every precision runs in a fresh process so its load time and peak RSS are
+measured in isolation. The test set is a directory or manifest of audio files;
+a ``.txt`` file with the same stem next to an audio file is its reference
+transcript. Files without a reference are scored against the fp32 output, so
+the WER column then shows how far a precision drifts from full precision.
+
+Usage:
+    python -m benchmarks.bench_precision --model openai/whisper-large-v3 --test-set data/testset/
+    python -m benchmarks.bench_precision --precisions fp32 dynamic-int8 --output precision.json
+"""
+import argparse
+import json
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+from config.settings import CONFIG
+
+
+def normalize(text: str) -> List[str]:
+    """Lower-case words with punctuation removed, for scoring."""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference: Sequence[str], hypothesis: Sequence[str]) -> int:
+    """Word-level edit distance (substitutions, insertions and deletions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def make_test_set(directory: Path, durations: Sequence[int]) -> List[Path]:
+    """Generate synthetic recordings when no test set is given; they have no references."""
+    paths = []
+    for seconds in durations:
+        path = directory / f"synthetic_{seconds}s.wav"
+        subprocess.run([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=330:sample_rate=16000:duration={seconds}",
+            "-f", "lavfi", "-i", f"anoisesrc=color=pink:sample_rate=16000:duration={seconds}:amplitude=0.1",
+            "-filter_complex", "amix=inputs=2",
+            str(path)
+        ], check=True)
+        paths.append(path)
+    return paths
+
+
+def run_precision(model: str, device: str, precision: str, files: List[str], language: str) -> Dict[str, Any]:
+    """Transcribe ``files`` at one precision; runs in a child process."""
+    import logging
+    from core.audio_converter import AudioConverter
+    from core.audio_processor import AudioProcessor
+    from core.model_handler import ModelHandler
+    from utils.metrics import peak_rss_bytes
+
+    logging.basicConfig(level=logging.WARNING)
+
+    start = time.perf_counter()
+    resources = ModelHandler.initialize(model, device, precision)
+    load_seconds = time.perf_counter() - start
+    rss_after_load = peak_rss_bytes()
+
+    # Warm up kernels and allocators outside the timed region
+    warmup = AudioConverter.load_audio(files[0])[:CONFIG['audio'].sample_rate * 5]
+    AudioProcessor.process_audio(resources.pipeline, warmup, language, "transcribe")
+
+    hypotheses, audio_seconds, processing_seconds = {}, 0.0, 0.0
+    for path in files:
+        audio = AudioConverter.load_audio(path)
+        start = time.perf_counter()
+        result = AudioProcessor.process_audio(resources.pipeline, audio, language, "transcribe")
+        processing_seconds += time.perf_counter() - start
+        audio_seconds += len(audio) / CONFIG['audio'].sample_rate
+        hypotheses[path] = result["text"]
+
+    return {
+        "precision": resources.precision,
+        "dtype": str(resources.dtype),
+        "load_seconds": round(load_seconds, 3),
+        "audio_seconds": round(audio_seconds, 3),
+        "processing_seconds": round(processing_seconds, 3),
+        "real_time_factor": round(processing_seconds / audio_seconds, 5),
+        "rss_after_load_mb": round(rss_after_load / (1024 * 1024), 1),
+        "peak_rss_mb": round(peak_rss_bytes() / (1024 * 1024), 1),
+        "hypotheses": hypotheses,
+    }
+
+
+def score(hypotheses: Dict[str, str], references: Dict[str, Optional[str]], fallback: Dict[str, str]) -> float:
+    """Corpus WER against the references, or against ``fallback`` where a file has none."""
+    errors = words = 0
+    for path, hypothesis in hypotheses.items():
+        reference = normalize(references[path] if references[path] is not None else fallback[path])
+        errors += word_errors(reference, normalize(hypothesis))
+        words += len(reference)
+    return errors / words if words else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare Whisper inference precisions")
+    parser.add_argument("--model", help="Model name or path (default: a freshly generated tiny checkpoint)")
+    parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"], default="cpu",
+                        help="Device to benchmark")
+    parser.add_argument("--precisions", nargs="+", default=["fp32", "bf16", "dynamic-int8"],
+                        help="Precisions to compare; fp32 is always run as the reference")
+    parser.add_argument("--test-set", nargs="+",
+                        help="Audio files, directories or manifests; sibling .txt files are references")
+    parser.add_argument("--language", default=CONFIG['processing'].default_language,
+                        help="Language of the test set")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    precisions = ["fp32"] + [p for p in args.precisions if p != "fp32"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        if args.model:
+            model = args.model
+        else:
+            from utils.tiny_checkpoint import create_tiny_checkpoint
+            model = str(create_tiny_checkpoint(tmp_dir / "tiny-whisper"))
+
+        if args.test_set:
+            from utils.inputs import InputResolver
+            files = InputResolver.resolve(args.test_set)
+        else:
+            files = make_test_set(tmp_dir, [30, 90])
+        files = [str(path) for path in files]
+
+        references = {}
+        for path in files:
+            reference = Path(path).with_suffix(".txt")
+            references[path] = reference.read_text(encoding='utf-8') if reference.is_file() else None
+
+        runs = []
+        for precision in precisions:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                runs.append(
+                    executor.submit(run_precision, model, args.device, precision, files, args.language).result()
+                )
+
+    baseline = runs[0]
+    print(f"{'precision':<13} {'dtype':<15} {'load s':>7} {'RTF':>8} {'speedup':>8} "
+          f"{'load RSS':>10} {'peak RSS':>10} {'WER':>7}")
+    for run in runs:
+        run["speedup"] = round(baseline["processing_seconds"] / run["processing_seconds"], 3)
+        run["wer"] = round(score(run["hypotheses"], references, baseline["hypotheses"]), 4)
+        print(f"{run['precision']:<13} {run['dtype']:<15} {run['load_seconds']:>7.2f} "
+              f"{run['real_time_factor']:>8.4f} {run['speedup']:>7.2f}x "
+              f"{run['rss_after_load_mb']:>8.0f}MB {run['peak_rss_mb']:>8.0f}MB {run['wer']:>7.2%}")
+
+    missing = sum(reference is None for reference in references.values())
+    if missing:
+        print(f"{missing} of {len(files)} files have no reference transcript; WER is measured against fp32 for them")
+
+    if args.output:
+        args.output.write_text(json.dumps({"model": model, "device": args.device, "runs": runs}, indent=2),
+                               encoding='utf-8')
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_speculative.py
+"""
+Compare speculative decoding against plain greedy decoding.
+
+Every window of the test set is generated once greedily by the main model
+and once with each assistant drafting for it. The report shows the decoding
+time, the speedup over greedy, the assistant's acceptance rate and whether
+the tokens are identical to the greedy ones, which they must always be.
+
+Without ``--model`` a tiny random checkpoint is generated as the main model,
+together with two assistants: a copy of it, which accepts every draft and
+shows the best case, and a smaller checkpoint with different weights, which
+shows the worst case. Neither says anything about a real model pair.
+
+Usage:
+    python -m benchmarks.bench_speculative
+    python -m benchmarks.bench_speculative --model openai/whisper-large-v3 \\
+        --assistants distil-whisper/distil-large-v3 --test-set data/testset/
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import torch
+from config.settings import CONFIG
+from core.audio_converter import AudioConverter
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker
+from core.model_handler import PRECISIONS, ModelHandler, ModelResources
+from benchmarks.bench_precision import make_test_set
+
+
+def decode_windows(
+        resources: ModelResources,
+        files: List[str],
+        language: str,
+        batch_size: int
+) -> Dict[str, Any]:
+    """Generate every window of ``files`` and return the tokens and the time spent generating."""
+    generate_kwargs = AudioProcessor.build_generate_kwargs(language, "transcribe")
+    tokens: List[torch.Tensor] = []
+    seconds = 0.0
+    for path in files:
+        audio = AudioConverter.load_audio(path)
+        windows = list(Chunker.iter_windows(len(audio)))
+        for i in range(0, len(windows), batch_size):
+            features = Chunker.extract_features(resources, [audio[w.start:w.end] for w in windows[i:i + batch_size]])
+            start = time.perf_counter()
+            batch_tokens = Chunker.generate(resources, features, generate_kwargs)
+            seconds += time.perf_counter() - start
+            pad_token_id = resources.model.generation_config.pad_token_id
+            # Strip batch padding so windows compare equal whatever they were batched with
+            tokens.extend(row[row != pad_token_id] for row in batch_tokens)
+    return {"tokens": tokens, "seconds": seconds}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare speculative decoding with greedy decoding")
+    parser.add_argument("--model", help="Main model name or path (default: a freshly generated tiny checkpoint)")
+    parser.add_argument("--assistants", nargs="+",
+                        help="Assistant models to compare (default: tiny checkpoints matching the tiny main model)")
+    parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"], default="cpu",
+                        help="Device to benchmark")
+    parser.add_argument("--precision", choices=PRECISIONS, default=CONFIG['processing'].precision,
+                        help="Inference precision of both models")
+    parser.add_argument("--test-set", nargs="+", help="Audio files, directories or manifests")
+    parser.add_argument("--language", default=CONFIG['processing'].default_language,
+                        help="Language of the test set")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Windows per generate call for greedy decoding; speculative decoding always uses 1")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        model: Optional[str] = args.model
+        assistants = args.assistants
+        if not model:
+            from utils.tiny_checkpoint import create_tiny_checkpoint
+            model = str(create_tiny_checkpoint(tmp_dir / "tiny-main", d_model=64, layers=4))
+            assistants = assistants or [
+                model,
+                str(create_tiny_checkpoint(tmp_dir / "tiny-draft", d_model=16, layers=1, seed=1)),
+            ]
+        if not assistants:
+            parser.error("--assistants is required with --model")
+
+        if args.test_set:
+            from utils.inputs import InputResolver
+            files = [str(path) for path in InputResolver.resolve(args.test_set)]
+        else:
+            files = [str(path) for path in make_test_set(tmp_dir, [30, 90])]
+
+        greedy_resources = ModelHandler.initialize(model, args.device, args.precision)
+        greedy_resources.pipeline.generation_config.num_beams = 1
+        greedy_resources.pipeline.generation_config.do_sample = False
+        # Warm up kernels and allocators outside the timed region
+        decode_windows(greedy_resources, files[:1], args.language, args.batch_size)
+        greedy = decode_windows(greedy_resources, files, args.language, args.batch_size)
+        del greedy_resources
+
+        runs: List[Dict[str, Any]] = [{
+            "assistant": None,
+            "seconds": round(greedy["seconds"], 3),
+            "speedup": 1.0,
+        }]
+        for assistant in assistants:
+            resources = ModelHandler.initialize(model, args.device, args.precision, assistant)
+            decode_windows(resources, files[:1], args.language, 1)
+            before = resources.speculative.snapshot()
+            assisted = decode_windows(resources, files, args.language, 1)
+            stats = resources.speculative.summarize(before, resources.speculative.snapshot())
+            runs.append({
+                "assistant": assistant,
+                "seconds": round(assisted["seconds"], 3),
+                "speedup": round(greedy["seconds"] / assisted["seconds"], 3),
+                "identical": all(torch.equal(a, b) for a, b in zip(assisted["tokens"], greedy["tokens"])),
+                **{key: round(value, 4) if isinstance(value, float) else value for key, value in stats.items()},
+            })
+            del resources
+
+    print(f"{'assistant':<40} {'decode s':>9} {'speedup':>8} {'accepted':>9} {'tok/pass':>9} {'identical':>10}")
+    for run in runs:
+        name = Path(run["assistant"]).name if run["assistant"] else "(greedy)"
+        accepted = f"{run['acceptance_rate']:.0%}" if "acceptance_rate" in run else "-"
+        per_pass = f"{run['tokens_per_main_pass']:.2f}" if "tokens_per_main_pass" in run else "-"
+        identical = str(run.get("identical", "-"))
+        print(f"{name:<40} {run['seconds']:>9.2f} {run['speedup']:>7.2f}x {accepted:>9} {per_pass:>9} {identical:>10}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"model": model, "device": args.device, "runs": runs}, indent=2),
+                               encoding='utf-8')
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
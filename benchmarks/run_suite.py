@@ -0,0 +1,268 @@
+# benchmarks/run_suite.py
+"""
+End-to-end benchmark reporting real-time factor and a per-stage breakdown.
+
+Synthetic recordings of several lengths are run through conversion, feature
+extraction, generation and output writing. Each stage records wall time,
+real-time factor (stage seconds per audio second) and peak RSS. Results are
+written as JSON and can be compared against a stored baseline.
+
+Usage:
+    python -m benchmarks.run_suite --output results.json
+    python -m benchmarks.run_suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_suite --baseline benchmarks/baseline.json --batch-size 8
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+import torch
+import transformers
+from config.settings import CONFIG
+from core.audio_converter import AudioConverter
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker
+from core.model_handler import PRECISIONS, ModelHandler, ModelResources
+from utils.file_handlers import save_results
+from utils.tiny_checkpoint import create_tiny_checkpoint
+
+STAGES = ("conversion", "feature_extraction", "generation", "output_writing")
+
+
+def _current_rss() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is the high-water mark (KiB on Linux, bytes on macOS)
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+class PeakRssSampler:
+    """Sample RSS on a background thread to find the peak within a stage."""
+
+    def __init__(self, interval_s: float = 0.01):
+        self.interval_s = interval_s
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss())
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self) -> "PeakRssSampler":
+        self.peak = _current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+
+
+@contextmanager
+def measure(stages: Dict[str, Dict[str, float]], name: str, audio_seconds: float) -> Iterator[None]:
+    with PeakRssSampler() as sampler:
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+    stages[name] = {
+        "seconds": round(elapsed, 4),
+        "real_time_factor": round(elapsed / audio_seconds, 5),
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 1),
+    }
+
+
+def make_sample(directory: Path, seconds: int) -> Path:
+    """Generate a stereo 44.1 kHz M4A of tone plus noise, so conversion does real work."""
+    path = directory / f"sample_{seconds}s.m4a"
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=44100:duration={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:sample_rate=44100:duration={seconds}:amplitude=0.1",
+        "-filter_complex", "[0:a][1:a]amerge=inputs=2",
+        str(path)
+    ], check=True)
+    return path
+
+
+def run_once(
+        resources: ModelResources,
+        sample: Path,
+        output_dir: Path,
+        batch_size: int,
+        chunk_length_s: float,
+        decode_mode: str
+) -> Dict[str, Any]:
+    """Run one recording through every stage and return its measurements."""
+    stages: Dict[str, Dict[str, float]] = {}
+    duration = float(sample.stem.split("_")[1].rstrip("s"))
+
+    with measure(stages, "conversion", duration):
+        audio = AudioConverter.load_audio(sample, decode_mode)
+    audio_seconds = len(audio) / CONFIG['audio'].sample_rate
+
+    windows = list(Chunker.iter_windows(len(audio), *Chunker.window_parameters(chunk_length_s=chunk_length_s)))
+    batches = [windows[i:i + batch_size] for i in range(0, len(windows), batch_size)]
+    generate_kwargs = AudioProcessor.build_generate_kwargs("en", "transcribe")
+
+    with measure(stages, "feature_extraction", audio_seconds):
+        features = [
+            Chunker.extract_features(resources, [audio[w.start:w.end] for w in batch])
+            for batch in batches
+        ]
+
+    outputs = []
+    with measure(stages, "generation", audio_seconds):
+        for batch, batch_features in zip(batches, features):
+            tokens = Chunker.generate(resources, batch_features, generate_kwargs)
+            outputs.extend((window_tokens, window.stride) for window, window_tokens in zip(batch, tokens))
+        result = Chunker.stitch(resources, outputs)
+
+    with measure(stages, "output_writing", audio_seconds):
+        save_results(result, sample, output_dir / sample.stem, duration=audio_seconds)
+
+    total = sum(stage["seconds"] for stage in stages.values())
+    return {
+        "duration_s": duration,
+        "windows": len(windows),
+        "generated_tokens": int(sum(tokens.numel() for tokens, _ in outputs)),
+        "stages": stages,
+        "total": {
+            "seconds": round(total, 4),
+            "real_time_factor": round(total / audio_seconds, 5),
+            "peak_rss_mb": max(stage["peak_rss_mb"] for stage in stages.values()),
+        },
+    }
+
+
+def compare(
+        results: Dict[str, Any],
+        baseline: Dict[str, Any],
+        tolerance: float,
+        min_delta_s: float
+) -> List[str]:
+    """
+    Return a description of every stage slower than the baseline.
+
+    A stage is flagged when it is more than ``tolerance`` (relative) and more
+    than ``min_delta_s`` (absolute) slower, so that millisecond stages do not
+    trip on timer noise.
+    """
+    regressions = []
+    previous = {run["duration_s"]: run for run in baseline.get("runs", [])}
+    for run in results["runs"]:
+        reference = previous.get(run["duration_s"])
+        if reference is None:
+            continue
+        for name in (*STAGES, "total"):
+            current = run["total"] if name == "total" else run["stages"].get(name)
+            base = reference["total"] if name == "total" else reference["stages"].get(name)
+            if not current or not base or not base["seconds"]:
+                continue
+            ratio = current["seconds"] / base["seconds"]
+            if ratio > 1 + tolerance and current["seconds"] - base["seconds"] > min_delta_s:
+                regressions.append(
+                    f"{run['duration_s']:.0f}s {name}: {current['seconds']:.3f}s vs "
+                    f"baseline {base['seconds']:.3f}s ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end Whisper benchmark with per-stage breakdown")
+    parser.add_argument("--model", help="Model name or path (default: a freshly generated tiny checkpoint)")
+    parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"], default="cpu",
+                        help="Device to benchmark")
+    parser.add_argument("--precision", choices=PRECISIONS, default=CONFIG['processing'].precision,
+                        help="Inference precision")
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 120, 600],
+                        help="Lengths of the synthetic recordings in seconds")
+    parser.add_argument("--batch-size", type=int, default=CONFIG['processing'].batch_size,
+                        help="Windows per generate call")
+    parser.add_argument("--chunk-length", type=float, default=CONFIG['processing'].chunk_length_s,
+                        help="Window length in seconds")
+    parser.add_argument("--decode", choices=["pcm", "mp3"], default=CONFIG['audio'].decode_mode,
+                        help="Decode path used for the conversion stage")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, help="Compare against this results JSON")
+    parser.add_argument("--save-baseline", type=Path, help="Write results JSON as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative slowdown against the baseline before a stage is flagged")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="Ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        model = args.model or str(create_tiny_checkpoint(tmp_dir / "tiny-whisper"))
+        resources = ModelHandler.initialize(model, args.device, args.precision)
+
+        results: Dict[str, Any] = {
+            "meta": {
+                "model": args.model or "tiny-random-whisper",
+                "device": resources.device,
+                "dtype": str(resources.dtype),
+                "precision": resources.precision,
+                "batch_size": args.batch_size,
+                "chunk_length_s": args.chunk_length,
+                "decode_mode": args.decode,
+                "torch": torch.__version__,
+                "transformers": transformers.__version__,
+                "torch_threads": torch.get_num_threads(),
+                "host": platform.node(),
+                "machine": platform.machine(),
+            },
+            "runs": [],
+        }
+
+        # Warm up allocators and kernels so the first measured run is not penalised
+        warmup = make_sample(tmp_dir, 5)
+        run_once(resources, warmup, tmp_dir, args.batch_size, args.chunk_length, args.decode)
+
+        print(f"{'audio':>7} {'stage':<19} {'seconds':>9} {'RTF':>8} {'peak RSS':>10}")
+        for seconds in args.durations:
+            sample = make_sample(tmp_dir, seconds)
+            run = run_once(resources, sample, tmp_dir, args.batch_size, args.chunk_length, args.decode)
+            results["runs"].append(run)
+            for name, stage in [*run["stages"].items(), ("total", run["total"])]:
+                print(f"{seconds:>6}s {name:<19} {stage['seconds']:>9.3f} "
+                      f"{stage['real_time_factor']:>8.4f} {stage['peak_rss_mb']:>8.1f}MB")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.write_text(json.dumps(results, indent=2), encoding='utf-8')
+            print(f"Results written to {path}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        if baseline.get("meta", {}).get("host") != results["meta"]["host"]:
+            print("Warning: baseline was recorded on a different host")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
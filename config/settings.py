@@ -2,20 +2,114 @@
 from dataclasses import dataclass
 from typing import Optional
 
+PRECISIONS = ("auto", "fp32", "bf16", "dynamic-int8")
+OUTPUT_FORMATS = ("vtt", "srt", "json", "tsv", "txt")
+TIMESTAMP_MODES = ("none", "segment", "word")
+
 @dataclass
 class ProcessingConfig:
     chunk_length_s: int = 30
     batch_size: int = 16
     default_language: str = "en"
     default_model: str = "openai/whisper-large-v3"
+    prefetch_files: int = 1
+    engine: str = "pipeline"
+    preprocess_workers: int = 2
+    prefetch_batches: int = 2
+    precision: str = "auto"  # auto, fp32, bf16 or dynamic-int8
+    shards: int = 1  # worker processes that split one recording between them
+    shard_threads: Optional[int] = None  # torch threads per shard worker; None divides the CPU cores
+    share_weights: bool = True  # shard workers use the parent's weights in shared memory instead of loading their own
+    timestamps: str = "segment"  # none, segment or word
+    compile: bool = False  # torch.compile the encoder and decoder, with a static KV cache
+    feature_device: str = "cpu"  # where log-mel features are computed: cpu, or model for the model's device
+    feature_block_windows: int = 16  # windows per STFT when the features of a whole recording are computed
+    # Runaway-decoding guard (core/runaway.py); a window whose text loops is ended early
+    runaway_guard: bool = False  # off by default, since it changes the output of repetitive speech too
+    runaway_max_repeats: int = 4  # repeats in a row of one n-gram that end a window; 0 disables the check
+    runaway_min_tokens: int = 12  # tokens a repeated run must span, so short interjections can repeat
+    runaway_max_ngram: int = 16  # longest n-gram, in tokens, checked for repeats
+    runaway_compression_ratio: float = 2.4  # zlib ratio of a window's text that ends it; 0 disables the check
 
 @dataclass
 class AudioConfig:
     sample_rate: int = 16000
     mono_channels: int = 1
     mp3_bitrate: str = "320k"
+    decode_mode: str = "pcm"
+    pcm_read_size: int = 1 << 20
+    follow_timeout_s: float = 10.0
+    spool_directory: Optional[str] = None  # where --long-file writes decoded PCM; None uses the system temp dir
+    audio_extensions: tuple = (
+        '.wav', '.mp3', '.m4a', '.mov', '.mp4', '.flac', '.ogg', '.opus', '.webm', '.aac'
+    )
+
+@dataclass
+class OutputConfig:
+    formats: tuple = ("vtt", "txt")
+    write_buffer_bytes: int = 1 << 20
+
+@dataclass
+class CacheConfig:
+    enabled: bool = True
+    directory: str = "~/.cache/whisper-gpu/results"
+    max_size_mb: int = 1024
+    journal_directory: str = "~/.cache/whisper-gpu/journals"
+    compile_directory: str = "~/.cache/whisper-gpu/compile"
+    features_enabled: bool = False  # keep the log-mel features of every window on disk for repeat runs
+    feature_directory: str = "~/.cache/whisper-gpu/features"
+    feature_max_size_mb: int = 4096
+    stale_temp_s: int = 3600  # cache temporary files unmodified this long were left by an interrupted run
+
+@dataclass
+class VadConfig:
+    enabled: bool = False
+    frame_ms: int = 30
+    speech_band_hz: tuple = (300, 3400)
+    noise_floor_percentile: float = 10.0
+    energy_margin_db: float = 10.0
+    min_level_db: float = -60.0
+    min_speech_band_ratio: float = 0.3
+    max_flatness: float = 0.5
+    feature_smoothing_ms: int = 150
+    speech_pad_ms: int = 300
+    min_silence_ms: int = 800
+    min_speech_ms: int = 250
+    block_frames: int = 4096
+
+@dataclass
+class TuningConfig:
+    profile_directory: str = "~/.cache/whisper-gpu/profiles"
+    batch_sizes: tuple = (1, 2, 4, 8, 16, 32, 64)
+    probe_batches: int = 2  # batches of synthetic audio timed per candidate batch size
+    memory_headroom: float = 0.9  # fraction of device memory a candidate may use
+    min_gain: float = 0.05  # a larger batch must be this much faster to be chosen
+
+@dataclass
+class ServerConfig:
+    host: str = "127.0.0.1"
+    port: int = 8000
+    socket_path: Optional[str] = None
+    path_root: Optional[str] = None  # directory that JSON {"path": ...} requests may read from; None disables them
+    max_batch_wait_ms: int = 50
+    latency_window: int = 1000
+
+@dataclass
+class IndexConfig:
+    database: str = "~/.cache/whisper-gpu/transcripts.sqlite3"
+    batch_files: int = 200  # VTT files imported per transaction
+    search_limit: int = 50
+    # Words of --timestamps word results are indexed as segments: a sentence end, a pause or the length ends one
+    word_segment_gap_s: float = 1.0
+    word_segment_max_s: float = 10.0
 
 CONFIG = {
     "processing": ProcessingConfig(),
     "audio": AudioConfig(),
+    "output": OutputConfig(),
+    "cache": CacheConfig(),
+    "vad": VadConfig(),
+    "tuning": TuningConfig(),
+    "server": ServerConfig(),
+    "index": IndexConfig(),
 }
@@ -1,9 +1,16 @@
 # core/audio_converter.py
 from pathlib import Path
-from typing import Union
+from typing import Iterator, Optional, Union
+import mmap
+import os
 import subprocess
 import logging
+import tempfile
+import weakref
+import numpy as np
+from transformers.pipelines.audio_utils import ffmpeg_read
 from config.settings import CONFIG
+from utils.metrics import METRICS
 
 logger = logging.getLogger(__name__)
 
@@ -13,16 +20,275 @@ class AudioConverter:
         """Ensure audio file compatibility with proper error handling."""
         input_path = Path(input_path)
 
+        with METRICS.span("audio_convert", input=str(input_path)):
+            if not input_path.exists():
+                raise FileNotFoundError(f"Input file not found: {input_path}")
+
+            if input_path.suffix.lower() in {'.wav', '.mp3'}:
+                return input_path
+
+            if input_path.suffix.lower() in {'.m4a', '.mov'}:
+                return AudioConverter.convert_to_mp3(input_path)
+
+            raise ValueError(f"Unsupported audio format: {input_path.suffix}")
+
+    @staticmethod
+    def load_audio(input_path: Union[str, Path], mode: Optional[str] = None) -> np.ndarray:
+        """
+        Decode an input file to mono float32 samples at the configured sample rate.
+
+        Args:
+            input_path: Path to the audio or video file
+            mode: 'pcm' streams samples straight from ffmpeg; 'mp3' converts
+                to an intermediate MP3 first; 'mapped' decodes to a raw PCM file
+                on disk and memory-maps it. Defaults to the configured mode.
+
+        Returns:
+            1-D float32 array of samples
+        """
+        mode = mode or CONFIG['audio'].decode_mode
+
+        if mode not in ('pcm', 'mp3', 'mapped'):
+            raise ValueError(f"Unknown decode mode: {mode}")
+
+        with METRICS.span("audio_decode", input=str(input_path), mode=mode) as span:
+            if mode == 'pcm':
+                audio = AudioConverter.decode_to_pcm(input_path)
+            elif mode == 'mapped':
+                audio = AudioConverter.decode_to_mapped_pcm(input_path)
+            else:
+                compatible_path = AudioConverter.ensure_compatible_audio(input_path)
+                try:
+                    audio = ffmpeg_read(compatible_path.read_bytes(), CONFIG['audio'].sample_rate)
+                except ValueError as e:
+                    logger.error(f"Failed to decode {compatible_path}: {str(e)}")
+                    raise RuntimeError(f"Audio decoding failed: {str(e)}") from e
+
+            span["audio_seconds"] = round(len(audio) / CONFIG['audio'].sample_rate, 3)
+            return audio
+
+    @staticmethod
+    def decode_bytes(payload: bytes) -> np.ndarray:
+        """Decode an in-memory audio file of any container ffmpeg can read."""
+        with METRICS.span("audio_decode", input="<bytes>", bytes=len(payload)) as span:
+            try:
+                audio = ffmpeg_read(payload, CONFIG['audio'].sample_rate)
+            except ValueError as e:
+                logger.error(f"Failed to decode audio payload: {str(e)}")
+                raise RuntimeError(f"Audio decoding failed: {str(e)}") from e
+            span["audio_seconds"] = round(len(audio) / CONFIG['audio'].sample_rate, 3)
+            return audio
+
+    @staticmethod
+    def decode_to_pcm(input_path: Union[str, Path]) -> np.ndarray:
+        """
+        Decode any container ffmpeg can read into an in-memory PCM buffer.
+
+        ffmpeg resamples and downmixes to raw float32 on stdout, which is read in
+        blocks into a growing buffer, so nothing is written to disk.
+        """
+        input_path = Path(input_path)
+
         if not input_path.exists():
             raise FileNotFoundError(f"Input file not found: {input_path}")
 
-        if input_path.suffix.lower() in {'.wav', '.mp3'}:
-            return input_path
+        config = CONFIG['audio']
+
+        ffmpeg_command = [
+            "ffmpeg", "-nostdin",
+            "-i", str(input_path),
+            "-vn",
+            "-ac", str(config.mono_channels),
+            "-ar", str(config.sample_rate),
+            "-f", "f32le",
+            "-hide_banner",
+            "-loglevel", "error",
+            "pipe:1"
+        ]
+
+        buffer = bytearray()
+        try:
+            logger.info(f"Decoding {input_path} to PCM")
+            with subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+                while True:
+                    block = process.stdout.read(config.pcm_read_size)
+                    if not block:
+                        break
+                    buffer += block
+                stderr = process.stderr.read()
+        except FileNotFoundError as e:
+            raise EnvironmentError("ffmpeg is not installed or not found in the system's PATH") from e
+
+        if process.returncode != 0 or not buffer:
+            error_msg = stderr.decode(errors='replace').strip() or f"ffmpeg exited with code {process.returncode}"
+            logger.error(f"FFmpeg decoding failed: {error_msg}")
+            raise RuntimeError(f"Audio decoding failed: {error_msg}")
+
+        # f32le output is always a whole number of samples; trim defensively anyway
+        usable = len(buffer) - len(buffer) % 4
+        return np.frombuffer(buffer, dtype=np.float32, count=usable // 4)
+
+    @staticmethod
+    def decode_to_mapped_pcm(
+            input_path: Union[str, Path],
+            spool_directory: Optional[Union[str, Path]] = CONFIG['audio'].spool_directory
+    ) -> np.memmap:
+        """
+        Decode to a raw float32 file on disk and return it memory-mapped read-only.
+
+        Samples are paged in from the file as windows are sliced, so memory use
+        does not grow with the length of the recording. The spool file is
+        removed as soon as it is mapped and disappears with the last reference
+        to the returned array.
+
+        Args:
+            input_path: Path to the audio or video file
+            spool_directory: Directory for the spool file; None uses the system temp dir
+
+        Returns:
+            1-D float32 ``np.memmap`` of samples
+        """
+        input_path = Path(input_path)
+
+        if not input_path.exists():
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+
+        config = CONFIG['audio']
+        fd, spool_name = tempfile.mkstemp(suffix=".f32", prefix="whisper-", dir=spool_directory)
+        os.close(fd)
+        spool_path = Path(spool_name)
+
+        ffmpeg_command = [
+            "ffmpeg", "-nostdin", "-y",
+            "-i", str(input_path),
+            "-vn",
+            "-ac", str(config.mono_channels),
+            "-ar", str(config.sample_rate),
+            "-f", "f32le",
+            "-hide_banner",
+            "-loglevel", "error",
+            str(spool_path)
+        ]
+
+        try:
+            logger.info(f"Decoding {input_path} to mapped PCM at {spool_path}")
+            subprocess.run(ffmpeg_command, check=True, capture_output=True)
+            if spool_path.stat().st_size < 4:
+                raise RuntimeError("Audio decoding failed: no samples decoded")
+            audio = np.memmap(spool_path, dtype=np.float32, mode='r')
+        except FileNotFoundError as e:
+            spool_path.unlink(missing_ok=True)
+            raise EnvironmentError("ffmpeg is not installed or not found in the system's PATH") from e
+        except subprocess.CalledProcessError as e:
+            spool_path.unlink(missing_ok=True)
+            error_msg = e.stderr.decode(errors='replace').strip() if e.stderr else str(e)
+            logger.error(f"FFmpeg decoding failed: {error_msg}")
+            raise RuntimeError(f"Audio decoding failed: {error_msg}") from e
+        except Exception:
+            spool_path.unlink(missing_ok=True)
+            raise
+
+        # Windows are read front to back; let the kernel read ahead and drop pages behind
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            audio._mmap.madvise(mmap.MADV_SEQUENTIAL)
+
+        try:
+            spool_path.unlink()
+        except OSError:
+            # Open files cannot be removed on Windows; remove it once the mapping is closed
+            weakref.finalize(audio._mmap, spool_path.unlink, missing_ok=True)
+        return audio
+
+    @staticmethod
+    def release_mapped(audio: np.ndarray, end_sample: int) -> None:
+        """
+        Drop the resident pages of a mapped array before ``end_sample``.
+
+        A no-op for in-memory arrays. The pages are read back from the file if
+        they are accessed again, so this never changes the samples.
+        """
+        if not isinstance(audio, np.memmap) or audio._mmap is None or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        length = (audio.offset + end_sample * audio.itemsize) // mmap.PAGESIZE * mmap.PAGESIZE
+        if length > 0:
+            audio._mmap.madvise(mmap.MADV_DONTNEED, 0, min(length, len(audio._mmap)))
+
+    @staticmethod
+    def stream_pcm(
+            source: Optional[Union[str, Path]] = None,
+            follow: bool = False,
+            block_seconds: float = 1.0
+    ) -> Iterator[np.ndarray]:
+        """
+        Yield PCM blocks as ffmpeg decodes them, for near-live processing.
+
+        Args:
+            source: File to read; None or '-' reads the process's stdin
+            follow: Keep reading a file that is still being written, until it
+                stops growing for ``CONFIG['audio'].follow_timeout_s``
+            block_seconds: Duration of each yielded block
+
+        Yields:
+            1-D float32 arrays of mono samples at the configured sample rate
+        """
+        config = CONFIG['audio']
+        from_stdin = source is None or str(source) == '-'
+
+        if from_stdin:
+            input_args = ["-i", "pipe:0"]
+        elif follow:
+            # The file protocol can retry at EOF; rw_timeout ends the stream once writes stop
+            input_args = [
+                "-follow", "1",
+                "-rw_timeout", str(int(config.follow_timeout_s * 1_000_000)),
+                "-i", f"file:{source}"
+            ]
+        else:
+            if not Path(source).exists():
+                raise FileNotFoundError(f"Input file not found: {source}")
+            input_args = ["-i", str(source)]
+
+        ffmpeg_command = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            *input_args,
+            "-vn",
+            "-ac", str(config.mono_channels),
+            "-ar", str(config.sample_rate),
+            "-f", "f32le",
+            "pipe:1"
+        ]
+        block_bytes = int(block_seconds * config.sample_rate) * 4
+
+        try:
+            process = subprocess.Popen(
+                ffmpeg_command,
+                stdin=None if from_stdin else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except FileNotFoundError as e:
+            raise EnvironmentError("ffmpeg is not installed or not found in the system's PATH") from e
+
+        with process:
+            pending = b""
+            while True:
+                block = process.stdout.read(block_bytes)
+                if not block:
+                    break
+                block = pending + block
+                usable = len(block) - len(block) % 4
+                pending = block[usable:]
+                if usable:
+                    yield np.frombuffer(block[:usable], dtype=np.float32)
 
-        if input_path.suffix.lower() in {'.m4a', '.mov'}:
-            return AudioConverter.convert_to_mp3(input_path)
+            stderr = process.stderr.read()
+            process.wait()
 
-        raise ValueError(f"Unsupported audio format: {input_path.suffix}")
+        # A followed file ends through rw_timeout, which ffmpeg reports as an error
+        if process.returncode != 0 and not follow:
+            error_msg = stderr.decode(errors='replace').strip() or f"ffmpeg exited with code {process.returncode}"
+            logger.error(f"FFmpeg decoding failed: {error_msg}")
+            raise RuntimeError(f"Audio decoding failed: {error_msg}")
 
     @staticmethod
     def convert_to_mp3(input_path: Path) -> Path:
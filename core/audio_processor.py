@@ -1,48 +1,165 @@
 # core/audio_processor.py
-from typing import Dict, Any, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing, nullcontext
+from pathlib import Path
+from typing import Callable, Deque, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
 import torch
 from transformers import Pipeline
 import logging
 from config.settings import CONFIG
+from core.audio_converter import AudioConverter
+from core.chunking import RETURN_TIMESTAMPS, Chunker, StreamingStitcher, Window, WindowFeatures
+from core.model_handler import ModelResources
+from core.variants import SharedEncoder, Variant
+from utils.feature_cache import FeatureCache
+from utils.journal import ChunkJournal
+from utils.metrics import METRICS
 
 logger = logging.getLogger(__name__)
 
 class AudioProcessor:
+    @staticmethod
+    def build_generate_kwargs(language: str, task: str) -> Dict[str, Any]:
+        """Generation arguments passed to the model for every chunk."""
+        return {"language": language, "task": task}
+
     @staticmethod
     def process_audio(
             pipeline: Pipeline,
-            audio_path: str,
+            audio: Union[str, Path, np.ndarray],
             language: str,
             task: str,
+            timestamps: str = CONFIG['processing'].timestamps,
             **kwargs
     ) -> Dict[str, Any]:
         """
-        Process audio file using the provided pipeline.
+        Process audio using the provided pipeline.
 
         Args:
             pipeline: Initialized transformers Pipeline
-            audio_path: Path to the audio file
+            audio: Path to the audio file or decoded mono samples at the configured sample rate
             language: Language code for processing
             task: Task type (transcribe or translate)
+            timestamps: "none" skips timestamp tokens, "segment" returns segments
+                and "word" adds word alignment and returns words
             **kwargs: Additional arguments for the pipeline
 
         Returns:
             Dictionary containing processing results
         """
         try:
-            logger.info(f"Processing audio file: {audio_path}")
-            logger.info(f"Task: {task}, Language: {language}")
+            with METRICS.span("inference", engine="pipeline", language=language, task=task) as span:
+                if isinstance(audio, np.ndarray):
+                    audio_seconds = len(audio) / CONFIG['audio'].sample_rate
+                    logger.info(f"Processing {audio_seconds:.1f}s of decoded audio")
+                    inputs = {"raw": audio, "sampling_rate": CONFIG['audio'].sample_rate}
+                    span["audio_seconds"] = round(audio_seconds, 3)
+                    METRICS.increment("audio_seconds", audio_seconds)
+                else:
+                    logger.info(f"Processing audio file: {audio}")
+                    inputs = str(audio)
+                logger.info(f"Task: {task}, Language: {language}")
 
-            with open(audio_path, 'rb') as audio_file:
                 result = pipeline(
-                    audio_file,
-                    return_timestamps=True,
-                    generate_kwargs={
-                        "language": language,
-                        "task": task
-                    },
+                    inputs,
+                    return_timestamps=RETURN_TIMESTAMPS[timestamps],
+                    generate_kwargs=AudioProcessor.build_generate_kwargs(language, task),
                     **kwargs
                 )
+                result.setdefault("chunks", [])
+
+                # The pipeline does not expose the generated ids; count the tokens of the stitched output
+                tokens = len(pipeline.tokenizer(result["text"], add_special_tokens=False).input_ids) \
+                    + 2 * len(result.get("chunks", []))
+                span["tokens"] = tokens
+                METRICS.increment("tokens_generated", tokens)
+
+            logger.info("Audio processing completed successfully")
+            return result
+
+        except Exception as e:
+            logger.error(f"Error processing audio: {str(e)}")
+            raise RuntimeError(f"Audio processing failed: {str(e)}") from e
+
+    @staticmethod
+    def process_audio_direct(
+            resources: ModelResources,
+            audio: np.ndarray,
+            language: str,
+            task: str,
+            batch_size: int = CONFIG['processing'].batch_size,
+            timestamps: str = CONFIG['processing'].timestamps,
+            feature_cache: Optional[FeatureCache] = None
+    ) -> Dict[str, Any]:
+        """
+        Process decoded audio by driving the model directly, without the transformers pipeline.
+
+        The window layout is computed as arrays, so there is no per-chunk
+        iteration, dataloader or stride bookkeeping of the pipeline. Each batch
+        gets one call to the model's front end, or a read from
+        ``feature_cache``, and one ``generate`` call, so memory does not grow
+        with the length of the recording. Segments are stitched from the timestamp
+        tokens as each batch finishes, by the same rules as the pipeline; word
+        and untimed results use the tokenizer's stitching. The windows and
+        generation settings are those of the pipeline, so the result has the
+        same ``{'text', 'chunks'}`` shape and content.
+
+        Args:
+            resources: Initialized model resources
+            audio: Decoded mono samples at the configured sample rate
+            language: Language code for processing
+            task: Task type (transcribe or translate)
+            batch_size: Windows per generate call
+            timestamps: "none", "segment" or "word"
+            feature_cache: Cache of the log-mel features of earlier runs on the same audio
+
+        Returns:
+            Dictionary containing processing results
+        """
+        try:
+            audio_seconds = len(audio) / CONFIG['audio'].sample_rate
+            logger.info(f"Processing {audio_seconds:.1f}s of decoded audio")
+            logger.info(f"Task: {task}, Language: {language}")
+
+            starts, ends, lefts, rights = Chunker.window_grid(len(audio))
+            windows = [
+                Window(i, start, end, (end - start, left, right), i == len(starts) - 1)
+                for i, (start, end, left, right) in enumerate(zip(
+                    starts.tolist(), ends.tolist(), lefts.tolist(), rights.tolist()
+                ))
+            ]
+            generate_kwargs = AudioProcessor.build_generate_kwargs(language, task)
+            stitcher = StreamingStitcher(resources) if timestamps == "segment" else None
+
+            with METRICS.span("inference", engine="direct", language=language, task=task,
+                              audio_seconds=round(audio_seconds, 3)) as span:
+                segments: List[Dict[str, Any]] = []
+                outputs: List[Tuple] = []
+                tokens = 0
+                with closing(WindowFeatures(resources, audio, windows, feature_cache)) as source:
+                    for offset in range(0, len(windows), batch_size):
+                        batch = windows[offset:offset + batch_size]
+                        # Per batch, so only one batch of features is ever held in memory
+                        batch_features = source.extract(batch)
+                        batch_outputs = Chunker.decode(resources, batch_features, batch, generate_kwargs, timestamps)
+                        tokens += sum(Chunker.count_generated(resources, output[0]) for output in batch_outputs)
+                        if stitcher is None:
+                            outputs.extend(batch_outputs)
+                            continue
+                        for window_tokens, stride in batch_outputs:
+                            segments.extend(stitcher.feed(window_tokens, stride))
+
+                if stitcher is not None:
+                    segments.extend(stitcher.finish())
+                    result = {"text": "".join(segment["text"] for segment in segments), "chunks": segments}
+                elif outputs:
+                    result = Chunker.stitch(resources, outputs, timestamps)
+                else:
+                    result = {"text": "", "chunks": []}
+                span["tokens"] = tokens
+                METRICS.increment("audio_seconds", audio_seconds)
 
             logger.info("Audio processing completed successfully")
             return result
@@ -50,3 +167,315 @@ class AudioProcessor:
         except Exception as e:
             logger.error(f"Error processing audio: {str(e)}")
             raise RuntimeError(f"Audio processing failed: {str(e)}") from e
+
+    @staticmethod
+    def process_audio_overlapped(
+            resources: ModelResources,
+            audio: np.ndarray,
+            language: str,
+            task: str,
+            batch_size: int = CONFIG['processing'].batch_size,
+            workers: int = CONFIG['processing'].preprocess_workers,
+            prefetch_batches: int = CONFIG['processing'].prefetch_batches,
+            release: Optional[Callable[[int], None]] = None,
+            journal: Optional[ChunkJournal] = None,
+            timestamps: str = CONFIG['processing'].timestamps,
+            feature_cache: Optional[FeatureCache] = None
+    ) -> Dict[str, Any]:
+        """
+        Process decoded audio with feature extraction overlapped with inference.
+
+        A pool of worker threads slices windows and computes log-mel features
+        for upcoming batches while the calling thread runs ``generate`` on the
+        current one. At most ``prefetch_batches`` feature batches wait ahead of
+        the model, which bounds the extra memory. The windows, generation
+        settings and stitching are those of the pipeline, so the result has the
+        same ``{'text', 'chunks'}`` shape and content.
+
+        Args:
+            resources: Initialized model resources
+            audio: Decoded mono samples at the configured sample rate
+            language: Language code for processing
+            task: Task type (transcribe or translate)
+            batch_size: Windows per generate call
+            workers: Feature extraction threads
+            prefetch_batches: Feature batches prepared ahead of the model
+            release: Called with the first sample any remaining window still
+                needs, each time a batch reaches the model
+            journal: Journal of the windows already decoded by an earlier run of
+                this job; those are skipped and new ones are recorded in it
+            timestamps: "none", "segment" or "word"
+            feature_cache: Cache of the log-mel features of earlier runs on the same audio
+
+        Returns:
+            Dictionary containing processing results
+        """
+        return AudioProcessor.process_audio_variants(
+            resources,
+            audio,
+            [Variant(language, task)],
+            batch_size=batch_size,
+            workers=workers,
+            prefetch_batches=prefetch_batches,
+            release=release,
+            journals=[journal],
+            timestamps=timestamps,
+            feature_cache=feature_cache
+        )[0]
+
+    @staticmethod
+    def process_audio_variants(
+            resources: ModelResources,
+            audio: np.ndarray,
+            variants: Sequence[Variant],
+            batch_size: int = CONFIG['processing'].batch_size,
+            workers: int = CONFIG['processing'].preprocess_workers,
+            prefetch_batches: int = CONFIG['processing'].prefetch_batches,
+            release: Optional[Callable[[int], None]] = None,
+            journals: Optional[Sequence[Optional[ChunkJournal]]] = None,
+            timestamps: str = CONFIG['processing'].timestamps,
+            feature_cache: Optional[FeatureCache] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Decode the windows of ``audio`` once for every variant, encoding each window once.
+
+        Features are prepared ahead of the model as in
+        :meth:`process_audio_overlapped`. Every batch of windows is then
+        decoded for each variant in turn inside a :class:`SharedEncoder`, so
+        the log-mel features and the encoder pass of a window serve every
+        language and task; only the decoder runs once per variant.
+
+        Args:
+            resources: Initialized model resources
+            audio: Decoded mono samples at the configured sample rate
+            variants: Languages and tasks to decode
+            batch_size: Windows per generate call
+            workers: Feature extraction threads
+            prefetch_batches: Feature batches prepared ahead of the model
+            release: Called with the first sample any remaining window still
+                needs, each time a batch reaches the model
+            journals: Journal of each variant, or None; windows a journal
+                already holds are not decoded again for its variant
+            timestamps: "none", "segment" or "word"
+            feature_cache: Cache of the log-mel features of earlier runs on the
+                same audio; windows are read from it instead of being computed
+
+        Returns:
+            One result dictionary per variant, in the order of ``variants``
+        """
+        try:
+            audio_seconds = len(audio) / CONFIG['audio'].sample_rate
+            logger.info(
+                f"Processing {audio_seconds:.1f}s of decoded audio "
+                f"with {workers} preprocessing workers"
+            )
+            for variant in variants:
+                logger.info(f"Task: {variant.task}, Language: {variant.language}")
+
+            windows = list(Chunker.iter_windows(len(audio)))
+            journals = list(journals) if journals is not None else [None] * len(variants)
+            outputs: List[Dict[int, Tuple]] = []
+            for journal in journals:
+                done: Dict[int, Tuple] = {}
+                if journal is not None:
+                    for index, (tokens, stride, *timings) in journal.load().items():
+                        done[index] = (torch.tensor(tokens), stride, *map(torch.tensor, timings))
+                    if done:
+                        logger.info(
+                            f"Resuming from {journal.path}: {len(done)} of {len(windows)} windows already decoded"
+                        )
+                outputs.append(done)
+            remaining = [w for w in windows if any(w.index not in done for done in outputs)]
+            batches = [remaining[i:i + batch_size] for i in range(0, len(remaining), batch_size)]
+            generate_kwargs = [AudioProcessor.build_generate_kwargs(v.language, v.task) for v in variants]
+
+            with METRICS.span("inference", engine="overlap",
+                              language=",".join(dict.fromkeys(v.language for v in variants)),
+                              task=",".join(dict.fromkeys(v.task for v in variants)),
+                              audio_seconds=round(audio_seconds, 3)) as span, \
+                    closing(WindowFeatures(resources, audio, windows, feature_cache if remaining else None,
+                                           release)) as source, \
+                    ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="features") as executor:
+                pending: Deque[Future] = deque()
+                queued = iter(batches)
+
+                def schedule_next() -> None:
+                    batch = next(queued, None)
+                    if batch is not None:
+                        pending.append(executor.submit(source.extract, batch))
+
+                for _ in range(max(prefetch_batches, 1)):
+                    schedule_next()
+
+                for index, batch in enumerate(batches):
+                    features = pending.popleft().result()
+                    schedule_next()
+                    if release is not None and index + 1 < len(batches):
+                        release(batches[index + 1][0].start)
+                    with SharedEncoder(resources.model) if len(variants) > 1 else nullcontext():
+                        for done, journal, kwargs in zip(outputs, journals, generate_kwargs):
+                            rows = [i for i, window in enumerate(batch) if window.index not in done]
+                            if not rows:
+                                continue
+                            todo = [batch[i] for i in rows]
+                            if len(rows) < len(batch):
+                                variant_features = {name: value[rows] for name, value in features.items()}
+                            else:
+                                variant_features = features
+                            batch_outputs = Chunker.decode(resources, variant_features, todo, kwargs, timestamps)
+                            for window, output in zip(todo, batch_outputs):
+                                done[window.index] = output
+                            if journal is not None:
+                                journal.append([
+                                    (window.index, output[0].tolist(), output[1], *(t.tolist() for t in output[2:]))
+                                    for window, output in zip(todo, batch_outputs)
+                                ])
+
+                results = []
+                tokens = 0
+                for done in outputs:
+                    ordered = [done[index] for index in sorted(done)]
+                    results.append(
+                        Chunker.stitch(resources, ordered, timestamps) if ordered else {"text": "", "chunks": []}
+                    )
+                    tokens += sum(Chunker.count_generated(resources, output[0]) for output in ordered)
+                span["tokens"] = tokens
+                METRICS.increment("audio_seconds", audio_seconds)
+            logger.info("Audio processing completed successfully")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error processing audio: {str(e)}")
+            raise RuntimeError(f"Audio processing failed: {str(e)}") from e
+
+    @staticmethod
+    def process_long_audio(
+            resources: ModelResources,
+            audio: np.memmap,
+            variants: Sequence[Variant],
+            batch_size: int = CONFIG['processing'].batch_size,
+            workers: int = CONFIG['processing'].preprocess_workers,
+            prefetch_batches: int = CONFIG['processing'].prefetch_batches,
+            journals: Optional[Sequence[Optional[ChunkJournal]]] = None,
+            timestamps: str = CONFIG['processing'].timestamps,
+            feature_cache: Optional[FeatureCache] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Process a memory-mapped recording with memory bounded by the batch size.
+
+        Windows are sliced from the mapped PCM file only when their batch is
+        prepared, and pages behind the model are dropped again, so only the
+        feature batches in flight are resident whatever the duration. The
+        windows and stitching are those of the pipeline.
+
+        Args:
+            resources: Initialized model resources
+            audio: Samples returned by ``AudioConverter.decode_to_mapped_pcm``
+            variants: Languages and tasks to decode
+            batch_size: Windows per generate call
+            workers: Feature extraction threads
+            prefetch_batches: Feature batches prepared ahead of the model
+            journals: Journal of each variant from an earlier run of this job, or None
+            timestamps: "none", "segment" or "word"
+            feature_cache: Cache of the log-mel features of earlier runs on the same audio
+
+        Returns:
+            One result dictionary per variant
+        """
+        # Pages touched before inference (cache key, VAD) are not needed again
+        AudioConverter.release_mapped(audio, len(audio))
+        results = AudioProcessor.process_audio_variants(
+            resources,
+            audio,
+            variants,
+            batch_size=batch_size,
+            workers=workers,
+            prefetch_batches=prefetch_batches,
+            release=lambda end_sample: AudioConverter.release_mapped(audio, end_sample),
+            journals=journals,
+            timestamps=timestamps,
+            feature_cache=feature_cache
+        )
+        AudioConverter.release_mapped(audio, len(audio))
+        return results
+
+    @staticmethod
+    def stream_segments(
+            resources: ModelResources,
+            blocks: Iterable[np.ndarray],
+            language: str,
+            task: str,
+            batch_size: int = CONFIG['processing'].batch_size
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Transcribe a stream of PCM blocks, yielding segments as soon as they are final.
+
+        Windows are laid out exactly as in the batch path. A window runs once
+        audio past its end has arrived (or the stream ends), and segments are
+        stitched incrementally, so output matches ``process_audio`` on the same
+        audio. Only the samples still needed by upcoming windows are kept.
+
+        Args:
+            resources: Initialized model resources
+            blocks: Iterable of 1-D float32 sample arrays at the configured rate
+            language: Language code for processing
+            task: Task type (transcribe or translate)
+            batch_size: Maximum number of ready windows decoded together
+
+        Yields:
+            Segments as ``{'timestamp': (start, end), 'text': str}``
+        """
+        chunk_len, stride_left, stride_right = Chunker.window_parameters()
+        step = chunk_len - stride_left - stride_right
+        generate_kwargs = AudioProcessor.build_generate_kwargs(language, task)
+        stitcher = StreamingStitcher(resources)
+
+        buffer = np.zeros(0, dtype=np.float32)
+        buffer_start = 0  # absolute sample index of buffer[0]
+        next_index = 0
+
+        def run(windows: List[Window]) -> Iterator[Dict[str, Any]]:
+            for offset in range(0, len(windows), batch_size):
+                batch = windows[offset:offset + batch_size]
+                features = Chunker.extract_features(
+                    resources,
+                    [buffer[w.start - buffer_start:w.end - buffer_start] for w in batch]
+                )
+                tokens = Chunker.generate(resources, features, generate_kwargs)
+                for window, window_tokens in zip(batch, tokens):
+                    yield from stitcher.feed(window_tokens, window.stride)
+
+        try:
+            for block in blocks:
+                buffer = np.concatenate([buffer, block])
+                total = buffer_start + len(buffer)
+
+                # A window is final once audio beyond its end exists
+                ready = []
+                while next_index * step + chunk_len < total:
+                    start = next_index * step
+                    left = stride_left if start else 0
+                    ready.append(Window(next_index, start, start + chunk_len, (chunk_len, left, stride_right), False))
+                    next_index += 1
+                if not ready:
+                    continue
+
+                yield from run(ready)
+
+                keep_from = next_index * step
+                buffer = buffer[keep_from - buffer_start:]
+                buffer_start = keep_from
+
+            total = buffer_start + len(buffer)
+            remaining = [w for w in Chunker.iter_windows(total) if w.index >= next_index]
+            yield from run(remaining)
+
+            for segment in stitcher.finish():
+                # The last segment may lack an end timestamp; close it at the end of the audio
+                if segment["timestamp"][1] is None:
+                    segment["timestamp"] = (segment["timestamp"][0], round(total / CONFIG['audio'].sample_rate, 2))
+                yield segment
+
+        except Exception as e:
+            logger.error(f"Error streaming audio: {str(e)}")
+            raise RuntimeError(f"Audio streaming failed: {str(e)}") from e
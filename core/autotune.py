@@ -0,0 +1,223 @@
+# core/autotune.py
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+import os
+import socket
+import time
+import numpy as np
+import torch
+import transformers
+from config.settings import CONFIG
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker
+from core.model_handler import ModelHandler, ModelResources
+from utils.metrics import peak_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+class AutoTuner:
+    """
+    Find the pipeline batch size with the best throughput on this machine.
+
+    Candidate batch sizes are tried in increasing order on synthetic audio
+    through the same pipeline that transcription uses. Each candidate decodes
+    ``probe_batches`` full batches of 30-second windows. The search stops
+    before a candidate whose memory use, extrapolated from the smaller ones,
+    would exceed the headroom of the device, at the first out-of-memory error,
+    or once two larger batches in a row brought no gain. A larger batch is only
+    chosen when it is at least ``min_gain`` faster than the current choice,
+    since bigger batches also cost memory and latency.
+    """
+
+    @staticmethod
+    def synthetic_audio(seconds: float, seed: int = 0) -> np.ndarray:
+        """A steady tone in white noise."""
+        sample_rate = CONFIG['audio'].sample_rate
+        rng = np.random.default_rng(seed)
+        t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+        noise = rng.standard_normal(len(t), dtype=np.float32)
+        return (0.1 * np.sin(2 * np.pi * 330 * t) + 0.02 * noise).astype(np.float32)
+
+    @staticmethod
+    def samples_for_windows(windows: int) -> int:
+        """Number of samples that the pipeline splits into exactly ``windows`` windows."""
+        chunk_len, stride_left, stride_right = Chunker.window_parameters()
+        return chunk_len + (windows - 1) * (chunk_len - stride_left - stride_right)
+
+    @staticmethod
+    def memory_limit(device: str, headroom: float) -> Optional[int]:
+        """Bytes that a probe may use on ``device``, or None if it cannot be measured."""
+        if device.startswith("cuda"):
+            free, _ = torch.cuda.mem_get_info(torch.device(device))
+            return int(torch.cuda.memory_allocated(torch.device(device)) + headroom * free)
+        if device == "mps":
+            return int(headroom * torch.mps.recommended_max_memory())
+        try:
+            available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        except (ValueError, OSError, AttributeError):
+            return None
+        return int(peak_rss_bytes() + headroom * available)
+
+    @staticmethod
+    def _reset_peak_memory(device: str) -> None:
+        if device.startswith("cuda"):
+            torch.cuda.empty_cache()
+            torch.cuda.reset_peak_memory_stats(torch.device(device))
+
+    @staticmethod
+    def _peak_memory(device: str) -> int:
+        if device.startswith("cuda"):
+            return torch.cuda.max_memory_allocated(torch.device(device))
+        if device == "mps":
+            return torch.mps.driver_allocated_memory()
+        # The process high-water mark only grows, which is fine for increasing batch sizes
+        return peak_rss_bytes()
+
+    @classmethod
+    def measure(
+            cls,
+            resources: ModelResources,
+            batch_size: int,
+            audio: np.ndarray,
+            generate_kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Time one pass of ``audio`` through a pipeline that batches ``batch_size`` windows."""
+        pipe = ModelHandler.create_pipeline(
+            resources.model, resources.processor, resources.dtype, resources.device, batch_size=batch_size,
+            guard=resources.guard
+        )
+        cls._reset_peak_memory(resources.device)
+        start = time.perf_counter()
+        pipe(
+            {"raw": audio, "sampling_rate": CONFIG['audio'].sample_rate},
+            return_timestamps=True,
+            generate_kwargs=generate_kwargs
+        )
+        seconds = time.perf_counter() - start
+        audio_seconds = len(audio) / CONFIG['audio'].sample_rate
+        return {
+            "batch_size": batch_size,
+            "seconds": round(seconds, 3),
+            "real_time_factor": round(audio_seconds / seconds, 3),
+            "peak_memory_bytes": cls._peak_memory(resources.device),
+        }
+
+    @classmethod
+    def tune(
+            cls,
+            resources: ModelResources,
+            language: str = CONFIG['processing'].default_language,
+            batch_sizes: Sequence[int] = CONFIG['tuning'].batch_sizes,
+            probe_batches: int = CONFIG['tuning'].probe_batches,
+            memory_headroom: float = CONFIG['tuning'].memory_headroom,
+            min_gain: float = CONFIG['tuning'].min_gain,
+            audio: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        """
+        Probe ``resources`` with increasing batch sizes and return the tuning profile.
+
+        Args:
+            resources: Model resources on the device to tune
+            language: Language code passed to generation
+            batch_sizes: Candidate batch sizes
+            probe_batches: Full batches decoded per candidate
+            memory_headroom: Fraction of the device memory a candidate may use
+            min_gain: Relative throughput gain a larger batch needs to be chosen
+            audio: Recording to probe with instead of synthetic audio; it is
+                repeated or cut to the length each candidate needs
+
+        Returns:
+            Profile with the chosen batch size and the measurement of every candidate
+        """
+        try:
+            if resources.speculative is not None:
+                raise ValueError("Speculative decoding always decodes one window at a time; nothing to tune")
+
+            generate_kwargs = AudioProcessor.build_generate_kwargs(language, "transcribe")
+            candidates = sorted(set(batch_sizes))
+            source = audio if audio is not None and len(audio) else None
+
+            def probe_audio(windows: int) -> np.ndarray:
+                samples = cls.samples_for_windows(windows)
+                if source is None:
+                    return cls.synthetic_audio(samples / CONFIG['audio'].sample_rate)
+                return np.resize(source, samples)
+
+            # Warm up kernels and allocators outside the measurements
+            cls.measure(resources, candidates[0], probe_audio(1), generate_kwargs)
+
+            limit = cls.memory_limit(resources.device, memory_headroom)
+            logger.info(
+                f"Tuning batch size on {resources.device} with {torch.get_num_threads()} threads"
+                + (f", {limit / 2**30:.1f} GiB memory limit" if limit else "")
+            )
+
+            measurements: List[Dict[str, Any]] = []
+            chosen: Optional[Dict[str, Any]] = None
+            without_gain = 0
+            stop_reason = "all candidates measured"
+            for batch_size in candidates:
+                if len(measurements) >= 2 and limit is not None:
+                    previous, last = measurements[-2], measurements[-1]
+                    per_window = max(last["peak_memory_bytes"] - previous["peak_memory_bytes"], 0) \
+                        / (last["batch_size"] - previous["batch_size"])
+                    expected = last["peak_memory_bytes"] + per_window * (batch_size - last["batch_size"])
+                    if expected > limit:
+                        stop_reason = f"batch size {batch_size} would need about {expected / 2**30:.1f} GiB"
+                        break
+
+                try:
+                    measurement = cls.measure(resources, batch_size, probe_audio(batch_size * probe_batches),
+                                              generate_kwargs)
+                except torch.cuda.OutOfMemoryError:
+                    torch.cuda.empty_cache()
+                    stop_reason = f"batch size {batch_size} ran out of memory"
+                    break
+                if limit is not None and measurement["peak_memory_bytes"] > limit:
+                    stop_reason = f"batch size {batch_size} exceeded the memory limit"
+                    break
+
+                measurements.append(measurement)
+                logger.info(
+                    f"Batch size {batch_size}: {measurement['real_time_factor']:.1f}x real time, "
+                    f"peak memory {measurement['peak_memory_bytes'] / 2**30:.2f} GiB"
+                )
+                if chosen is None or measurement["real_time_factor"] >= chosen["real_time_factor"] * (1 + min_gain):
+                    chosen = measurement
+                    without_gain = 0
+                else:
+                    without_gain += 1
+                    if without_gain == 2:
+                        stop_reason = "throughput stopped improving"
+                        break
+
+            if chosen is None:
+                raise RuntimeError(f"No batch size fits on {resources.device}: {stop_reason}")
+            logger.info(f"Stopped tuning: {stop_reason}")
+
+            return {
+                "model": resources.model_name,
+                "device": resources.device,
+                "precision": resources.precision,
+                "dtype": str(resources.dtype),
+                "host": socket.gethostname(),
+                "batch_size": chosen["batch_size"],
+                "real_time_factor": chosen["real_time_factor"],
+                "chunk_length_s": CONFIG['processing'].chunk_length_s,
+                "torch_threads": torch.get_num_threads(),
+                "cpu_count": os.cpu_count(),
+                "device_name": torch.cuda.get_device_name(torch.device(resources.device))
+                if resources.device.startswith("cuda") else None,
+                "memory_limit_bytes": limit,
+                "audio": "synthetic" if source is None else "recording",
+                "stop_reason": stop_reason,
+                "candidates": measurements,
+                "torch": torch.__version__,
+                "transformers": transformers.__version__,
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to tune batch size: {str(e)}")
+            raise RuntimeError(f"Autotuning failed: {str(e)}") from e
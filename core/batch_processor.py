@@ -0,0 +1,440 @@
+# core/batch_processor.py
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple, Union
+import logging
+import os
+import time
+import numpy as np
+from config.settings import CONFIG
+from core.audio_converter import AudioConverter
+from core.audio_processor import AudioProcessor
+from core.model_handler import ModelResources
+from core.runaway import RunawayGuard
+from core.sharding import ShardedTranscriber
+from core.speculative import SpeculativeStats
+from core.vad import VoiceActivityDetector
+from core.variants import Variant
+from utils.feature_cache import FeatureCache
+from utils.file_handlers import WRITERS, OutputHandler, StreamingOutputWriter, save_results
+from utils.journal import ChunkJournal
+from utils.result_cache import ResultCache
+from utils.transcript_index import TranscriptIndex
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class FileResult:
+    input_path: Path
+    output_paths: Dict[str, Path] = field(default_factory=dict)
+    audio_seconds: float = 0.0
+    processing_seconds: float = 0.0
+    skipped_seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def real_time_factor(self) -> float:
+        """Audio seconds transcribed per second of inference (higher is faster)."""
+        return self.audio_seconds / self.processing_seconds if self.processing_seconds else 0.0
+
+class BatchProcessor:
+    def __init__(
+            self,
+            resources: ModelResources,
+            language: Union[str, Sequence[str]],
+            task: Union[str, Sequence[str]],
+            output_path: Optional[Path] = None,
+            prefetch: int = CONFIG['processing'].prefetch_files,
+            decode_mode: Optional[str] = None,
+            cache: Optional[ResultCache] = None,
+            vad: Optional[VoiceActivityDetector] = None,
+            engine: str = CONFIG['processing'].engine,
+            preprocess_workers: int = CONFIG['processing'].preprocess_workers,
+            prefetch_batches: int = CONFIG['processing'].prefetch_batches,
+            long_file: bool = False,
+            sharder: Optional[ShardedTranscriber] = None,
+            journal_dir: Optional[Path] = None,
+            formats: Sequence[str] = CONFIG['output'].formats,
+            timestamps: str = CONFIG['processing'].timestamps,
+            feature_cache: Optional[FeatureCache] = None,
+            index: Optional[TranscriptIndex] = None
+    ):
+        self.resources = resources
+        # Every combination of language and task is decoded and written separately
+        self.variants = Variant.expand(language, task)
+        self.output_path = output_path
+        self.prefetch = max(prefetch, 1)
+        # Long files are decoded to a memory-mapped spool file instead of into memory
+        self.decode_mode = 'mapped' if long_file else decode_mode
+        self.cache = cache
+        self.vad = vad
+        self.engine = engine
+        self.preprocess_workers = preprocess_workers
+        self.prefetch_batches = prefetch_batches
+        self.long_file = long_file
+        self.sharder = sharder
+        self.journal_dir = journal_dir
+        self.formats = formats
+        self.timestamps = timestamps
+        self.feature_cache = feature_cache
+        self.index = index
+
+        if timestamps == "none":
+            timed = [name for name in formats if WRITERS[name].timed]
+            if timed:
+                raise ValueError(f"--timestamps none cannot write the timed format(s): {', '.join(timed)}")
+        if timestamps == "word" and resources.speculative is not None:
+            raise ValueError("Word timestamps are not available with speculative decoding")
+        if len(self.variants) > 1:
+            logger.info(
+                f"Decoding {len(self.variants)} variants of every input with one encoder pass: "
+                + ", ".join(variant.label for variant in self.variants)
+            )
+
+    def _plan_outputs(self, inputs: List[Path]) -> Dict[Path, Optional[Path]]:
+        """
+        Decide the output path of every input before any is transcribed.
+
+        With several inputs, --output names a directory. Each input's outputs
+        go to its path relative to the deepest directory that holds all the
+        inputs, so ``a/x.wav`` and ``b/x.wav`` are written to ``a/x.*`` and
+        ``b/x.*`` under it. Without --output, outputs are written next to
+        their input.
+
+        Raises:
+            ValueError: If the outputs of two inputs would still overwrite each
+                other, e.g. for ``x.wav`` and ``x.m4a`` in one directory
+        """
+        if self.output_path is None or len(inputs) <= 1:
+            outputs = {path: self.output_path for path in inputs}
+        else:
+            root = Path(os.path.commonpath([path.resolve().parent for path in inputs]))
+            outputs = {path: self.output_path / path.resolve().relative_to(root) for path in inputs}
+
+        claimed: Dict[Path, Path] = {}
+        for input_path, output_path in outputs.items():
+            target = output_path or input_path
+            base = (target.parent / target.stem).resolve()
+            if base in claimed:
+                raise ValueError(
+                    f"{claimed[base]} and {input_path} would write the same output files "
+                    f"{base}.*; rename one of them or transcribe them separately"
+                )
+            claimed[base] = input_path
+        return outputs
+
+    def _cache_params(self, variant: Variant) -> Dict[str, Any]:
+        """Every option that changes the transcription result of ``variant``, for the cache key."""
+        return {
+            "model": self.resources.model_name,
+            "precision": self.resources.precision,
+            # Speculative decoding is greedy, whatever the assistant
+            "speculative": self.resources.speculative is not None,
+            "language": variant.language,
+            "task": variant.task,
+            "generate_kwargs": AudioProcessor.build_generate_kwargs(variant.language, variant.task),
+            "chunk_length_s": CONFIG['processing'].chunk_length_s,
+            "timestamps": self.timestamps,
+            "vad": asdict(self.vad.config) if self.vad else None,
+            # The guard can end windows early and close their last segment
+            "runaway_guard": self.resources.guard.params if self.resources.guard else None,
+        }
+
+    def _transcribe(
+            self,
+            input_path: Path,
+            audio: np.ndarray
+    ) -> Tuple[List[Dict[str, Any]], float, List[ChunkJournal]]:
+        """
+        Return the pipeline result of every variant for ``audio``, served from the cache when possible.
+
+        Returns:
+            Tuple of (result of each variant, seconds of audio skipped as
+            non-speech, journals of the job, to be removed once the outputs
+            are written)
+        """
+        keys: List[Optional[str]] = [None] * len(self.variants)
+        if self.cache or self.journal_dir:
+            keys = ResultCache.make_keys(
+                audio,
+                [self._cache_params(variant) for variant in self.variants],
+                release=lambda end_sample: AudioConverter.release_mapped(audio, end_sample)
+            )
+        results: List[Optional[Dict[str, Any]]] = [None] * len(self.variants)
+        if self.cache:
+            for i, (variant, key) in enumerate(zip(self.variants, keys)):
+                results[i] = self.cache.get(key)
+                if results[i] is not None:
+                    label = f" ({variant.label})" if variant.label else ""
+                    logger.info(f"Cache hit for {input_path}{label} ({key[:12]})")
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results, 0.0, []
+
+        variants = [self.variants[i] for i in pending]
+        journals = [ChunkJournal(self.journal_dir, keys[i]) for i in pending] if self.journal_dir else None
+        skipped_seconds = 0.0
+        if self.vad:
+            speech, timeline = self.vad.pack(audio)
+            skipped_seconds = timeline.skipped_seconds
+            if len(speech):
+                decoded = [timeline.restore(result) for result in self._infer(speech, variants, journals)]
+            else:
+                decoded = [{"text": "", "chunks": []} for _ in variants]
+        else:
+            decoded = self._infer(audio, variants, journals)
+
+        for i, result in zip(pending, decoded):
+            results[i] = result
+            if self.cache:
+                self.cache.put(keys[i], result)
+        return results, skipped_seconds, journals or []
+
+    def _infer(
+            self,
+            audio: np.ndarray,
+            variants: List[Variant],
+            journals: Optional[List[ChunkJournal]] = None
+    ) -> List[Dict[str, Any]]:
+        """Run the selected inference engine on decoded audio, returning one result per variant."""
+        if self.sharder is not None:
+            return self.sharder.transcribe(self.resources, audio, variants, self.timestamps)
+        if isinstance(audio, np.memmap):
+            return AudioProcessor.process_long_audio(
+                self.resources,
+                audio,
+                variants,
+                batch_size=self.resources.batch_size,
+                workers=self.preprocess_workers,
+                prefetch_batches=self.prefetch_batches,
+                journals=journals,
+                timestamps=self.timestamps,
+                feature_cache=self.feature_cache
+            )
+        if self.engine == "direct" and journals is None and len(variants) == 1:
+            return [AudioProcessor.process_audio_direct(
+                self.resources,
+                audio,
+                variants[0].language,
+                variants[0].task,
+                batch_size=self.resources.batch_size,
+                timestamps=self.timestamps,
+                feature_cache=self.feature_cache
+            )]
+        # Resumable jobs need the window-level engine, which records each window as it finishes,
+        # and so do several variants, which share the encoder pass of each window, and cached
+        # features, which the pipeline computes on its own
+        if self.engine != "pipeline" or journals is not None or len(variants) > 1 or self.feature_cache is not None:
+            return AudioProcessor.process_audio_variants(
+                self.resources,
+                audio,
+                variants,
+                batch_size=self.resources.batch_size,
+                workers=self.preprocess_workers,
+                prefetch_batches=self.prefetch_batches,
+                journals=journals,
+                timestamps=self.timestamps,
+                feature_cache=self.feature_cache
+            )
+        return [AudioProcessor.process_audio(
+            self.resources.pipeline,
+            audio,
+            variants[0].language,
+            variants[0].task,
+            self.timestamps
+        )]
+
+    def _process(self, input_path: Path, audio: np.ndarray, output_path: Optional[Path]) -> FileResult:
+        """Run inference on already-decoded audio and write the outputs."""
+        start = time.perf_counter()
+        speculative = self.resources.speculative
+        before = speculative.snapshot() if speculative else None
+        guard = self.resources.guard
+        guard_before = guard.snapshot() if guard else None
+        results, skipped_seconds, journals = self._transcribe(input_path, audio)
+        if guard:
+            stopped = RunawayGuard.summarize(guard_before, guard.snapshot())
+            if stopped["windows_stopped"]:
+                logger.info(
+                    f"{input_path}: stopped {stopped['windows_stopped']} repeating window(s) early, "
+                    f"saving up to {stopped['tokens_saved']} decoding steps"
+                )
+        if speculative:
+            stats = SpeculativeStats.summarize(before, speculative.snapshot())
+            if stats["emitted_tokens"]:
+                logger.info(
+                    f"{input_path}: speculative decoding accepted {stats['acceptance_rate']:.0%} of "
+                    f"{stats['drafted_tokens']} drafted tokens, {stats['tokens_per_main_pass']:.2f} tokens per "
+                    f"main decoder pass, estimated decoder speedup {stats['estimated_speedup']:.2f}x"
+                )
+        output_paths = {}
+        if output_path is not None:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+        for variant, result in zip(self.variants, results):
+            paths = save_results(
+                result, input_path, output_path, self.formats, variant.label,
+                duration=len(audio) / CONFIG['audio'].sample_rate
+            )
+            output_paths.update(
+                {f"{variant.label} {name}" if variant.label else name: path for name, path in paths.items()}
+            )
+            if self.index is not None:
+                self._index_result(input_path, variant, result)
+        for journal in journals:
+            journal.remove()
+
+        return FileResult(
+            input_path=input_path,
+            output_paths=output_paths,
+            audio_seconds=len(audio) / CONFIG['audio'].sample_rate,
+            processing_seconds=time.perf_counter() - start,
+            skipped_seconds=skipped_seconds,
+        )
+
+    def _index_result(self, input_path: Path, variant: Variant, result: Dict[str, Any]) -> None:
+        """Add the segments of ``result`` to the transcript index under the resolved input path."""
+        if self.timestamps == "word":
+            result = {'text': result['text'], 'chunks': TranscriptIndex.group_words(result['chunks'])}
+        count = self.index.add(
+            input_path.resolve(),
+            result,
+            model=self.resources.model_name,
+            language=variant.language,
+            task=variant.task
+        )
+        logger.debug(f"Indexed {count} segments of {input_path}")
+
+    def run(self, inputs: List[Path]) -> List[FileResult]:
+        """
+        Transcribe every input with the shared model resources.
+
+        Conversion and decoding of the next files run on a background thread while
+        the current file is in inference. A failing file is logged and recorded but
+        does not stop the batch.
+        """
+        outputs = self._plan_outputs(inputs)
+        results: List[FileResult] = []
+        batch_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") as executor:
+            pending: Deque[Tuple[Path, Future]] = deque()
+            queued = iter(inputs)
+
+            def schedule_next() -> None:
+                path = next(queued, None)
+                if path is not None:
+                    pending.append((path, executor.submit(AudioConverter.load_audio, path, self.decode_mode)))
+
+            for _ in range(self.prefetch):
+                schedule_next()
+
+            index = 0
+            while pending:
+                input_path, future = pending.popleft()
+                schedule_next()
+                index += 1
+
+                try:
+                    audio = future.result()
+                    file_result = self._process(input_path, audio, outputs[input_path])
+                    logger.info(
+                        f"[{index}/{len(inputs)}] {input_path}: {file_result.audio_seconds:.1f}s audio "
+                        f"in {file_result.processing_seconds:.1f}s ({file_result.real_time_factor:.1f}x real time)"
+                    )
+                except Exception as e:
+                    logger.error(f"[{index}/{len(inputs)}] {input_path} failed: {str(e)}")
+                    file_result = FileResult(input_path=input_path, error=str(e))
+
+                results.append(file_result)
+
+        self._log_summary(results, time.perf_counter() - batch_start)
+        return results
+
+    def stream(self, source: Optional[Path], follow: bool = False) -> FileResult:
+        """
+        Transcribe a file, a growing file or stdin, writing segments as they are decoded.
+
+        Args:
+            source: Input path; None or '-' reads stdin
+            follow: Keep reading a file that is still being written
+
+        Returns:
+            Result with output paths and throughput
+        """
+        if self.timestamps != "segment":
+            raise ValueError("--stream writes segment timestamps only")
+        if len(self.variants) > 1:
+            raise ValueError("--stream decodes one language and task")
+        variant = self.variants[0]
+        from_stdin = source is None or str(source) == '-'
+        if from_stdin and self.output_path is None:
+            raise ValueError("--output is required when streaming from stdin")
+
+        input_path = Path('stdin') if from_stdin else Path(source)
+        output_paths = OutputHandler.get_output_paths(input_path, self.output_path, self.formats)
+        audio_seconds = 0.0
+
+        def blocks():
+            nonlocal audio_seconds
+            for block in AudioConverter.stream_pcm(None if from_stdin else source, follow):
+                audio_seconds += len(block) / CONFIG['audio'].sample_rate
+                yield block
+
+        start = time.perf_counter()
+        streamed: List[Dict[str, Any]] = []
+        with StreamingOutputWriter(output_paths) as writer:
+            segments = AudioProcessor.stream_segments(
+                self.resources,
+                blocks(),
+                variant.language,
+                variant.task,
+                batch_size=self.resources.batch_size
+            )
+            for segment in segments:
+                writer.write_segment(segment)
+                if self.index is not None:
+                    streamed.append(segment)
+                logger.info(
+                    f"[{segment['timestamp'][0]:.2f} -> {segment['timestamp'][1]:.2f}] {segment['text'].strip()}"
+                )
+        if self.index is not None and not from_stdin:
+            self._index_result(input_path, variant, {'text': "".join(s['text'] for s in streamed), 'chunks': streamed})
+
+        file_result = FileResult(
+            input_path=input_path,
+            output_paths=output_paths,
+            audio_seconds=audio_seconds,
+            processing_seconds=time.perf_counter() - start,
+        )
+        logger.info(
+            f"{input_path}: streamed {file_result.audio_seconds:.1f}s audio "
+            f"in {file_result.processing_seconds:.1f}s ({file_result.real_time_factor:.1f}x real time)"
+        )
+        return file_result
+
+    @staticmethod
+    def _log_summary(results: List[FileResult], wall_seconds: float) -> None:
+        """Log aggregate throughput across the batch."""
+        succeeded = [r for r in results if r.error is None]
+        audio_seconds = sum(r.audio_seconds for r in succeeded)
+        inference_seconds = sum(r.processing_seconds for r in succeeded)
+
+        logger.info(
+            f"Batch finished: {len(succeeded)}/{len(results)} files, {audio_seconds:.1f}s audio "
+            f"in {wall_seconds:.1f}s wall clock"
+        )
+        skipped_seconds = sum(r.skipped_seconds for r in succeeded)
+        if skipped_seconds:
+            logger.info(
+                f"VAD skipped {skipped_seconds:.1f}s of {audio_seconds:.1f}s audio "
+                f"({100 * skipped_seconds / audio_seconds:.0f}%)"
+            )
+        if wall_seconds > 0 and succeeded:
+            logger.info(
+                f"Throughput: {audio_seconds / wall_seconds:.1f}x real time overall, "
+                f"{audio_seconds / inference_seconds if inference_seconds else 0.0:.1f}x during inference, "
+                f"{len(succeeded) * 3600 / wall_seconds:.0f} files/hour"
+            )
@@ -0,0 +1,471 @@
+# core/chunking.py
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+import numpy as np
+import torch
+from transformers.models.whisper.tokenization_whisper import _find_longest_common_sequence
+from config.settings import CONFIG
+from core.model_handler import ModelResources
+from utils.feature_cache import FeatureCache
+from utils.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# ``return_timestamps`` of the pipeline and the tokenizer for every --timestamps mode
+RETURN_TIMESTAMPS = {"none": False, "segment": True, "word": "word"}
+
+@dataclass
+class Window:
+    """One chunk of a recording, with the stride overlap shared with its neighbours."""
+    index: int
+    start: int
+    end: int
+    stride: Tuple[int, int, int]  # (chunk length, left overlap, right overlap) in samples
+    is_last: bool
+
+class Chunker:
+    """
+    Windowing, batched generation and stitching that mirror the transformers
+    ASR pipeline, for code paths that drive the model directly.
+    """
+
+    @staticmethod
+    def window_parameters(
+            sample_rate: int = CONFIG['audio'].sample_rate,
+            chunk_length_s: float = CONFIG['processing'].chunk_length_s
+    ) -> Tuple[int, int, int]:
+        """Return (chunk length, left stride, right stride) in samples, as the pipeline computes them."""
+        stride_length_s = chunk_length_s / 6
+        chunk_len = int(round(chunk_length_s * sample_rate))
+        stride = int(round(stride_length_s * sample_rate))
+        return chunk_len, stride, stride
+
+    @staticmethod
+    def iter_windows(
+            num_samples: int,
+            chunk_len: Optional[int] = None,
+            stride_left: Optional[int] = None,
+            stride_right: Optional[int] = None
+    ) -> Iterator[Window]:
+        """
+        Yield the windows covering ``num_samples`` samples.
+
+        Windows overlap by the stride on each side, and the first and last
+        windows carry no overlap at the recording edges.
+        """
+        if chunk_len is None:
+            chunk_len, stride_left, stride_right = Chunker.window_parameters()
+
+        step = chunk_len - stride_left - stride_right
+        index = 0
+        for start in range(0, num_samples, step):
+            end = min(start + chunk_len, num_samples)
+            is_last = start + chunk_len >= num_samples
+            left = 0 if start == 0 else stride_left
+            right = 0 if is_last else stride_right
+            if end - start > left:
+                yield Window(index, start, end, (end - start, left, right), is_last)
+                index += 1
+            if is_last:
+                break
+
+    @staticmethod
+    def window_grid(
+            num_samples: int,
+            chunk_len: Optional[int] = None,
+            stride_left: Optional[int] = None,
+            stride_right: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The windows of :meth:`iter_windows` as arrays, computed without a Python loop.
+
+        Returns:
+            Tuple of (start, end, left overlap, right overlap) in samples, one
+            entry per window
+        """
+        if chunk_len is None:
+            chunk_len, stride_left, stride_right = Chunker.window_parameters()
+
+        step = chunk_len - stride_left - stride_right
+        starts = np.arange(0, max(num_samples, 1), step, dtype=np.int64)
+        # The first window that reaches the end of the audio is the last one
+        starts = starts[:int(np.argmax(starts + chunk_len >= num_samples)) + 1]
+        ends = np.minimum(starts + chunk_len, num_samples)
+        left = np.where(starts == 0, 0, stride_left)
+        right = np.where(starts + chunk_len >= num_samples, 0, stride_right)
+        keep = ends - starts > left
+        return starts[keep], ends[keep], left[keep], right[keep]
+
+    @staticmethod
+    def extract_features(
+            resources: ModelResources,
+            chunks: List[np.ndarray]
+    ) -> Dict[str, torch.Tensor]:
+        """Compute padded log-mel features for a batch of sample arrays."""
+        if resources.front_end is not None:
+            processed = resources.front_end(chunks)
+        else:
+            feature_extractor = resources.processor.feature_extractor
+            processed = feature_extractor(
+                chunks,
+                sampling_rate=feature_extractor.sampling_rate,
+                return_tensors="pt",
+                return_attention_mask=True,
+            )
+        return {
+            "input_features": processed["input_features"].to(resources.device, dtype=resources.dtype),
+            "attention_mask": processed["attention_mask"].to(resources.device),
+        }
+
+    @staticmethod
+    def generate(
+            resources: ModelResources,
+            features: Dict[str, torch.Tensor],
+            generate_kwargs: Dict[str, Any],
+            timestamps: str = CONFIG['processing'].timestamps
+    ) -> torch.Tensor:
+        """
+        Run generation for a batch of windows and return the token ids on the CPU.
+
+        Timestamp tokens are decoded unless ``timestamps`` is "none". For word
+        timestamps use :meth:`generate_words`, which also returns the timings.
+        """
+        return Chunker._generate(resources, features, generate_kwargs, timestamps != "none")[0]
+
+    @staticmethod
+    def generate_words(
+            resources: ModelResources,
+            features: Dict[str, torch.Tensor],
+            generate_kwargs: Dict[str, Any]
+    ) -> Tuple[torch.Tensor, List[torch.Tensor]]:
+        """
+        Run timestamped generation with word alignment for a batch of windows.
+
+        The alignment uses the cross-attention of the model's alignment heads,
+        computed once for the whole batch after its tokens are generated.
+
+        Returns:
+            Tuple of (token ids, time of every token in seconds from the window
+            start for each window), on the CPU
+        """
+        return Chunker._generate(resources, features, generate_kwargs, True, token_timestamps=True)
+
+    @staticmethod
+    def decode(
+            resources: ModelResources,
+            features: Dict[str, torch.Tensor],
+            windows: List[Window],
+            generate_kwargs: Dict[str, Any],
+            timestamps: str = CONFIG['processing'].timestamps
+    ) -> List[Tuple]:
+        """
+        Generate a batch of windows and pair the tokens of each with its stride.
+
+        Returns:
+            (token ids, stride) for every window, followed by the token times
+            for word timestamps, as :meth:`stitch` takes them
+        """
+        if timestamps == "word":
+            tokens, timings = Chunker.generate_words(resources, features, generate_kwargs)
+            return [(window_tokens, window.stride, window_timings)
+                    for window, window_tokens, window_timings in zip(windows, tokens, timings)]
+        tokens = Chunker.generate(resources, features, generate_kwargs, timestamps)
+        return [(window_tokens, window.stride) for window, window_tokens in zip(windows, tokens)]
+
+    @staticmethod
+    def _generate(
+            resources: ModelResources,
+            features: Dict[str, torch.Tensor],
+            generate_kwargs: Dict[str, Any],
+            return_timestamps: bool,
+            token_timestamps: bool = False
+    ) -> Tuple[torch.Tensor, Optional[List[torch.Tensor]]]:
+        # Decode with the same settings the pipeline would use
+        generation_config = getattr(resources.pipeline, "generation_config", None)
+        if generation_config is not None and "generation_config" not in generate_kwargs:
+            generate_kwargs = {"generation_config": generation_config, **generate_kwargs}
+
+        timings = None
+        if resources.speculative is not None:
+            if token_timestamps:
+                raise ValueError("Word timestamps are not available with speculative decoding")
+            # Assisted generation verifies one window at a time
+            generate_kwargs = {**generate_kwargs, **resources.speculative.generate_kwargs()}
+            batch_size = features["input_features"].shape[0]
+            with torch.inference_mode():
+                sequences = [
+                    Chunker._sequences(resources.model.generate(
+                        **{name: value[i:i + 1] for name, value in features.items()},
+                        return_timestamps=return_timestamps,
+                        **generate_kwargs
+                    ))[0]
+                    for i in range(batch_size)
+                ]
+            pad_token_id = resources.model.generation_config.pad_token_id
+            tokens = torch.nn.utils.rnn.pad_sequence(sequences, batch_first=True, padding_value=pad_token_id)
+        else:
+            if resources.guard is not None:
+                generate_kwargs = {**generate_kwargs, **resources.guard.generate_kwargs()}
+            if token_timestamps:
+                generate_kwargs = {**generate_kwargs, "return_token_timestamps": True, "return_segments": True}
+            with torch.inference_mode():
+                output = resources.model.generate(
+                    **features,
+                    return_timestamps=return_timestamps,
+                    **generate_kwargs
+                )
+            tokens = Chunker._sequences(output)
+            if token_timestamps:
+                # As in the pipeline: the segments carry the offset of every seek within the window
+                timings = [
+                    torch.cat([segment["token_timestamps"] for segment in segments]).cpu()
+                    for segments in output["segments"]
+                ]
+        tokens = tokens.cpu()
+        METRICS.increment("tokens_generated", Chunker.count_generated(resources, tokens))
+        return tokens, timings
+
+    @staticmethod
+    def _sequences(output: Any) -> torch.Tensor:
+        return output["sequences"] if isinstance(output, dict) else output
+
+    @staticmethod
+    def count_generated(resources: ModelResources, tokens: torch.Tensor) -> int:
+        """Number of text and timestamp tokens in generated sequences, excluding prompt, EOS and padding."""
+        special_ids = torch.tensor(resources.processor.tokenizer.all_special_ids)
+        return int((~torch.isin(tokens, special_ids)).sum())
+
+    @staticmethod
+    def stitch(
+            resources: ModelResources,
+            outputs: List[Tuple],
+            timestamps: str = CONFIG['processing'].timestamps
+    ) -> Dict[str, Any]:
+        """
+        Merge per-window token ids into the pipeline's ``{'text', 'chunks'}`` result.
+
+        Args:
+            resources: Model resources providing the tokenizer and feature extractor
+            outputs: (token ids, stride in samples) for every window, in order,
+                followed by the token times of :meth:`generate_words` for word timestamps
+            timestamps: "none", "segment" or "word"
+
+        Returns:
+            Dictionary with the full text and timestamped chunks; segments for
+            "segment", words for "word" and no chunks for "none"
+        """
+        feature_extractor = resources.processor.feature_extractor
+        sample_rate = feature_extractor.sampling_rate
+        time_precision = feature_extractor.chunk_length / resources.model.config.max_source_positions
+
+        model_outputs = []
+        for tokens, stride, *timings in outputs:
+            model_output = {
+                "tokens": tokens.reshape(1, -1),
+                "stride": tuple(value / sample_rate for value in stride),
+            }
+            if timestamps == "word":
+                model_output["token_timestamps"] = timings[0].reshape(1, -1)
+            model_outputs.append(model_output)
+        text, optional = resources.processor.tokenizer._decode_asr(
+            model_outputs,
+            return_timestamps=RETURN_TIMESTAMPS[timestamps],
+            return_language=None,
+            time_precision=time_precision,
+        )
+        return {"text": text, "chunks": [], **optional}
+
+class StreamingStitcher:
+    """
+    Incremental version of the tokenizer's segment-level timestamp stitching.
+
+    Windows are fed in order and every segment is returned as soon as its end
+    timestamp is known, instead of after the whole recording. The state machine
+    follows ``WhisperTokenizer._decode_asr`` so the segments are the same as
+    :meth:`Chunker.stitch` produces for the full list of windows.
+    """
+
+    def __init__(self, resources: ModelResources):
+        tokenizer = resources.processor.tokenizer
+        feature_extractor = resources.processor.feature_extractor
+        self.tokenizer = tokenizer
+        self.sample_rate = feature_extractor.sampling_rate
+        self.time_precision = feature_extractor.chunk_length / resources.model.config.max_source_positions
+        self.timestamp_begin = tokenizer.convert_tokens_to_ids("<|notimestamps|>") + 1
+        self.special_ids = set(tokenizer.all_special_ids)
+        self.prompt_token_id = tokenizer.convert_tokens_to_ids("<|startofprev|>")
+        self.decoder_start_token_id = tokenizer.convert_tokens_to_ids("<|startoftranscript|>")
+
+        self.time_offset = 0.0
+        self.previous_tokens: List[List[int]] = []
+        self.timestamp: List[Optional[float]] = [None, None]
+        self.skip = False
+
+    def _close_segment(self) -> Dict[str, Any]:
+        resolved_tokens, _ = _find_longest_common_sequence(self.previous_tokens, [])
+        segment = {"timestamp": tuple(self.timestamp), "text": self.tokenizer.decode(resolved_tokens)}
+        self.previous_tokens = []
+        self.timestamp = [None, None]
+        return segment
+
+    def feed(self, tokens: torch.Tensor, stride: Tuple[int, int, int]) -> List[Dict[str, Any]]:
+        """
+        Consume the token ids of the next window.
+
+        Args:
+            tokens: Generated token ids of the window
+            stride: (chunk length, left overlap, right overlap) in samples
+
+        Returns:
+            Segments completed by this window, with absolute timestamps
+        """
+        token_ids = self.tokenizer._strip_prompt(
+            tokens.reshape(-1).tolist(), self.prompt_token_id, self.decoder_start_token_id
+        )
+        timestamp_begin = self.timestamp_begin
+        time_precision = self.time_precision
+        chunk_len, stride_left, stride_right = (value / self.sample_rate for value in stride)
+
+        last_timestamp = None
+        first_timestamp = timestamp_begin
+        cur_max_timestamp = 0.0
+        prev_segments_len = 0.0
+        penultimate_timestamp = 0.0
+
+        self.time_offset -= stride_left
+        right_stride_start = chunk_len - stride_right
+        if stride_left:
+            first_timestamp = stride_left / time_precision + timestamp_begin
+        if stride_right:
+            for token in reversed(token_ids):
+                if token >= timestamp_begin:
+                    if last_timestamp is not None and (token - timestamp_begin) * time_precision < right_stride_start:
+                        break
+                    last_timestamp = token
+
+        finished = []
+        current_tokens: List[int] = []
+        for i, token in enumerate(token_ids):
+            if token in self.special_ids:
+                continue
+
+            if token < timestamp_begin:
+                current_tokens.append(token)
+                continue
+
+            timestamp = float((token - timestamp_begin) * time_precision)
+            if timestamp < cur_max_timestamp:
+                # A new long-form segment has started inside this window
+                last_was_single_ending = i >= 2 and not (
+                    token_ids[i - 1] >= timestamp_begin and token_ids[i - 2] >= timestamp_begin
+                )
+                if last_was_single_ending:
+                    prev_segments_len += time_precision * 1500
+                else:
+                    cur_max_timestamp = penultimate_timestamp
+                    prev_segments_len += penultimate_timestamp
+
+            penultimate_timestamp = cur_max_timestamp
+            cur_max_timestamp = timestamp
+            time = round((token - timestamp_begin) * time_precision + self.time_offset + prev_segments_len, 2)
+
+            if last_timestamp and token >= last_timestamp:
+                # Inside the right stride: resolved by the next window
+                self.skip = True
+            elif self.skip or (self.previous_tokens and token < first_timestamp):
+                self.skip = False
+            elif self.timestamp[0] is None:
+                self.timestamp[0] = time
+            elif time != self.timestamp[0]:
+                self.timestamp[1] = time
+                self.previous_tokens.append(current_tokens)
+                finished.append(self._close_segment())
+                current_tokens = []
+
+        self.time_offset += chunk_len - stride_right
+
+        if current_tokens:
+            self.previous_tokens.append(current_tokens)
+        elif not any(self.previous_tokens):
+            self.previous_tokens = []
+            self.timestamp = [None, None]
+
+        return finished
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush text left without an end timestamp once the last window has been fed."""
+        if self.previous_tokens:
+            return [self._close_segment()]
+        return []
+
+class WindowFeatures:
+    """
+    Log-mel features of the windows of one recording, read from the feature cache when it has them.
+
+    On a miss the features are computed by the model's front end and every
+    window is written to a new cache entry as it is computed. The entry is
+    published by :meth:`close` once all windows have been written.
+    """
+
+    def __init__(
+            self,
+            resources: ModelResources,
+            audio: np.ndarray,
+            windows: Sequence[Window],
+            cache: Optional[FeatureCache] = None,
+            release: Optional[Callable[[int], None]] = None
+    ):
+        """
+        Args:
+            resources: Initialized model resources
+            audio: Decoded mono samples the windows are sliced from
+            windows: Every window of the recording, not only those still to decode
+            cache: Feature cache, or None to always compute the features
+            release: Called with the number of samples hashed so far while the
+                cache key is built, so memory-mapped audio can drop pages behind
+        """
+        self.resources = resources
+        self.front_end = resources.front_end
+        self.audio = audio
+        self.cached: Optional[np.ndarray] = None
+        self.entry = None
+        if cache is None or self.front_end is None or not self.front_end.deterministic or not windows:
+            return
+
+        params = {**self.front_end.params, "windows": Chunker.window_parameters()}
+        key = FeatureCache.make_key(audio, params, release)
+        shape = (len(windows), resources.processor.feature_extractor.feature_size,
+                 self.front_end.n_samples // self.front_end.hop_length)
+        self.cached = cache.get(key, shape)
+        if self.cached is not None:
+            logger.info(f"Feature cache hit ({key[:12]}): skipping feature extraction for {len(windows)} windows")
+            METRICS.increment("feature_windows_cached", len(windows))
+        else:
+            self.entry = cache.create(key, shape)
+
+    def extract(self, windows: Sequence[Window]) -> Dict[str, torch.Tensor]:
+        """Features of ``windows`` on the model's device and in its dtype, as :meth:`Chunker.extract_features`."""
+        if self.front_end is None:
+            return Chunker.extract_features(self.resources, [self.audio[w.start:w.end] for w in windows])
+
+        indices = [w.index for w in windows]
+        if self.cached is not None:
+            processed = {
+                "input_features": torch.from_numpy(np.ascontiguousarray(self.cached[indices])),
+                "attention_mask": self.front_end.attention_mask([w.end - w.start for w in windows]),
+            }
+        else:
+            processed = self.front_end.windows(self.audio, [w.start for w in windows], [w.end for w in windows])
+            if self.entry is not None:
+                self.entry.write(indices, processed["input_features"].cpu().numpy())
+        return {
+            "input_features": processed["input_features"].to(self.resources.device, dtype=self.resources.dtype),
+            "attention_mask": processed["attention_mask"].to(self.resources.device),
+        }
+
+    def close(self) -> None:
+        """Publish the new cache entry if every window was computed, else drop it."""
+        entry, self.entry = self.entry, None
+        if entry is not None and entry.commit():
+            logger.info(f"Stored the features of {len(entry.written)} windows in the feature cache")
@@ -1,14 +1,26 @@
 # core/model_handler.py
 from dataclasses import dataclass
-from typing import Tuple, Optional
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Tuple, Optional, Union
+import json
+import os
+import time
+import numpy as np
 import torch
+import transformers
 from transformers import (
     AutoModelForSpeechSeq2Seq,
     AutoProcessor,
     pipeline as transformers_pipeline
 )
 import logging
-from config.settings import CONFIG
+from config.settings import CONFIG, PRECISIONS
+from core.features import MelFrontEnd
+from core.runaway import RunawayGuard
+from core.speculative import SpeculativeStats
+from utils.metrics import METRICS
+from utils.tuning_profile import TuningProfile
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +31,15 @@ class ModelResources:
     pipeline: any  # Using 'any' as the pipeline type is complex
     device: str
     dtype: torch.dtype
+    model_name: str = ""
+    precision: str = "auto"
+    speculative: Optional[SpeculativeStats] = None
+    batch_size: int = CONFIG['processing'].batch_size
+    compiled: bool = False
+    guard: Optional[RunawayGuard] = None
+    front_end: Optional[MelFrontEnd] = None
+
+SNAPSHOT_FILE = "snapshot.json"
 
 class ModelHandler:
     @staticmethod
@@ -33,15 +54,195 @@ class ModelHandler:
         return device_arg
 
     @staticmethod
-    def get_torch_dtype(device: str) -> torch.dtype:
-        """Determine appropriate torch dtype based on device."""
+    def get_torch_dtype(device: str, precision: str = "auto") -> torch.dtype:
+        """Determine appropriate torch dtype based on device and requested precision."""
+        if precision == "bf16":
+            return torch.bfloat16
+        if precision in ("fp32", "dynamic-int8"):
+            # Dynamic quantization starts from float32 weights and keeps float32 activations
+            return torch.float32
         return torch.float16 if device.startswith(("cuda", "mps")) else torch.float32
 
+    @staticmethod
+    def supports_bf16(device: str) -> bool:
+        """Whether ``device`` has native bfloat16 kernels."""
+        if device.startswith("cuda"):
+            return torch.cuda.is_bf16_supported()
+        if device == "cpu":
+            try:
+                return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+            except (AttributeError, RuntimeError):
+                return False
+        return device == "mps"
+
     @classmethod
-    def create_pipeline(cls, model, processor, dtype, device):
+    def resolve_precision(cls, precision: str, device: str) -> str:
+        """Validate ``precision`` for ``device``, falling back to fp32 where bf16 would be emulated."""
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        if precision == "dynamic-int8" and device != "cpu":
+            raise ValueError("dynamic-int8 precision is only supported on the CPU")
+        if precision == "bf16" and not cls.supports_bf16(device):
+            logger.warning(f"{device} has no native bfloat16 support, using fp32")
+            return "fp32"
+        return precision
+
+    @staticmethod
+    def apply_precision(model, precision: str):
+        """
+        Apply post-load precision changes to ``model``.
+
+        ``dynamic-int8`` replaces every Linear layer with a dynamically
+        quantized one: weights are stored as int8 and activations are
+        quantized on the fly, which roughly quarters the memory of those layers.
+        The other precisions are applied through the load dtype.
+        """
+        if precision != "dynamic-int8":
+            return model
+        try:
+            from torch.ao.quantization import quantize_dynamic
+        except ImportError as e:
+            raise RuntimeError("dynamic-int8 needs torch.ao.quantization, which this torch build lacks") from e
+        return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    @staticmethod
+    def share_weights(model) -> Dict[str, Any]:
+        """
+        Move ``model``'s weights to shared memory and describe them for other processes.
+
+        The returned dictionary holds the model and generation configs and
+        every parameter and buffer by name. Passed to a process started with
+        ``multiprocessing`` (for instance as ``initargs``), its tensors arrive
+        as handles to the same shared pages, so :meth:`initialize` with
+        ``shared`` builds a model there without copying any weights. Only the
+        tensors are passed, not the module, which may carry timing hooks or
+        compiled forwards that cannot be pickled.
+        """
+        if model.device.type != "cpu":
+            raise ValueError(f"Only CPU weights can be shared between processes, not {model.device.type}")
+        if any(hasattr(module, "_packed_params") for module in model.modules()):
+            raise ValueError("Dynamically quantized weights cannot be shared between processes")
+        model.share_memory()
+        tensors = dict(model.named_parameters(remove_duplicate=False))
+        tensors.update(model.named_buffers(remove_duplicate=False))
+        return {
+            "config": model.config,
+            "generation_config": model.generation_config,
+            "tensors": {name: tensor.detach() for name, tensor in tensors.items()},
+        }
+
+    @staticmethod
+    def _attach_weights(shared: Dict[str, Any], dtype: torch.dtype):
+        """Build a model around the tensors of :meth:`share_weights` without allocating its own."""
+        with torch.device("meta"):
+            model = AutoModelForSpeechSeq2Seq.from_config(shared["config"], torch_dtype=dtype)
+        # Tied weights appear under several names; keep them one parameter
+        parameters: Dict[Tuple[int, Tuple[int, ...]], torch.nn.Parameter] = {}
+        for name, tensor in shared["tensors"].items():
+            module_name, _, leaf = name.rpartition(".")
+            module = model.get_submodule(module_name)
+            if leaf in module._parameters:
+                key = (tensor.data_ptr(), tuple(tensor.shape))
+                if key not in parameters:
+                    parameters[key] = torch.nn.Parameter(tensor, requires_grad=False)
+                module._parameters[leaf] = parameters[key]
+            else:
+                module._buffers[leaf] = tensor
+        missing = [name for name, tensor in model.state_dict(keep_vars=True).items() if tensor.is_meta]
+        if missing:
+            raise ValueError(f"Shared weights lack {', '.join(missing[:5])}")
+        model.generation_config = shared["generation_config"]
+        return model.eval()
+
+    @staticmethod
+    def compile_model(
+            model,
+            device: str,
+            cache_dir: Union[str, Path] = CONFIG['cache'].compile_directory
+    ) -> None:
+        """
+        Switch ``model`` to a static KV cache and compile its encoder and decoder.
+
+        The static cache gives every decoding step the same shapes, so the
+        decoder compiles into one graph instead of retracing as the sequence
+        grows. Only the modules' own ``forward`` is compiled, which leaves the
+        timing hooks outside the graphs. Inductor writes its compiled kernels
+        to ``cache_dir``, unless ``TORCHINDUCTOR_CACHE_DIR`` is already set, so
+        later processes on this host load them instead of compiling again.
+        """
+        cache_dir = Path(cache_dir).expanduser()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # torch fills in its temporary-directory default the first time it reads the variable
+        from torch._inductor.runtime.cache_dir_utils import default_cache_dir
+        inductor_dir = os.environ.get("TORCHINDUCTOR_CACHE_DIR")
+        if inductor_dir is None or os.path.abspath(inductor_dir) == os.path.abspath(default_cache_dir()):
+            os.environ["TORCHINDUCTOR_CACHE_DIR"] = str(cache_dir / "inductor")
+        os.environ.setdefault("TRITON_CACHE_DIR", str(cache_dir / "triton"))
+        # The encoder and decoder forwards share the code object of the transformers output wrapper,
+        # so their graphs (prefill and decode steps, full and last batch) count against one limit
+        torch._dynamo.config.recompile_limit = max(torch._dynamo.config.recompile_limit, 32)
+
+        model.generation_config.cache_implementation = "static"
+        # CUDA graphs remove the remaining launch overhead; they need static shapes, which the cache provides
+        mode = "reduce-overhead" if device.startswith("cuda") else "default"
+        for module in (model.get_encoder(), model.get_decoder()):
+            module.forward = torch.compile(module.forward, mode=mode, fullgraph=True)
+
+    @staticmethod
+    def warm_up(model, processor, generation_config, device: str, dtype: torch.dtype, batch_size: int) -> float:
+        """
+        Compile the graphs of a compiled model before the first real batch.
+
+        Generates on silence at ``batch_size`` and then at a single window. The
+        second call makes torch.compile recompile with a dynamic batch
+        dimension, which then serves the smaller last batch of every file.
+
+        Returns:
+            Seconds spent, mostly compiling or loading compiled kernels
+        """
+        start = time.perf_counter()
+        feature_extractor = processor.feature_extractor
+        silence = np.zeros(feature_extractor.n_samples, dtype=np.float32)
+        for size in dict.fromkeys((batch_size, 1)):
+            features = feature_extractor(
+                [silence] * size,
+                sampling_rate=feature_extractor.sampling_rate,
+                return_tensors="pt",
+                return_attention_mask=True,
+            )
+            with torch.inference_mode():
+                model.generate(
+                    input_features=features["input_features"].to(device, dtype=dtype),
+                    attention_mask=features["attention_mask"].to(device),
+                    generation_config=generation_config,
+                    language="en",
+                    task="transcribe",
+                    return_timestamps=True,
+                )
+        return time.perf_counter() - start
+
+    @classmethod
+    def create_pipeline(
+            cls,
+            model,
+            processor,
+            dtype,
+            device,
+            speculative: Optional[SpeculativeStats] = None,
+            batch_size: int = CONFIG['processing'].batch_size,
+            guard: Optional[RunawayGuard] = None
+    ):
         """Create the pipeline with proper configuration."""
         try:
-            return transformers_pipeline(
+            generate_kwargs = {}
+            if speculative is not None:
+                # Assisted generation verifies one sequence at a time
+                batch_size = 1
+                generate_kwargs = speculative.generate_kwargs()
+            elif guard is not None:
+                generate_kwargs = guard.generate_kwargs()
+
+            pipe = transformers_pipeline(
                 task="automatic-speech-recognition",
                 model=model,
                 tokenizer=processor.tokenizer,
@@ -49,34 +250,214 @@ class ModelHandler:
                 torch_dtype=dtype,
                 device=device,
                 chunk_length_s=CONFIG['processing'].chunk_length_s,
-                batch_size=CONFIG['processing'].batch_size,
+                batch_size=batch_size,
+                **generate_kwargs
             )
+            if speculative is not None:
+                # Drafts are checked against the main model's greedy choice
+                pipe.generation_config.num_beams = 1
+                pipe.generation_config.do_sample = False
+            if guard is not None:
+                # The pipeline decodes with its own copy of the config (beam search by default)
+                guard.generation_config = pipe.generation_config
+            return pipe
         except Exception as e:
             logger.error(f"Failed to create pipeline: {str(e)}")
             raise RuntimeError(f"Pipeline creation failed: {str(e)}") from e
 
     @classmethod
-    def initialize(cls, model_name: str, device_arg: str = "auto") -> ModelResources:
-        """Initialize model resources with proper error handling."""
+    def load_assistant(cls, assistant_name: str, model, dtype: torch.dtype, device: str, precision: str):
+        """Load a small draft model that shares the main model's tokenizer."""
+        logger.info(f"Loading assistant model {assistant_name} for speculative decoding")
+        assistant = AutoModelForSpeechSeq2Seq.from_pretrained(
+            assistant_name,
+            torch_dtype=dtype,
+            low_cpu_mem_usage=True,
+            use_safetensors=True
+        )
+        if assistant.config.vocab_size != model.config.vocab_size:
+            raise ValueError(
+                f"Assistant vocabulary ({assistant.config.vocab_size}) differs from the main model's "
+                f"({model.config.vocab_size})"
+            )
+        assistant.to(device)
+        return cls.apply_precision(assistant, precision)
+
+    @staticmethod
+    def read_snapshot(model_name: str) -> Optional[Dict[str, Any]]:
+        """Metadata of a snapshot written by :meth:`snapshot`, or None if ``model_name`` is not one."""
+        metadata_path = Path(model_name) / SNAPSHOT_FILE
+        if not metadata_path.is_file():
+            return None
+        return json.loads(metadata_path.read_text(encoding='utf-8'))
+
+    @classmethod
+    def snapshot(
+            cls,
+            model_name: str,
+            output_dir: Union[str, Path],
+            device_arg: str = "auto",
+            precision: str = CONFIG['processing'].precision
+    ) -> Path:
+        """
+        Write a local copy of a model and its processor, ready to load for ``device_arg``.
+
+        The weights are saved as safetensors in the dtype that the device and
+        precision load them in, so a later run memory-maps them without
+        conversion and without contacting the model hub. Checkpoints that
+        only ship PyTorch pickles are converted once here.
+
+        Args:
+            model_name: Model name or path to copy
+            output_dir: Directory to write the snapshot to
+            device_arg: Device the snapshot is prepared for
+            precision: Precision the snapshot is prepared for
+
+        Returns:
+            The snapshot directory
+        """
         try:
             device = cls.get_device(device_arg)
-            dtype = cls.get_torch_dtype(device)
+            precision = cls.resolve_precision(precision, device)
+            dtype = cls.get_torch_dtype(device, precision)
+            output_dir = Path(output_dir)
 
-            logger.info(f"Loading model {model_name} on {device} with {dtype}")
+            logger.info(f"Writing a {dtype} snapshot of {model_name} for {device} to {output_dir}")
+            model = AutoModelForSpeechSeq2Seq.from_pretrained(model_name, torch_dtype=dtype, low_cpu_mem_usage=True)
+            processor = AutoProcessor.from_pretrained(model_name)
 
-            model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                model_name,
-                torch_dtype=dtype,
-                low_cpu_mem_usage=True,
-                use_safetensors=True
-            )
-            model.to(device)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            model.save_pretrained(output_dir, safe_serialization=True)
+            processor.save_pretrained(output_dir)
+            (output_dir / SNAPSHOT_FILE).write_text(json.dumps({
+                "source": model_name,
+                "device": device,
+                "dtype": str(dtype),
+                "precision": precision,
+                "transformers": transformers.__version__,
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }, indent=2), encoding='utf-8')
+            return output_dir
 
-            processor = AutoProcessor.from_pretrained(model_name)
+        except Exception as e:
+            logger.error(f"Failed to write snapshot: {str(e)}")
+            raise RuntimeError(f"Model snapshot failed: {str(e)}") from e
+
+    @classmethod
+    def initialize(
+            cls,
+            model_name: str,
+            device_arg: str = "auto",
+            precision: str = CONFIG['processing'].precision,
+            assistant_name: Optional[str] = None,
+            batch_size: Optional[int] = None,
+            compile: bool = CONFIG['processing'].compile,
+            shared: Optional[Dict[str, Any]] = None,
+            runaway_guard: bool = CONFIG['processing'].runaway_guard
+    ) -> ModelResources:
+        """
+        Initialize model resources with proper error handling.
+
+        Without an explicit ``batch_size``, the batch size saved by ``main.py
+        autotune`` for this host, model, device and precision is used, and
+        the configured default when there is no such profile. With
+        ``compile``, the encoder and decoder are compiled for that batch size
+        before this returns (see :meth:`compile_model`). With ``shared``, the
+        weights that another process published with :meth:`share_weights`
+        are used in place instead of loading ``model_name``'s; the processor
+        and everything that holds decoding state are still this process's own.
+        With ``runaway_guard``, windows that fall into a repetition loop are
+        ended early (see :class:`RunawayGuard`); it is never applied with an
+        assistant model.
+        """
+        try:
+            with METRICS.span("model_load", model=model_name) as span:
+                if compile and assistant_name:
+                    raise ValueError("Compilation cannot be combined with speculative decoding")
+                device = cls.get_device(device_arg)
+                snapshot = cls.read_snapshot(model_name)
+                if snapshot is not None and precision == "auto":
+                    # A snapshot defaults to the precision it was written for
+                    precision = snapshot["precision"]
+                precision = cls.resolve_precision(precision, device)
+                dtype = cls.get_torch_dtype(device, precision)
+                span.update(device=device, dtype=str(dtype), precision=precision)
+
+                if batch_size is None:
+                    batch_size = CONFIG['processing'].batch_size
+                    profile = TuningProfile.load(model_name, device, precision)
+                    if profile is not None:
+                        batch_size = profile["batch_size"]
+                        logger.info(f"Using tuned batch size {batch_size} from {profile['created']}")
+                span["batch_size"] = batch_size
+
+                if shared is not None:
+                    if device != "cpu":
+                        raise ValueError(f"Shared weights live in CPU memory; cannot use them on {device}")
+                    logger.info(f"Attaching to the shared weights of {model_name} ({precision} precision)")
+                    model = cls._attach_weights(shared, dtype)
+                    span["shared_weights"] = True
+                else:
+                    logger.info(f"Loading model {model_name} on {device} with {dtype} ({precision} precision)")
+
+                    load_kwargs = {}
+                    if snapshot is not None:
+                        # Memory-map the weights straight onto the device, without any hub lookups
+                        load_kwargs = {"local_files_only": True, "device_map": device}
+                        span["snapshot"] = True
+                        if snapshot["dtype"] != str(dtype):
+                            logger.warning(
+                                f"Snapshot {model_name} holds {snapshot['dtype']} weights; "
+                                f"converting them to {dtype} on every load"
+                            )
+
+                    model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                        model_name,
+                        torch_dtype=dtype,
+                        low_cpu_mem_usage=True,
+                        use_safetensors=True,
+                        **load_kwargs
+                    )
+                    model.to(device)
+                    model = cls.apply_precision(model, precision)
+                if compile:
+                    cls.compile_model(model, device)
+                METRICS.instrument_module(model.get_encoder(), "encoder")
+                METRICS.instrument_module(model.get_decoder(), "decoder")
+
+                processor = AutoProcessor.from_pretrained(model_name, local_files_only=snapshot is not None)
+
+                speculative = None
+                if assistant_name:
+                    assistant = cls.load_assistant(assistant_name, model, dtype, device, precision)
+                    speculative = SpeculativeStats(model, assistant)
+                    span["assistant_model"] = assistant_name
+
+                guard = None
+                if runaway_guard and speculative is None:
+                    # Assisted generation verifies drafts position by position, which the guard does not follow
+                    guard = RunawayGuard(
+                        processor.tokenizer, model.generation_config, model.config.max_target_positions
+                    )
+                    if not guard.enabled:
+                        guard = None
+
+                pipe = cls.create_pipeline(model, processor, dtype, device, speculative, batch_size, guard)
+
+                if compile:
+                    logger.info(f"Compiling the encoder and decoder for batch size {batch_size}")
+                    seconds = cls.warm_up(model, processor, pipe.generation_config, device, dtype, batch_size)
+                    logger.info(f"Model compiled in {seconds:.1f}s")
+                    span["compile_seconds"] = round(seconds, 3)
 
-            pipe = cls.create_pipeline(model, processor, dtype, device)
+                front_end = MelFrontEnd(
+                    processor.feature_extractor, device if CONFIG['processing'].feature_device == "model" else "cpu"
+                )
 
-            return ModelResources(model, processor, pipe, device, dtype)
+                return ModelResources(
+                    model, processor, pipe, device, dtype, model_name, precision, speculative, batch_size, compile,
+                    guard, front_end
+                )
 
         except Exception as e:
             logger.error(f"Failed to initialize model: {str(e)}")
@@ -0,0 +1,269 @@
+# core/runaway.py
+from typing import Any, Dict, List, Optional
+import logging
+import threading
+import zlib
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList
+from config.settings import CONFIG
+from utils.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+class RunawayGuard(LogitsProcessor):
+    """
+    End the decoding of a window that has fallen into a hallucination loop.
+
+    On silence and noise Whisper tends to repeat one phrase until the window
+    runs out of tokens. After every decoding step the text tokens generated so
+    far for each window are checked: a window is stopped once its tail is one
+    n-gram repeated ``max_repeats`` times in a row (spanning at least
+    ``min_tokens``), or once its text compresses with zlib better than
+    ``compression_ratio``, the threshold openai-whisper uses to reject a
+    decoding. Every token generated after the prompt counts, special tokens
+    included. An open segment is closed with the most likely timestamp and
+    the window then ended with EOS, so stitching sees regular segments; the
+    loop's first repeats stay in the text.
+
+    The checks are incremental: each hypothesis keeps its timestamp count,
+    text tokens and repeat runs between steps and only the newest token is
+    looked at, so a step costs the same at the end of a window as at its
+    start. That state belongs to the decoding pass of the calling thread, so
+    one instance serves every ``generate`` call. It runs after Whisper's own
+    logits processors and only overrides the scores of the hypotheses it stops.
+    With beam search each beam is checked on its own and follows its parent
+    when the beams are reordered; a window is counted once per decoding pass,
+    when the first of its beams is stopped. Whisper starts every pass by
+    calling :meth:`set_begin_index`, which resets the state and that count.
+    """
+
+    def __init__(
+            self,
+            tokenizer,
+            generation_config,
+            max_length: int,
+            max_repeats: int = CONFIG['processing'].runaway_max_repeats,
+            min_tokens: int = CONFIG['processing'].runaway_min_tokens,
+            max_ngram: int = CONFIG['processing'].runaway_max_ngram,
+            compression_ratio: float = CONFIG['processing'].runaway_compression_ratio
+    ):
+        self.tokenizer = tokenizer
+        self.generation_config = generation_config
+        self.eos_token_id = generation_config.eos_token_id
+        self.no_timestamps_token_id = generation_config.no_timestamps_token_id
+        self.timestamp_begin = generation_config.no_timestamps_token_id + 1
+        self.max_length = max_length
+        self.max_repeats = max_repeats
+        self.min_tokens = min_tokens
+        self.max_ngram = max_ngram
+        self.compression_ratio = compression_ratio
+        # The longest tail the repetition check looks at
+        self._tail = max((n * self._copies(n) for n in range(1, max_ngram + 1)), default=0) if max_repeats else 0
+
+        self._lock = threading.Lock()
+        self._pass = threading.local()
+        self.windows_stopped = 0
+        self.tokens_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_repeats or self.compression_ratio)
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """The thresholds that decide which windows are stopped, for cache keys."""
+        return {
+            "max_repeats": self.max_repeats,
+            "min_tokens": self.min_tokens,
+            "max_ngram": self.max_ngram,
+            "compression_ratio": self.compression_ratio,
+        }
+
+    def _copies(self, n: int) -> int:
+        """Repeats of an ``n``-token n-gram that make a loop."""
+        return max(self.max_repeats, -(-self.min_tokens // n))
+
+    def is_repeating(self, text_tokens: List[int]) -> bool:
+        """Whether ``text_tokens`` end with one n-gram repeated often enough to be a loop."""
+        if not self.max_repeats:
+            return False
+        tail = text_tokens[-self._tail:]
+        for n in range(1, min(self.max_ngram, len(tail)) + 1):
+            copies = self._copies(n)
+            if n * copies > len(tail):
+                continue
+            ngram = tail[-n:]
+            if all(tail[-(i + 1) * n:len(tail) - i * n] == ngram for i in range(1, copies)):
+                return True
+        return False
+
+    def is_compressible(self, text_tokens: List[int]) -> bool:
+        """Whether the text of ``text_tokens`` compresses better than the threshold."""
+        if not self.compression_ratio:
+            return False
+        text = self.tokenizer.decode(text_tokens).encode('utf-8')
+        return len(text) > 0 and len(text) / len(zlib.compress(text)) > self.compression_ratio
+
+    def set_begin_index(self, begin_index: int) -> None:
+        """Called by Whisper's ``generate`` with the prompt length before each pass over a batch of windows."""
+        self._pass.begin = begin_index
+        self._pass.stopped = set()
+        self._pass.rows = None
+        self._pass.previous = None
+
+    def _start(self, token_ids: List[int], begin: int) -> "_Hypothesis":
+        """State of one hypothesis built from all of its tokens, at the first step of a pass."""
+        state = _Hypothesis(self.no_timestamps_token_id not in token_ids[:begin or None], self.max_ngram)
+        for token in token_ids[begin:]:
+            self._advance(state, token)
+        state.compressible = self._check_compression(state)
+        return state
+
+    def _advance(self, state: "_Hypothesis", token: int) -> bool:
+        """Add the next token of a hypothesis; returns whether it was a text token."""
+        if token == self.eos_token_id:
+            state.finished = True
+        if state.finished:
+            return False
+        if token >= self.timestamp_begin:
+            state.timestamps += 1
+            if state.timed:
+                return False
+        # runs[n - 1] counts the trailing tokens equal to the token n positions earlier
+        text = state.text
+        for n in range(1, len(state.runs) + 1):
+            state.runs[n - 1] = state.runs[n - 1] + 1 if len(text) >= n and text[-n] == token else 0
+        text.append(token)
+        return True
+
+    def _check_repeats(self, state: "_Hypothesis") -> bool:
+        """:meth:`is_repeating` of the hypothesis' text, from its repeat runs."""
+        if not self.max_repeats:
+            return False
+        count = len(state.text)
+        for n, run in enumerate(state.runs, start=1):
+            copies = self._copies(n)
+            if count >= n * copies and run >= (copies - 1) * n:
+                return True
+        return False
+
+    def _check_compression(self, state: "_Hypothesis") -> bool:
+        # Decoding the text is the expensive check; every 8 text tokens is often enough
+        return len(state.text) % 8 == 0 and self.is_compressible(state.text)
+
+    def _parents(self, input_ids: torch.LongTensor, previous: torch.LongTensor, num_beams: int) -> List[Optional[int]]:
+        """Row of the previous step each beam continues, or None for a beam that continues none of them."""
+        windows = input_ids.shape[0] // num_beams
+        current = input_ids[:, :-1].reshape(windows, num_beams, 1, -1)
+        before = previous.reshape(windows, 1, num_beams, -1)
+        matches = (current == before).all(dim=-1)
+        parents = matches.int().argmax(dim=-1) + torch.arange(windows, device=matches.device)[:, None] * num_beams
+        return [
+            parent if found else None
+            for parent, found in zip(parents.flatten().tolist(), matches.any(dim=-1).flatten().tolist())
+        ]
+
+    def _states(self, input_ids: torch.LongTensor, num_beams: int, begin: int) -> List["_Hypothesis"]:
+        """The state of every row of ``input_ids``, advanced by the token this step added."""
+        rows = getattr(self._pass, "rows", None)
+        previous = getattr(self._pass, "previous", None)
+        if rows is None or len(rows) != input_ids.shape[0] or previous.shape[1] + 1 != input_ids.shape[1]:
+            rows = [self._start(token_ids, begin) for token_ids in input_ids.tolist()]
+        else:
+            if num_beams > 1:
+                # Beam search reorders its rows at every step; each beam takes over its parent's state
+                parents = self._parents(input_ids, previous, num_beams)
+                taken = set()
+                reordered = []
+                for parent in parents:
+                    if parent is None:
+                        reordered.append(None)
+                    else:
+                        reordered.append(rows[parent].copy() if parent in taken else rows[parent])
+                        taken.add(parent)
+                rows = reordered
+            for row, token in enumerate(input_ids[:, -1].tolist()):
+                state = rows[row]
+                if state is None:
+                    rows[row] = self._start(input_ids[row].tolist(), begin)
+                elif self._advance(state, token):
+                    state.compressible = self._check_compression(state)
+        self._pass.rows = rows
+        self._pass.previous = input_ids
+        return rows
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        # Beam search passes the beams of each window as consecutive rows
+        num_beams = self.generation_config.num_beams or 1
+        if input_ids.shape[0] % num_beams:
+            num_beams = 1
+        counted = getattr(self._pass, "stopped", None)
+        if counted is None:
+            counted = self._pass.stopped = set()
+        begin = getattr(self._pass, "begin", 0)
+
+        stopped = 0
+        saved = 0
+        for row, state in enumerate(self._states(input_ids, num_beams, begin)):
+            if state.finished or not (self._check_repeats(state) or state.compressible):
+                continue
+
+            last = int(input_ids[row, -1])
+            timestamp_scores = scores[row, self.timestamp_begin:]
+            forced = self.eos_token_id
+            # Timestamps come in pairs around each segment, so an odd count means one is open
+            if (state.timed and state.timestamps % 2 and last < self.timestamp_begin
+                    and torch.isfinite(timestamp_scores).any()):
+                # Close the open segment first; the next step sees the same text and ends the window
+                forced = self.timestamp_begin + int(timestamp_scores.argmax())
+            elif row // num_beams not in counted:
+                counted.add(row // num_beams)
+                stopped += 1
+                saved += max(self.max_length - input_ids.shape[1], 0)
+            scores[row] = -float("inf")
+            scores[row, forced] = 0.0
+
+        if stopped:
+            self.record(stopped, saved)
+        return scores
+
+    def record(self, windows: int, tokens: int) -> None:
+        """Count windows stopped early, here or by the guard of a worker process."""
+        with self._lock:
+            self.windows_stopped += windows
+            self.tokens_saved += tokens
+        METRICS.increment("runaway_windows_stopped", windows)
+        METRICS.increment("runaway_tokens_saved", tokens)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"windows_stopped": self.windows_stopped, "tokens_saved": self.tokens_saved}
+
+    @staticmethod
+    def summarize(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+        """Windows stopped and decoding steps saved between two snapshots."""
+        return {key: after[key] - before[key] for key in after}
+
+    def generate_kwargs(self) -> Dict[str, Any]:
+        """Arguments that add this guard to a ``generate`` call."""
+        return {"logits_processor": LogitsProcessorList([self])}
+
+class _Hypothesis:
+    """What :class:`RunawayGuard` knows about one decoding row, updated one token at a time."""
+
+    def __init__(self, timed: bool, max_ngram: int):
+        self.timed = timed
+        self.finished = False
+        self.timestamps = 0
+        self.text: List[int] = []
+        self.runs = [0] * max_ngram
+        self.compressible = False
+
+    def copy(self) -> "_Hypothesis":
+        other = _Hypothesis(self.timed, 0)
+        other.finished = self.finished
+        other.timestamps = self.timestamps
+        other.text = list(self.text)
+        other.runs = list(self.runs)
+        other.compressible = self.compressible
+        return other
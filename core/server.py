@@ -0,0 +1,427 @@
+# core/server.py
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+import numpy as np
+import torch
+from config.settings import CONFIG
+from core.audio_converter import AudioConverter
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker, Window
+from core.model_handler import ModelResources
+from utils.metrics import METRICS, PREFIX
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _Request:
+    request_id: int
+    generate_kwargs: Dict[str, Any]
+    num_windows: int
+    audio_seconds: float
+    submitted: float
+    future: Future = field(default_factory=Future)
+    outputs: Dict[int, Tuple[torch.Tensor, Tuple[int, int, int]]] = field(default_factory=dict)
+    settled: bool = False  # counted as completed or failed
+
+@dataclass
+class _WindowJob:
+    request: _Request
+    window: Window
+    samples: np.ndarray
+
+class ServerStats:
+    """Thread-safe counters for queue depth, batch fill and request latency."""
+
+    def __init__(self, batch_size: int, latency_window: int = CONFIG['server'].latency_window):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self.requests_completed = 0
+        self.requests_failed = 0
+        self.batches = 0
+        self.windows = 0
+
+    def record_batch(self, size: int) -> None:
+        with self._lock:
+            self.batches += 1
+            self.windows += size
+
+    def record_request(self, latency: float, failed: bool = False) -> None:
+        with self._lock:
+            if failed:
+                self.requests_failed += 1
+            else:
+                self.requests_completed += 1
+                self._latencies.append(latency)
+
+    def snapshot(self, queue_depth: int, in_flight: int) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            fill_ratio = self.windows / (self.batches * self.batch_size) if self.batches else 0.0
+
+            def percentile(p: float) -> Optional[float]:
+                if not latencies:
+                    return None
+                return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)], 4)
+
+            return {
+                "queue_depth": queue_depth,
+                "requests_in_flight": in_flight,
+                "requests_completed": self.requests_completed,
+                "requests_failed": self.requests_failed,
+                "batches": self.batches,
+                "windows": self.windows,
+                "batch_size": self.batch_size,
+                "batch_fill_ratio": round(fill_ratio, 4),
+                "latency_p50_s": percentile(0.50),
+                "latency_p95_s": percentile(0.95),
+                "latency_max_s": round(latencies[-1], 4) if latencies else None,
+            }
+
+    @staticmethod
+    def to_prometheus(snapshot: Dict[str, Any]) -> str:
+        """Render a snapshot as Prometheus gauges, followed by the process-wide stage metrics."""
+        lines = []
+        for name, value in snapshot.items():
+            if value is None:
+                continue
+            lines += [f"# TYPE {PREFIX}_server_{name} gauge", f"{PREFIX}_server_{name} {value}"]
+        return "\n".join(lines) + "\n" + METRICS.to_prometheus()
+
+class MicroBatcher:
+    """
+    Merge windows from concurrent requests into model batches.
+
+    Each request is split into the same overlapping windows the pipeline uses.
+    A single worker thread owns the model: it waits for the first queued window,
+    keeps collecting until the batch is full or ``max_wait_s`` has passed, runs
+    generation, and resolves every request whose windows are all done with its
+    own stitched result. Once a request has failed or its future has been
+    cancelled, its remaining windows are dropped without being decoded.
+    """
+
+    def __init__(
+            self,
+            resources: ModelResources,
+            batch_size: int = CONFIG['processing'].batch_size,
+            max_wait_s: float = CONFIG['server'].max_batch_wait_ms / 1000
+    ):
+        self.resources = resources
+        self.batch_size = batch_size
+        self.max_wait_s = max_wait_s
+        self.stats = ServerStats(batch_size)
+        self._queue: "queue.Queue[Optional[_WindowJob]]" = queue.Queue()
+        self._ids = count(1)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, audio: np.ndarray, language: str, task: str) -> Future:
+        """Queue decoded audio for transcription; the future resolves to ``{'text', 'chunks'}``."""
+        windows = list(Chunker.iter_windows(len(audio)))
+        request = _Request(
+            request_id=next(self._ids),
+            generate_kwargs=AudioProcessor.build_generate_kwargs(language, task),
+            num_windows=len(windows),
+            audio_seconds=len(audio) / CONFIG['audio'].sample_rate,
+            submitted=time.perf_counter(),
+        )
+        if not windows:
+            request.future.set_exception(ValueError("Empty audio"))
+            return request.future
+
+        with self._lock:
+            self._in_flight += 1
+        for window in windows:
+            self._queue.put(_WindowJob(request, window, audio[window.start:window.end]))
+        return request.future
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = self._in_flight
+        return self.stats.snapshot(self._queue.qsize(), in_flight)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self) -> Optional[List[_WindowJob]]:
+        """Block for the first window, then fill the batch until it is full or the deadline passes."""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Windows of one generate call must share language and task
+            groups: Dict[str, List[_WindowJob]] = {}
+            for job in batch:
+                if job.request.future.done():
+                    # Failed or cancelled: its other windows are not worth decoding
+                    self._settle(job.request, failed=True)
+                    continue
+                key = json.dumps(job.request.generate_kwargs, sort_keys=True)
+                groups.setdefault(key, []).append(job)
+
+            for jobs in groups.values():
+                self._run_group(jobs)
+
+    def _run_group(self, jobs: List[_WindowJob]) -> None:
+        try:
+            features = Chunker.extract_features(self.resources, [job.samples for job in jobs])
+            tokens = Chunker.generate(self.resources, features, jobs[0].request.generate_kwargs)
+        except Exception as e:
+            logger.error(f"Batch of {len(jobs)} windows failed: {str(e)}")
+            for request in {id(job.request): job.request for job in jobs}.values():
+                self._fail(request, e)
+            return
+
+        self.stats.record_batch(len(jobs))
+        logger.debug(f"Ran batch of {len(jobs)}/{self.batch_size} windows, queue depth {self._queue.qsize()}")
+
+        for job, job_tokens in zip(jobs, tokens):
+            request = job.request
+            if request.future.done():
+                self._settle(request, failed=True)
+                continue
+            request.outputs[job.window.index] = (job_tokens, job.window.stride)
+            if len(request.outputs) == request.num_windows:
+                self._complete(request)
+
+    def _complete(self, request: _Request) -> None:
+        try:
+            ordered = [request.outputs[index] for index in range(request.num_windows)]
+            result = Chunker.stitch(self.resources, ordered)
+        except Exception as e:
+            self._fail(request, e)
+            return
+
+        # Once running, the future can no longer be cancelled by the client
+        if not request.future.set_running_or_notify_cancel():
+            self._settle(request, failed=True)
+            return
+        self._settle(request, failed=False)
+        logger.info(
+            f"Request {request.request_id}: {request.audio_seconds:.1f}s audio, "
+            f"{request.num_windows} windows, latency {time.perf_counter() - request.submitted:.2f}s"
+        )
+        request.future.set_result(result)
+
+    def _fail(self, request: _Request, error: Exception) -> None:
+        if self._settle(request, failed=True) and request.future.set_running_or_notify_cancel():
+            request.future.set_exception(error)
+
+    def _settle(self, request: _Request, failed: bool) -> bool:
+        """Count a request as finished, once; returns False if it already was."""
+        with self._lock:
+            if request.settled:
+                return False
+            request.settled = True
+            self._in_flight -= 1
+        self.stats.record_request(time.perf_counter() - request.submitted, failed=failed)
+        return True
+
+class TranscriptionRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API of the transcription server.
+
+    POST /transcribe   body is an audio file (any container ffmpeg reads), or JSON
+                       ``{"path": ...}`` naming a file under the server's
+                       ``path_root``; ``language`` and ``task`` come from the
+                       query string or the JSON body
+    GET  /metrics      queue depth, batch fill ratio and latency percentiles;
+                       ``?format=prometheus`` adds per-stage timings in the
+                       Prometheus text format
+    GET  /health       liveness probe
+    """
+
+    server_version = "whisper-gpu"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        path = url.path
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/metrics" and parse_qs(url.query).get("format") == ["prometheus"]:
+            body = ServerStats.to_prometheus(self.server.batcher.metrics()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/metrics":
+            self._send_json(200, self.server.batcher.metrics())
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {path}"})
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/transcribe":
+            self._send_json(404, {"error": f"Unknown endpoint: {url.path}"})
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                job = json.loads(body)
+                params = {**params, **job}
+                path = self._local_path(job["path"])
+                if path is None:
+                    return
+                audio = AudioConverter.load_audio(path)
+            else:
+                audio = AudioConverter.decode_bytes(body)
+        except Exception as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        language = params.get("language", CONFIG['processing'].default_language)
+        task = params.get("task", "transcribe")
+        if task not in ("transcribe", "translate"):
+            self._send_json(400, {"error": f"Unsupported task: {task}"})
+            return
+
+        start = time.perf_counter()
+        try:
+            result = self.server.batcher.submit(audio, language, task).result()
+        except Exception as e:
+            logger.error(f"Transcription failed: {str(e)}")
+            self._send_json(500, {"error": str(e)})
+            return
+
+        self._send_json(200, {**result, "latency_s": round(time.perf_counter() - start, 4)})
+
+    def _local_path(self, requested: str) -> Optional[Path]:
+        """
+        Resolve a requested file under the server's path root.
+
+        Relative paths are taken relative to the root. Symlinks and ``..``
+        are resolved before the check, so nothing outside the root can be
+        read. Sends a 403 response and returns None if path input is
+        disabled or the file is outside the root.
+        """
+        root = self.server.path_root
+        if root is None:
+            self._send_json(403, {"error": "Path input is disabled; start the server with --path-root "
+                                           "or send the audio as the request body"})
+            return None
+        path = (root / requested).resolve()
+        if not path.is_relative_to(root):
+            self._send_json(403, {"error": f"Path is outside the server's path root: {requested}"})
+            return None
+        return path
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class TranscriptionServer:
+    """Long-running HTTP service that keeps one set of model resources warm."""
+
+    def __init__(
+            self,
+            resources: ModelResources,
+            host: str = CONFIG['server'].host,
+            port: int = CONFIG['server'].port,
+            socket_path: Optional[Path] = None,
+            batch_size: int = CONFIG['processing'].batch_size,
+            max_wait_ms: int = CONFIG['server'].max_batch_wait_ms,
+            path_root: Optional[Path] = CONFIG['server'].path_root
+    ):
+        """
+        Args:
+            resources: Initialized model resources
+            host: Address to listen on
+            port: TCP port to listen on
+            socket_path: Listen on this Unix socket instead of TCP
+            batch_size: Maximum number of windows per model batch
+            max_wait_ms: Longest time a batch waits to fill before it runs
+            path_root: Directory that ``{"path": ...}`` requests may read from;
+                None accepts audio in the request body only
+        """
+        self.batcher = MicroBatcher(resources, batch_size, max_wait_ms / 1000)
+
+        if socket_path:
+            socket_path = Path(socket_path)
+            if socket_path.exists():
+                socket_path.unlink()
+            self.httpd = _UnixHTTPServer(str(socket_path), TranscriptionRequestHandler)
+            self.address = str(socket_path)
+        else:
+            self.httpd = ThreadingHTTPServer((host, port), TranscriptionRequestHandler)
+            self.httpd.daemon_threads = True
+            self.address = f"http://{host}:{self.httpd.server_address[1]}"
+        self.httpd.batcher = self.batcher
+        self.httpd.path_root = Path(path_root).expanduser().resolve() if path_root else None
+        self.socket_path = socket_path
+
+    def serve_forever(self) -> None:
+        logger.info(
+            f"Serving on {self.address} (batch size {self.batcher.batch_size}, "
+            f"max wait {self.batcher.max_wait_s * 1000:.0f} ms)"
+        )
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self) -> None:
+        """Stop serve_forever from another thread."""
+        self.httpd.shutdown()
+
+    def close(self) -> None:
+        self.httpd.server_close()
+        self.batcher.close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
@@ -0,0 +1,206 @@
+# core/sharding.py
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import os
+import time
+import numpy as np
+import torch
+from config.settings import CONFIG
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker, Window
+from core.model_handler import ModelHandler, ModelResources
+from core.runaway import RunawayGuard
+from core.variants import SharedEncoder, Variant
+from utils.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Model resources of a shard worker process, loaded once by its initializer
+_worker_resources: Optional[ModelResources] = None
+
+def _init_worker(
+        model_name: str,
+        precision: str,
+        threads: int,
+        batch_size: int,
+        compile: bool,
+        shared: Optional[Dict[str, Any]],
+        runaway_guard: bool
+) -> None:
+    global _worker_resources
+    from utils.logging_config import setup_logging
+    setup_logging()
+    torch.set_num_threads(threads)
+    _worker_resources = ModelHandler.initialize(
+        model_name, "cpu", precision, batch_size=batch_size, compile=compile, shared=shared,
+        runaway_guard=runaway_guard
+    )
+
+def _transcribe_shard(
+        samples: np.ndarray,
+        offset: int,
+        windows: List[Window],
+        generate_kwargs: List[Dict[str, Any]],
+        batch_size: int,
+        timestamps: str
+) -> Tuple[List[List[Tuple]], float, Optional[Dict[str, int]]]:
+    """
+    Generate the windows of one shard; ``samples`` start at sample ``offset`` of the recording.
+
+    Every batch of windows is decoded once per entry of ``generate_kwargs``,
+    with one encoder pass for all of them. Returns the outputs of each entry,
+    the seconds spent and what the worker's runaway guard stopped.
+    """
+    start = time.perf_counter()
+    guard = _worker_resources.guard
+    before = guard.snapshot() if guard else None
+    outputs: List[List[Tuple]] = [[] for _ in generate_kwargs]
+    for i in range(0, len(windows), batch_size):
+        batch = windows[i:i + batch_size]
+        features = Chunker.extract_features(
+            _worker_resources,
+            [samples[w.start - offset:w.end - offset] for w in batch]
+        )
+        with SharedEncoder(_worker_resources.model) if len(generate_kwargs) > 1 else nullcontext():
+            for variant_outputs, kwargs in zip(outputs, generate_kwargs):
+                variant_outputs.extend(Chunker.decode(_worker_resources, features, batch, kwargs, timestamps))
+    stopped = RunawayGuard.summarize(before, guard.snapshot()) if guard else None
+    return outputs, time.perf_counter() - start, stopped
+
+class ShardedTranscriber:
+    """
+    Transcribe one recording with several CPU worker processes.
+
+    The recording's windows are split into contiguous shards, one per worker.
+    Each worker runs the model with a small ``torch.set_num_threads``, which
+    scales better on many-core machines than one model using every core.
+    Given the ``shared`` weights of :meth:`ModelHandler.share_weights`, the
+    workers use the parent's copy of the weights in shared memory, so an
+    extra worker costs only its activations, KV cache and pipeline state;
+    otherwise each worker loads its own copy. Neighbouring windows overlap by
+    the stride, so the shards overlap too; the per-window tokens are merged in
+    order by the pipeline's stitching, which removes the duplicated text at
+    the shard boundaries and keeps timestamps global. The result is the same
+    as that of the overlap engine.
+    """
+
+    def __init__(
+            self,
+            model_name: str,
+            precision: str = CONFIG['processing'].precision,
+            shards: int = CONFIG['processing'].shards,
+            threads_per_shard: Optional[int] = CONFIG['processing'].shard_threads,
+            batch_size: int = CONFIG['processing'].batch_size,
+            compile: bool = CONFIG['processing'].compile,
+            shared: Optional[Dict[str, Any]] = None,
+            runaway_guard: bool = CONFIG['processing'].runaway_guard
+    ):
+        self.shards = max(shards, 1)
+        self.threads_per_shard = threads_per_shard or max((os.cpu_count() or 1) // self.shards, 1)
+        self.batch_size = batch_size
+        logger.info(
+            f"Starting {self.shards} shard workers with {self.threads_per_shard} threads each"
+            + (", sharing one copy of the weights" if shared is not None else "")
+        )
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.shards,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, precision, self.threads_per_shard, batch_size, compile, shared, runaway_guard)
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ShardedTranscriber":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def split(self, windows: List[Window]) -> List[List[Window]]:
+        """Split windows into at most ``shards`` contiguous runs of nearly equal length."""
+        count = min(self.shards, len(windows))
+        bounds = np.linspace(0, len(windows), count + 1).round().astype(int)
+        return [windows[bounds[i]:bounds[i + 1]] for i in range(count)]
+
+    def transcribe(
+            self,
+            resources: ModelResources,
+            audio: np.ndarray,
+            variants: Sequence[Variant],
+            timestamps: str = CONFIG['processing'].timestamps
+    ) -> List[Dict[str, Any]]:
+        """
+        Transcribe ``audio`` across the shard workers.
+
+        Args:
+            resources: Model resources of this process, used for stitching
+            audio: Decoded mono samples at the configured sample rate
+            variants: Languages and tasks to decode; each worker encodes a
+                window once for all of them
+            timestamps: "none", "segment" or "word"
+
+        Returns:
+            One result dictionary per variant
+        """
+        try:
+            audio_seconds = len(audio) / CONFIG['audio'].sample_rate
+            shards = self.split(list(Chunker.iter_windows(len(audio))))
+            logger.info(f"Processing {audio_seconds:.1f}s of decoded audio in {len(shards)} shards")
+            for variant in variants:
+                logger.info(f"Task: {variant.task}, Language: {variant.language}")
+            generate_kwargs = [AudioProcessor.build_generate_kwargs(v.language, v.task) for v in variants]
+
+            with METRICS.span("inference", engine="sharded",
+                              language=",".join(dict.fromkeys(v.language for v in variants)),
+                              task=",".join(dict.fromkeys(v.task for v in variants)),
+                              audio_seconds=round(audio_seconds, 3), shards=len(shards)) as span:
+                futures = [
+                    self._executor.submit(
+                        _transcribe_shard,
+                        np.ascontiguousarray(audio[shard[0].start:shard[-1].end]),
+                        shard[0].start,
+                        shard,
+                        generate_kwargs,
+                        self.batch_size,
+                        timestamps
+                    )
+                    for shard in shards
+                ]
+
+                outputs: List[List[Tuple]] = [[] for _ in variants]
+                for index, (shard, future) in enumerate(zip(shards, futures)):
+                    shard_outputs, seconds, stopped = future.result()
+                    if stopped and resources.guard is not None:
+                        resources.guard.record(stopped["windows_stopped"], stopped["tokens_saved"])
+                    logger.info(
+                        f"Shard {index + 1}/{len(shards)}: {len(shard)} windows from "
+                        f"{shard[0].start / CONFIG['audio'].sample_rate:.1f}s to "
+                        f"{shard[-1].end / CONFIG['audio'].sample_rate:.1f}s in {seconds:.1f}s"
+                    )
+                    for variant_outputs, variant_shard_outputs in zip(outputs, shard_outputs):
+                        variant_outputs.extend(variant_shard_outputs)
+
+                results = [
+                    Chunker.stitch(resources, variant_outputs, timestamps) if variant_outputs
+                    else {"text": "", "chunks": []}
+                    for variant_outputs in outputs
+                ]
+                tokens = sum(
+                    Chunker.count_generated(resources, output[0])
+                    for variant_outputs in outputs for output in variant_outputs
+                )
+                span["tokens"] = tokens
+                # Workers count into their own registries
+                METRICS.increment("tokens_generated", tokens)
+                METRICS.increment("audio_seconds", audio_seconds)
+            logger.info("Audio processing completed successfully")
+            return results
+
+        except Exception as e:
+            logger.error(f"Error processing audio: {str(e)}")
+            raise RuntimeError(f"Audio processing failed: {str(e)}") from e
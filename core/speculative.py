@@ -0,0 +1,123 @@
+# core/speculative.py
+from typing import Any, Dict
+import logging
+import threading
+import time
+import torch
+from transformers import GenerationMixin
+
+logger = logging.getLogger(__name__)
+
+class SpeculativeStats:
+    """
+    Acceptance statistics for speculative (assisted) decoding.
+
+    Each verification pass of the main decoder emits the accepted draft tokens
+    plus one token of its own, so ``accepted = emitted - main passes``. Emitted
+    tokens are counted exactly by acting as the ``streamer`` of ``generate``,
+    and main and assistant passes are counted with forward hooks on the two
+    decoders. The speedup is estimated by pricing plain greedy decoding at one
+    main decoder pass per emitted token.
+    """
+
+    def __init__(self, model: torch.nn.Module, assistant_model: torch.nn.Module):
+        self.assistant_model = assistant_model
+        self._lock = threading.Lock()
+        self._prompt_pending = True
+        self.emitted_tokens = 0
+        self.main_passes = 0
+        self.main_seconds = 0.0
+        self.draft_passes = 0
+        self.assistant_seconds = 0.0
+
+        self._hook(model.get_decoder(), "main_passes", "main_seconds")
+        self._hook(assistant_model.get_decoder(), "draft_passes", "assistant_seconds")
+        # The assistant also encodes every window; that is part of its cost
+        self._hook(assistant_model.get_encoder(), None, "assistant_seconds")
+        self._patch_drafting(assistant_model)
+
+    def _hook(self, module: torch.nn.Module, count_attr, seconds_attr: str) -> None:
+        local = threading.local()
+
+        def before(*_) -> None:
+            local.start = time.perf_counter()
+
+        def after(*_) -> None:
+            elapsed = time.perf_counter() - local.start
+            with self._lock:
+                if count_attr:
+                    setattr(self, count_attr, getattr(self, count_attr) + 1)
+                setattr(self, seconds_attr, getattr(self, seconds_attr) + elapsed)
+
+        module.register_forward_pre_hook(before)
+        module.register_forward_hook(after)
+
+    @staticmethod
+    def _patch_drafting(assistant_model: torch.nn.Module) -> None:
+        """
+        Make the assistant's drafting calls safe for Whisper.
+
+        The candidate generator calls the assistant's ``generate`` with the
+        main model's logits processors. Whisper's own ``generate`` resets their
+        ``begin_index`` to the current length, which breaks the timestamp rules
+        of the main model's verification, so drafts are generated with the
+        plain ``GenerationMixin.generate`` instead. That call only trims the
+        cached prefix off ``decoder_input_ids`` when a decoder mask of the same
+        length is passed; without one every round re-feeds the whole sequence
+        on top of the cache.
+        """
+        def generate(*args, **kwargs):
+            decoder_input_ids = kwargs.get("decoder_input_ids")
+            if decoder_input_ids is not None and kwargs.get("decoder_attention_mask") is None:
+                kwargs["decoder_attention_mask"] = torch.ones_like(decoder_input_ids)
+            return GenerationMixin.generate(assistant_model, *args, **kwargs)
+
+        assistant_model.generate = generate
+
+    def generate_kwargs(self) -> Dict[str, Any]:
+        """Arguments that turn a ``generate`` call into speculative decoding with these statistics."""
+        return {"assistant_model": self.assistant_model, "streamer": self}
+
+    # Streamer protocol of ``generate``: the first call carries the prompt
+    def put(self, value: torch.Tensor) -> None:
+        with self._lock:
+            if self._prompt_pending:
+                self._prompt_pending = False
+                return
+            self.emitted_tokens += value.numel()
+
+    def end(self) -> None:
+        with self._lock:
+            self._prompt_pending = True
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "emitted_tokens": self.emitted_tokens,
+                "main_passes": self.main_passes,
+                "main_seconds": self.main_seconds,
+                "draft_passes": self.draft_passes,
+                "assistant_seconds": self.assistant_seconds,
+            }
+
+    @staticmethod
+    def summarize(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, float]:
+        """
+        Statistics for the work done between two snapshots.
+
+        Returns:
+            Dictionary with the emitted and drafted tokens, the acceptance rate,
+            tokens per main decoder pass and the estimated decoder speedup over
+            greedy decoding
+        """
+        delta = {key: after[key] - before[key] for key in after}
+        accepted = max(delta["emitted_tokens"] - delta["main_passes"], 0)
+        spent = delta["main_seconds"] + delta["assistant_seconds"]
+        greedy = delta["emitted_tokens"] * delta["main_seconds"] / delta["main_passes"] if delta["main_passes"] else 0.0
+        return {
+            "emitted_tokens": int(delta["emitted_tokens"]),
+            "drafted_tokens": int(delta["draft_passes"]),
+            "acceptance_rate": accepted / delta["draft_passes"] if delta["draft_passes"] else 0.0,
+            "tokens_per_main_pass": delta["emitted_tokens"] / delta["main_passes"] if delta["main_passes"] else 0.0,
+            "estimated_speedup": greedy / spent if spent else 0.0,
+        }
@@ -0,0 +1,203 @@
+# core/vad.py
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import numpy as np
+from config.settings import CONFIG, VadConfig
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SpeechTimeline:
+    """
+    Mapping between the packed speech-only audio and the original recording.
+
+    Region ``i`` occupies ``packed_starts[i]:packed_starts[i] + lengths[i]`` in
+    the packed audio and starts at ``original_starts[i]`` in the original, all
+    in samples.
+    """
+    packed_starts: List[int]
+    original_starts: List[int]
+    lengths: List[int]
+    total_samples: int
+    sample_rate: int
+
+    @property
+    def speech_samples(self) -> int:
+        return sum(self.lengths)
+
+    @property
+    def skipped_seconds(self) -> float:
+        return (self.total_samples - self.speech_samples) / self.sample_rate
+
+    def to_original(self, seconds: Optional[float], is_end: bool = False) -> Optional[float]:
+        """Map a time in the packed audio back onto the original timeline."""
+        if seconds is None or not self.lengths:
+            return seconds
+
+        sample = seconds * self.sample_rate
+        index = bisect_right(self.packed_starts, sample) - 1
+        # An end time on a region boundary belongs to the region before it
+        if is_end and index > 0 and sample <= self.packed_starts[index]:
+            index -= 1
+        index = max(index, 0)
+
+        offset = min(max(sample - self.packed_starts[index], 0), self.lengths[index])
+        return round((self.original_starts[index] + offset) / self.sample_rate, 2)
+
+    def restore(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Rewrite every chunk timestamp of a pipeline result onto the original timeline."""
+        chunks = []
+        for chunk in result.get('chunks', []):
+            start, end = chunk['timestamp']
+            chunks.append({
+                **chunk,
+                'timestamp': (self.to_original(start), self.to_original(end, is_end=True)),
+            })
+        return {**result, 'chunks': chunks}
+
+class VoiceActivityDetector:
+    """
+    Energy and spectral based speech detector, vectorised in NumPy.
+
+    A frame counts as speech when its level is well above the recording's noise
+    floor, a reasonable share of its energy falls in the speech band and its
+    spectrum is not flat like broadband noise. The frame decisions are then
+    smoothed: speech regions are padded, short gaps are bridged and very short
+    bursts are dropped.
+    """
+
+    def __init__(self, config: Optional[VadConfig] = None, sample_rate: int = CONFIG['audio'].sample_rate):
+        self.config = config or CONFIG['vad']
+        self.sample_rate = sample_rate
+        self.frame_length = int(self.config.frame_ms * sample_rate / 1000)
+
+    def _frame_features(self, audio: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return per-frame level (dBFS), speech-band energy ratio and spectral flatness."""
+        num_frames = len(audio) // self.frame_length
+        frames = audio[:num_frames * self.frame_length].reshape(num_frames, self.frame_length)
+
+        level_db = np.empty(num_frames, dtype=np.float32)
+        band_ratio = np.empty(num_frames, dtype=np.float32)
+        flatness = np.empty(num_frames, dtype=np.float32)
+
+        freqs = np.fft.rfftfreq(self.frame_length, 1 / self.sample_rate)
+        band = (freqs >= self.config.speech_band_hz[0]) & (freqs <= self.config.speech_band_hz[1])
+        window = np.hanning(self.frame_length).astype(np.float32)
+        eps = 1e-10
+
+        # Bounded blocks keep the FFT working set small for multi-hour recordings
+        block = self.config.block_frames
+        for start in range(0, num_frames, block):
+            chunk = frames[start:start + block]
+            rms = np.sqrt(np.mean(np.square(chunk, dtype=np.float32), axis=1))
+            level_db[start:start + block] = 20 * np.log10(rms + eps)
+
+            power = np.abs(np.fft.rfft(chunk * window, axis=1)) ** 2 + eps
+            total = power.sum(axis=1)
+            band_ratio[start:start + block] = power[:, band].sum(axis=1) / total
+            flatness[start:start + block] = np.exp(np.mean(np.log(power), axis=1)) / (total / power.shape[1])
+
+        return level_db, band_ratio, flatness
+
+    def _smooth(self, speech: np.ndarray) -> np.ndarray:
+        """Pad speech frames, bridge short pauses and drop short bursts."""
+        frame_ms = self.config.frame_ms
+        pad = int(self.config.speech_pad_ms / frame_ms)
+        min_silence = int(self.config.min_silence_ms / frame_ms)
+        min_speech = int(self.config.min_speech_ms / frame_ms)
+
+        if pad:
+            # Dilate: a frame is speech if any frame within `pad` of it is
+            kernel = np.ones(2 * pad + 1, dtype=np.int32)
+            speech = np.convolve(speech.astype(np.int32), kernel, mode='same') > 0
+
+        runs = self._runs(speech)
+        for start, end, value in runs:
+            if not value and end - start < min_silence and start > 0 and end < len(speech):
+                speech[start:end] = True
+        for start, end, value in self._runs(speech):
+            if value and end - start < min_speech:
+                speech[start:end] = False
+        return speech
+
+    @staticmethod
+    def _runs(mask: np.ndarray) -> List[Tuple[int, int, bool]]:
+        """Split a boolean mask into (start, end, value) runs."""
+        if not len(mask):
+            return []
+        boundaries = np.flatnonzero(np.diff(mask.astype(np.int8))) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(mask)]])
+        return [(int(s), int(e), bool(mask[s])) for s, e in zip(starts, ends)]
+
+    def detect(self, audio: np.ndarray) -> List[Tuple[int, int]]:
+        """
+        Find speech regions in mono audio.
+
+        Args:
+            audio: 1-D float32 samples
+
+        Returns:
+            List of (start, end) sample indices of speech regions, in order
+        """
+        if len(audio) < self.frame_length:
+            return [(0, len(audio))] if len(audio) else []
+
+        level_db, band_ratio, flatness = self._frame_features(audio)
+
+        # Per-frame spectral estimates are noisy; average them over a short span
+        span = max(int(self.config.feature_smoothing_ms / self.config.frame_ms), 1)
+        if span > 1:
+            kernel = np.full(span, 1 / span, dtype=np.float32)
+            band_ratio = np.convolve(band_ratio, kernel, mode='same')
+            flatness = np.convolve(flatness, kernel, mode='same')
+
+        noise_floor = np.percentile(level_db, self.config.noise_floor_percentile)
+        threshold = max(noise_floor + self.config.energy_margin_db, self.config.min_level_db)
+
+        speech = (
+            (level_db > threshold)
+            & (band_ratio >= self.config.min_speech_band_ratio)
+            & (flatness <= self.config.max_flatness)
+        )
+        speech = self._smooth(speech)
+
+        regions = []
+        for start, end, value in self._runs(speech):
+            if value:
+                end_sample = len(audio) if end == len(speech) else end * self.frame_length
+                regions.append((start * self.frame_length, end_sample))
+        return regions
+
+    def pack(self, audio: np.ndarray) -> Tuple[np.ndarray, SpeechTimeline]:
+        """
+        Concatenate the speech regions of ``audio`` and return the timeline to map results back.
+
+        Args:
+            audio: 1-D float32 samples
+
+        Returns:
+            Tuple of (speech-only samples, timeline)
+        """
+        regions = self.detect(audio)
+
+        packed_starts, original_starts, lengths = [], [], []
+        position = 0
+        for start, end in regions:
+            packed_starts.append(position)
+            original_starts.append(start)
+            lengths.append(end - start)
+            position += end - start
+
+        packed = np.concatenate([audio[start:end] for start, end in regions]) if regions \
+            else np.zeros(0, dtype=np.float32)
+        timeline = SpeechTimeline(packed_starts, original_starts, lengths, len(audio), self.sample_rate)
+
+        total_seconds = len(audio) / self.sample_rate
+        logger.info(
+            f"VAD kept {len(regions)} speech regions, skipped {timeline.skipped_seconds:.1f}s "
+            f"of {total_seconds:.1f}s ({100 * timeline.skipped_seconds / total_seconds if total_seconds else 0:.0f}%)"
+        )
+        return packed, timeline
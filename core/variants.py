@@ -0,0 +1,120 @@
+# core/variants.py
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+import functools
+import logging
+import threading
+import weakref
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+from utils.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# One SharedEncoder at a time may replace the forward of an encoder
+_encoder_locks: "weakref.WeakKeyDictionary[torch.nn.Module, threading.Lock]" = weakref.WeakKeyDictionary()
+_encoder_locks_lock = threading.Lock()
+
+@dataclass(frozen=True)
+class Variant:
+    """One decoding of a recording: the language it is in and the task."""
+    language: str
+    task: str
+    label: Optional[str] = None  # added to the output file names when a recording is decoded several ways
+
+    @classmethod
+    def expand(cls, languages: Union[str, Sequence[str]], tasks: Union[str, Sequence[str]]) -> List["Variant"]:
+        """
+        Every combination of ``languages`` and ``tasks``.
+
+        With a single combination the variant has no label, so its outputs
+        keep their usual names. Otherwise each label holds the language, the
+        task or both, whichever has several values, e.g. ``de.translate``.
+        """
+        languages = [languages] if isinstance(languages, str) else list(dict.fromkeys(languages))
+        tasks = [tasks] if isinstance(tasks, str) else list(dict.fromkeys(tasks))
+        if len(languages) == 1 and len(tasks) == 1:
+            return [cls(languages[0], tasks[0])]
+        return [
+            cls(language, task, ".".join(
+                ([language] if len(languages) > 1 else []) + ([task] if len(tasks) > 1 else [])
+            ))
+            for language in languages
+            for task in tasks
+        ]
+
+class SharedEncoder:
+    """
+    Reuse the encoder output of each window across the decodings of one batch.
+
+    Whisper's ``generate`` runs the encoder on the log-mel features it is
+    given, so decoding the same windows for several languages or tasks would
+    encode them once per decoding. Within this context the encoder remembers
+    its output for every window it encodes, and a call whose windows have all
+    been encoded before returns the remembered outputs instead. Windows are
+    matched by their features, not by tensor identity, because ``generate``
+    slices and pads its input before encoding it; a window that Whisper
+    decodes again from a later offset has other features and is encoded as
+    usual. Reused outputs carry the encoder's last hidden state only, which is
+    all the decoder and the word alignment read. Use as a context manager.
+
+    The encoder is shared with every thread that runs the model, such as the
+    server's batcher. Only the thread that entered the context is served
+    remembered outputs; other threads calling the encoder meanwhile run its
+    own forward. Entering waits while another thread holds a context on the
+    same encoder, so one context at a time replaces its forward.
+    """
+
+    def __init__(self, model):
+        self.encoder = model.get_encoder()
+        self.reused = 0
+        self._windows: List[torch.Tensor] = []
+        self._states: List[torch.Tensor] = []
+        self._restore = None
+        self._owner: Optional[int] = None
+        with _encoder_locks_lock:
+            self._lock = _encoder_locks.setdefault(self.encoder, threading.Lock())
+
+    def _lookup(self, window: torch.Tensor) -> Optional[torch.Tensor]:
+        for features, state in zip(self._windows, self._states):
+            if features.shape == window.shape and torch.equal(features, window):
+                return state
+        return None
+
+    def __enter__(self) -> "SharedEncoder":
+        self._lock.acquire()
+        self._owner = threading.get_ident()
+        # A compiled encoder has its forward as an instance attribute; put back whichever was there
+        self._restore = self.encoder.__dict__.get("forward")
+        forward = self.encoder.forward
+
+        @functools.wraps(forward)
+        def shared_forward(input_features=None, *args, **kwargs):
+            if (threading.get_ident() != self._owner or input_features is None
+                    or args or kwargs.get("output_hidden_states")):
+                return forward(input_features, *args, **kwargs)
+            states = [self._lookup(window) for window in input_features]
+            if all(state is not None for state in states):
+                self.reused += len(states)
+                METRICS.increment("encoder_windows_reused", len(states))
+                return BaseModelOutput(last_hidden_state=torch.stack(states))
+
+            output = forward(input_features, *args, **kwargs)
+            self._windows.extend(input_features)
+            self._states.extend(output[0])
+            return output
+
+        self.encoder.forward = shared_forward
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            if self._restore is not None:
+                self.encoder.forward = self._restore
+            else:
+                del self.encoder.forward
+        finally:
+            self._owner = None
+            self._windows = []
+            self._states = []
+            self._lock.release()
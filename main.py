@@ -1,72 +1,565 @@
 # main.py
 import argparse
 import logging
+import sys
+from contextlib import nullcontext
 from pathlib import Path
 from datetime import datetime
 from utils.logging_config import setup_logging
-from core.model_handler import ModelHandler
-from core.audio_converter import AudioConverter
-from config.settings import CONFIG
-from utils.file_handlers import save_results
+from config.settings import CONFIG, OUTPUT_FORMATS, PRECISIONS, TIMESTAMP_MODES
+from utils.inputs import InputResolver
+
+# torch and transformers take seconds to import, so the modules that use them
+# are imported inside the commands, after the arguments have been checked
 
 logger = logging.getLogger(__name__)
 
-def parse_arguments() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Audio processing with Whisper model")
+TASKS = ("transcribe", "translate")
+
+def comma_list(value: str) -> list:
+    """Split a comma-separated option value, e.g. ``de,fr``."""
+    values = [item.strip() for item in value.split(",") if item.strip()]
+    if not values:
+        raise argparse.ArgumentTypeError(f"expected one or more comma-separated values, got {value!r}")
+    return values
+
+def task_list(value: str) -> list:
+    tasks = comma_list(value)
+    unknown = [task for task in tasks if task not in TASKS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"invalid task {unknown[0]!r} (choose from {', '.join(TASKS)})")
+    return tasks
+
+def parse_arguments(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Audio processing with Whisper model",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="other commands (see `main.py COMMAND --help`):\n" + "\n".join(
+            f"  {name:<10}{command.__doc__}" for name, command in COMMANDS.items()
+        )
+    )
     parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"],
                         default="auto", help="Device to use for processing")
-    parser.add_argument("--language", default=CONFIG['processing'].default_language,
-                        help="Language of the audio")
+    parser.add_argument("--language", type=comma_list, default=CONFIG['processing'].default_language,
+                        help="Language of the audio; several, separated by commas, are each decoded "
+                             "(e.g. de,fr)")
     parser.add_argument("--model", default=CONFIG['processing'].default_model,
                         help="Model name or path")
-    parser.add_argument("--input", required=True, type=Path,
-                        help="Input audio file path")
-    parser.add_argument("--task", choices=["transcribe", "translate"],
-                        required=True, help="Task to perform")
+    parser.add_argument("--precision", choices=PRECISIONS, default=CONFIG['processing'].precision,
+                        help="Inference precision: auto (fp16 on GPUs, fp32 on CPU), fp32, bf16, "
+                             "or dynamic-int8 (CPU only)")
+    parser.add_argument("--assistant-model",
+                        help="Small model sharing the main model's tokenizer that drafts tokens for speculative "
+                             "decoding; implies greedy decoding, one window at a time")
+    parser.add_argument("--compile", action="store_true", default=CONFIG['processing'].compile,
+                        help="torch.compile the encoder and decoder with a static KV cache; the first run on "
+                             "a host compiles, later runs load the kernels from the compile cache")
+    parser.add_argument("--runaway-guard", action=argparse.BooleanOptionalAction,
+                        default=CONFIG['processing'].runaway_guard,
+                        help="End the decoding of a window once its text repeats itself in a loop, as Whisper "
+                             "tends to on silence and noise; not applied with --assistant-model")
+    parser.add_argument("--input", required=True, nargs="+",
+                        help="Input audio file(s), directories, glob patterns or manifest files")
+    parser.add_argument("--task", type=task_list, required=True, metavar="{transcribe,translate}",
+                        help="Task to perform; transcribe,translate decodes both from one encoder pass "
+                             "and writes a set of outputs for each")
     parser.add_argument("--output", type=Path,
-                        help="Output file path for the result")
-    return parser.parse_args()
+                        help="Output file path for the result (a directory when several inputs are given)")
+    parser.add_argument("--batch-size", type=int,
+                        help="Number of 30-second windows per model batch (default: the autotune profile "
+                             f"of this host and model, else {CONFIG['processing'].batch_size})")
+    parser.add_argument("--formats", nargs="+", choices=OUTPUT_FORMATS,
+                        help="Output formats written next to each other in one pass "
+                             f"(default: {' '.join(CONFIG['output'].formats)}; txt with --timestamps none)")
+    parser.add_argument("--timestamps", choices=TIMESTAMP_MODES, default=CONFIG['processing'].timestamps,
+                        help="Timestamp granularity: none decodes text only (fastest, txt output only), "
+                             "segment [default], or word, which adds word alignment")
+    parser.add_argument("--decode", choices=["pcm", "mp3"], default=CONFIG['audio'].decode_mode,
+                        help="Decode straight to in-memory PCM, or convert through an intermediate MP3 file")
+    parser.add_argument("--prefetch", type=int, default=CONFIG['processing'].prefetch_files,
+                        help="Number of files to convert and decode ahead of inference")
+    parser.add_argument("--engine", choices=["pipeline", "overlap", "direct"], default=CONFIG['processing'].engine,
+                        help="Inference engine: the transformers pipeline, feature extraction "
+                             "overlapped with generation, or the model driven directly without the pipeline")
+    parser.add_argument("--preprocess-workers", type=int, default=CONFIG['processing'].preprocess_workers,
+                        help="Feature extraction threads for --engine overlap")
+    parser.add_argument("--prefetch-batches", type=int, default=CONFIG['processing'].prefetch_batches,
+                        help="Feature batches prepared ahead of the model for --engine overlap")
+    parser.add_argument("--long-file", action="store_true",
+                        help="Decode to a memory-mapped PCM file on disk and read windows lazily, "
+                             "so memory stays flat for multi-hour recordings")
+    parser.add_argument("--shards", type=int, default=CONFIG['processing'].shards,
+                        help="Split each recording between this many CPU worker processes")
+    parser.add_argument("--shard-threads", type=int, default=CONFIG['processing'].shard_threads,
+                        help="Torch threads per shard worker (default: CPU cores divided by --shards)")
+    parser.add_argument("--share-weights", action=argparse.BooleanOptionalAction,
+                        default=CONFIG['processing'].share_weights,
+                        help="Let the shard workers use this process's weights in shared memory "
+                             "instead of loading a copy each")
+    parser.add_argument("--vad", action=argparse.BooleanOptionalAction, default=CONFIG['vad'].enabled,
+                        help="Skip silence and background noise before transcription")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write segments as they are decoded; an --input of '-' reads stdin")
+    parser.add_argument("--follow", action="store_true",
+                        help="With --stream, keep reading an input file that is still being written")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always transcribe, bypassing the result cache")
+    parser.add_argument("--cache-dir", type=Path, default=Path(CONFIG['cache'].directory),
+                        help="Directory of the transcription result cache")
+    parser.add_argument("--cache-size-mb", type=int, default=CONFIG['cache'].max_size_mb,
+                        help="Maximum size of the result cache before least recently used entries are evicted")
+    parser.add_argument("--feature-cache", action=argparse.BooleanOptionalAction,
+                        default=CONFIG['cache'].features_enabled,
+                        help="Keep the log-mel features of every window on disk, so runs on the same audio "
+                             "with another task, language or model of the same mel size skip feature extraction")
+    parser.add_argument("--feature-cache-dir", type=Path, default=Path(CONFIG['cache'].feature_directory),
+                        help="Directory of the feature cache")
+    parser.add_argument("--feature-cache-size-mb", type=int, default=CONFIG['cache'].feature_max_size_mb,
+                        help="Maximum size of the feature cache before least recently used entries are evicted")
+    parser.add_argument("--index", type=Path, nargs="?", const=Path(CONFIG['index'].database), metavar="DB",
+                        help="Also add every transcribed segment to this SQLite transcript index for "
+                             f"`main.py search` (default database: {CONFIG['index'].database})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Record every decoded window in a journal, and continue from it "
+                             "when an interrupted job is run again")
+    parser.add_argument("--journal-dir", type=Path, default=Path(CONFIG['cache'].journal_directory),
+                        help="Directory of the --resume journals")
+    parser.add_argument("--metrics-log", type=Path,
+                        help="Append per-stage timing records to this file as JSON lines")
+    parser.add_argument("--metrics-file", type=Path,
+                        help="Write stage timings and counters to this file in Prometheus text format")
+    parser.add_argument("--profile", type=Path, metavar="DIR",
+                        help="Capture a torch.profiler trace of the run into this directory")
+    args = parser.parse_args(argv)
+    if args.formats is None:
+        args.formats = ["txt"] if args.timestamps == "none" else list(CONFIG['output'].formats)
+    return args
 
-def main() -> None:
-    setup_logging()
-    args = parse_arguments()
+def parse_serve_arguments(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py serve",
+                                     description="Run a resident transcription server")
+    parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"],
+                        default="auto", help="Device to use for processing")
+    parser.add_argument("--model", default=CONFIG['processing'].default_model,
+                        help="Model name or path")
+    parser.add_argument("--precision", choices=PRECISIONS, default=CONFIG['processing'].precision,
+                        help="Inference precision: auto (fp16 on GPUs, fp32 on CPU), fp32, bf16, "
+                             "or dynamic-int8 (CPU only)")
+    parser.add_argument("--assistant-model",
+                        help="Small model sharing the main model's tokenizer that drafts tokens for speculative "
+                             "decoding; implies greedy decoding, one window at a time")
+    parser.add_argument("--compile", action="store_true", default=CONFIG['processing'].compile,
+                        help="torch.compile the encoder and decoder with a static KV cache; the first run on "
+                             "a host compiles, later runs load the kernels from the compile cache")
+    parser.add_argument("--runaway-guard", action=argparse.BooleanOptionalAction,
+                        default=CONFIG['processing'].runaway_guard,
+                        help="End the decoding of a window once its text repeats itself in a loop, as Whisper "
+                             "tends to on silence and noise; not applied with --assistant-model")
+    parser.add_argument("--host", default=CONFIG['server'].host,
+                        help="Address to listen on")
+    parser.add_argument("--port", type=int, default=CONFIG['server'].port,
+                        help="TCP port to listen on")
+    parser.add_argument("--socket", type=Path, default=CONFIG['server'].socket_path,
+                        help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--batch-size", type=int,
+                        help="Maximum number of 30-second windows per model batch (default: the autotune "
+                             f"profile of this host and model, else {CONFIG['processing'].batch_size})")
+    parser.add_argument("--max-wait-ms", type=int, default=CONFIG['server'].max_batch_wait_ms,
+                        help="Longest time to wait for a batch to fill before running it")
+    parser.add_argument("--path-root", type=Path, default=CONFIG['server'].path_root,
+                        help="Let JSON requests name a file to transcribe under this directory; without it, "
+                             "audio is only accepted in the request body")
+    parser.add_argument("--metrics-log", type=Path,
+                        help="Append per-stage timing records to this file as JSON lines")
+    return parser.parse_args(argv)
+
+def serve(argv: list) -> None:
+    """Run a resident transcription server."""
+    args = parse_serve_arguments(argv)
+
+    from core.model_handler import ModelHandler
+    from core.server import TranscriptionServer
+    from utils.metrics import log_records_to
+
+    if args.metrics_log:
+        log_records_to(args.metrics_log)
+
+    resources = ModelHandler.initialize(
+        args.model, args.device, args.precision, args.assistant_model, args.batch_size, args.compile,
+        runaway_guard=args.runaway_guard
+    )
+    logger.info(f"Model initialized on {resources.device}")
+
+    server = TranscriptionServer(
+        resources,
+        host=args.host,
+        port=args.port,
+        socket_path=args.socket,
+        batch_size=resources.batch_size,
+        max_wait_ms=args.max_wait_ms,
+        path_root=args.path_root
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Server stopped")
+
+def stream(args: argparse.Namespace) -> None:
+    if len(args.input) != 1:
+        raise ValueError("--stream takes exactly one input")
+    if args.vad:
+        logger.warning("--vad is not applied in --stream mode")
+    if args.timestamps != "segment":
+        raise ValueError("--stream writes segment timestamps only")
+
+    from core.batch_processor import BatchProcessor
+    from core.model_handler import ModelHandler
+    from utils.transcript_index import TranscriptIndex
+
+    resources = ModelHandler.initialize(
+        args.model, args.device, args.precision, args.assistant_model, args.batch_size, args.compile,
+        runaway_guard=args.runaway_guard
+    )
+    logger.info(f"Model initialized on {resources.device}")
+
+    with TranscriptIndex(args.index) if args.index else nullcontext() as index:
+        processor = BatchProcessor(
+            resources, args.language, args.task, args.output, formats=args.formats, timestamps=args.timestamps,
+            index=index
+        )
+        file_result = processor.stream(args.input[0], follow=args.follow)
+    for name, path in file_result.output_paths.items():
+        logger.info(f"  {name.upper()}: {path}")
+
+def transcribe(argv: list) -> None:
+    args = parse_arguments(argv)
+    inputs = None
+    if not args.stream:
+        try:
+            inputs = InputResolver.resolve(args.input)
+        except FileNotFoundError as e:
+            logger.error(f"Processing failed: {str(e)}")
+            sys.exit(1)
+
+    from core.batch_processor import BatchProcessor
+    from core.model_handler import ModelHandler
+    from core.sharding import ShardedTranscriber
+    from core.vad import VoiceActivityDetector
+    from utils.metrics import METRICS, log_records_to, profile
+    from utils.feature_cache import FeatureCache
+    from utils.result_cache import ResultCache
+    from utils.transcript_index import TranscriptIndex
+
+    if args.metrics_log:
+        log_records_to(args.metrics_log)
 
     try:
         start_time = datetime.now()
         logger.info(f"Starting processing at {start_time}")
 
-        # Initialize model resources
-        resources = ModelHandler.initialize(args.model, args.device)
-        logger.info(f"Model initialized on {resources.device}")
+        if args.stream:
+            stream(args)
+            return
 
-        # Process audio file
-        input_file = AudioConverter.ensure_compatible_audio(args.input)
-        logger.info(f"Processing file: {input_file}")
+        logger.info(f"Found {len(inputs)} input file(s)")
 
-        # Process audio and generate output
-        result = resources.pipeline(
-            str(input_file),
-            return_timestamps=True,
-            generate_kwargs={"language": args.language, "task": args.task}
+        # Initialize model resources once for every input
+        resources = ModelHandler.initialize(
+            args.model, args.device, args.precision, args.assistant_model, args.batch_size, args.compile,
+            runaway_guard=args.runaway_guard
         )
+        logger.info(f"Model initialized on {resources.device}")
+
+        if args.long_file and args.vad:
+            logger.warning("--vad holds the speech regions of --long-file inputs in memory")
+
+        sharder = None
+        if args.shards > 1:
+            if args.resume:
+                raise ValueError("--resume cannot be combined with --shards")
+            if args.assistant_model:
+                raise ValueError("--assistant-model cannot be combined with --shards")
+            if resources.device != "cpu":
+                logger.warning(f"--shards runs its workers on the CPU, not on {resources.device}")
+            shared = None
+            if args.share_weights:
+                try:
+                    shared = ModelHandler.share_weights(resources.model)
+                except ValueError as e:
+                    logger.warning(f"Each shard worker loads its own copy of the model: {str(e)}")
+            sharder = ShardedTranscriber(
+                args.model,
+                precision=args.precision,
+                shards=args.shards,
+                threads_per_shard=args.shard_threads,
+                batch_size=resources.batch_size,
+                compile=args.compile,
+                runaway_guard=args.runaway_guard,
+                shared=shared
+            )
+
+        cache = None
+        if CONFIG['cache'].enabled and not args.no_cache:
+            cache = ResultCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+
+        feature_cache = None
+        if args.feature_cache:
+            if sharder is not None:
+                logger.warning("--shards workers compute their own features; the feature cache is not used")
+            else:
+                feature_cache = FeatureCache(args.feature_cache_dir, args.feature_cache_size_mb * 1024 * 1024)
 
-        # Save results in both formats
-        vtt_path, text_path = save_results(
-            result,
-            input_file,
-            args.output
+        index = TranscriptIndex(args.index) if args.index else None
+
+        processor = BatchProcessor(
+            resources,
+            args.language,
+            args.task,
+            args.output,
+            prefetch=args.prefetch,
+            decode_mode=args.decode,
+            cache=cache,
+            vad=VoiceActivityDetector() if args.vad else None,
+            engine=args.engine,
+            preprocess_workers=args.preprocess_workers,
+            prefetch_batches=args.prefetch_batches,
+            long_file=args.long_file,
+            sharder=sharder,
+            journal_dir=args.journal_dir if args.resume else None,
+            formats=args.formats,
+            timestamps=args.timestamps,
+            feature_cache=feature_cache,
+            index=index
         )
+        try:
+            if args.profile:
+                with profile(args.profile):
+                    results = processor.run(inputs)
+                logger.info(f"Profiler trace written to {args.profile}")
+            else:
+                results = processor.run(inputs)
+        finally:
+            if sharder is not None:
+                sharder.close()
+            if index is not None:
+                index.close()
 
         processing_time = datetime.now() - start_time
         logger.info(f"Processing completed in {processing_time}")
         logger.info(f"Results saved to:")
-        logger.info(f"  VTT: {vtt_path}")
-        logger.info(f"  Text: {text_path}")
+        for file_result in results:
+            if file_result.error is None:
+                for name, path in file_result.output_paths.items():
+                    logger.info(f"  {name.upper()}: {path}")
+
+        failed = [r for r in results if r.error is not None]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(results)} files failed")
 
     except Exception as e:
         logger.error(f"Processing failed: {str(e)}", exc_info=True)
         raise
 
+    finally:
+        if args.metrics_file:
+            METRICS.write_prometheus(args.metrics_file)
+
+def parse_snapshot_arguments(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py snapshot",
+                                     description="Write a local, ready-to-load copy of a model")
+    parser.add_argument("--model", default=CONFIG['processing'].default_model,
+                        help="Model name or path to copy")
+    parser.add_argument("--output", type=Path, required=True,
+                        help="Directory to write the snapshot to; pass it as --model in later runs")
+    parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"],
+                        default="auto", help="Device the snapshot is prepared for")
+    parser.add_argument("--precision", choices=PRECISIONS, default=CONFIG['processing'].precision,
+                        help="Precision the snapshot is prepared for")
+    return parser.parse_args(argv)
+
+def snapshot(argv: list) -> None:
+    """Write a local, ready-to-load copy of a model."""
+    args = parse_snapshot_arguments(argv)
+
+    from core.model_handler import ModelHandler
+
+    output_dir = ModelHandler.snapshot(args.model, args.output, args.device, args.precision)
+    logger.info(f"Snapshot written to {output_dir}; use it with --model {output_dir}")
+
+def parse_autotune_arguments(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py autotune",
+                                     description="Find the fastest batch size that fits on this machine "
+                                                 "and save it for later runs")
+    parser.add_argument("--model", default=CONFIG['processing'].default_model,
+                        help="Model name or path to tune")
+    parser.add_argument("--device", choices=["cpu", "cuda", "mps", "auto"],
+                        default="auto", help="Device to tune")
+    parser.add_argument("--precision", choices=PRECISIONS, default=CONFIG['processing'].precision,
+                        help="Precision to tune")
+    parser.add_argument("--language", default=CONFIG['processing'].default_language,
+                        help="Language passed to generation")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(CONFIG['tuning'].batch_sizes),
+                        help="Candidate batch sizes, tried from smallest to largest")
+    parser.add_argument("--probe-batches", type=int, default=CONFIG['tuning'].probe_batches,
+                        help="Full batches decoded per candidate")
+    parser.add_argument("--audio", type=Path,
+                        help="Probe with this recording instead of synthetic audio")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report the measurements without saving a profile")
+    return parser.parse_args(argv)
+
+def autotune(argv: list) -> None:
+    """Find and save the fastest batch size for this machine."""
+    args = parse_autotune_arguments(argv)
+
+    from core.audio_converter import AudioConverter
+    from core.autotune import AutoTuner
+    from core.model_handler import ModelHandler
+    from utils.tuning_profile import TuningProfile
+
+    audio = AudioConverter.load_audio(args.audio) if args.audio else None
+    resources = ModelHandler.initialize(args.model, args.device, args.precision)
+    profile = AutoTuner.tune(
+        resources,
+        language=args.language,
+        batch_sizes=args.batch_sizes,
+        probe_batches=args.probe_batches,
+        audio=audio
+    )
+    logger.info(
+        f"Best batch size for {args.model} on {profile['device']}: {profile['batch_size']} "
+        f"({profile['real_time_factor']:.1f}x real time)"
+    )
+    if not args.dry_run:
+        path = TuningProfile.save(profile)
+        logger.info(f"Profile saved to {path}; later runs on this host use it automatically")
+
+def parse_search_arguments(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py search",
+                                     description="Search the transcript index for segments by text and time")
+    parser.add_argument("query", nargs="?",
+                        help="Words that must all occur in a segment; leave out to list segments by time")
+    parser.add_argument("--index", type=Path, default=Path(CONFIG['index'].database), metavar="DB",
+                        help="Transcript index to search")
+    parser.add_argument("--raw-query", action="store_true",
+                        help="Pass the query to SQLite FTS5 as it is: \"phrases\", OR, NOT, NEAR(), prefix*")
+    parser.add_argument("--source",
+                        help="Only segments of this source file; * and ? are wildcards")
+    parser.add_argument("--model", help="Only segments decoded with this model")
+    parser.add_argument("--language", help="Only segments in this language")
+    parser.add_argument("--task", choices=TASKS, help="Only segments of this task")
+    parser.add_argument("--from-ms", type=int,
+                        help="Only segments that end at or after this time, in milliseconds")
+    parser.add_argument("--to-ms", type=int,
+                        help="Only segments that start at or before this time, in milliseconds")
+    parser.add_argument("--limit", type=int, default=CONFIG['index'].search_limit,
+                        help="Maximum number of segments to print")
+    parser.add_argument("--json", action="store_true",
+                        help="Print one JSON object per segment instead of tab-separated lines")
+    args = parser.parse_args(argv)
+    if not args.index.expanduser().exists():
+        parser.error(f"no transcript index at {args.index}; build one with --index or `main.py index`")
+    return args
+
+def search(argv: list) -> None:
+    """Search the transcript index for segments by text and time."""
+    args = parse_search_arguments(argv)
+
+    import json
+    from utils.transcript_index import TranscriptIndex
+
+    with TranscriptIndex(args.index) as index:
+        try:
+            matches = index.search(
+                args.query,
+                source=args.source,
+                model=args.model,
+                language=args.language,
+                task=args.task,
+                start_ms=args.from_ms,
+                end_ms=args.to_ms,
+                limit=args.limit,
+                raw=args.raw_query
+            )
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(2)
+
+    # Results go to stdout on their own so they can be piped; start and end are in milliseconds
+    for match in matches:
+        if args.json:
+            print(json.dumps(match, ensure_ascii=False))
+        else:
+            start = "" if match['start_ms'] is None else match['start_ms']
+            end = "" if match['end_ms'] is None else match['end_ms']
+            text = " ".join(match['text'].split())
+            print(f"{start}\t{end}\t{match['source']}\t{text}")
+
+def parse_index_arguments(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py index",
+                                     description="Add existing WebVTT transcripts to the transcript index")
+    parser.add_argument("inputs", nargs="+",
+                        help="VTT files, directories, glob patterns or manifest files")
+    parser.add_argument("--index", type=Path, default=Path(CONFIG['index'].database), metavar="DB",
+                        help="Transcript index to add to; created if missing")
+    parser.add_argument("--model", help="Model the transcripts were made with")
+    parser.add_argument("--language", help="Language of the transcripts")
+    parser.add_argument("--task", choices=TASKS, help="Task of the transcripts")
+    parser.add_argument("--audio-root", type=Path,
+                        help="Directory of the recordings, when the VTT files are not next to them; each VTT "
+                             "file's recording is looked for at its path relative to --transcript-root")
+    parser.add_argument("--transcript-root", type=Path,
+                        help="Directory the VTT paths are taken relative to with --audio-root "
+                             "(default: the deepest directory holding them all)")
+    parser.add_argument("--batch-files", type=int, default=CONFIG['index'].batch_files,
+                        help="Files added per transaction")
+    return parser.parse_args(argv)
+
+def index(argv: list) -> None:
+    """Add existing WebVTT transcripts to the transcript index."""
+    args = parse_index_arguments(argv)
+    try:
+        paths = InputResolver.resolve(args.inputs, extensions=(".vtt",))
+    except FileNotFoundError as e:
+        logger.error(f"Indexing failed: {str(e)}")
+        sys.exit(1)
+
+    from utils.transcript_index import TranscriptIndex
+
+    start_time = datetime.now()
+    with TranscriptIndex(args.index) as transcript_index:
+        files, segments = transcript_index.import_vtt(
+            paths,
+            model=args.model,
+            language=args.language,
+            task=args.task,
+            batch_files=args.batch_files,
+            audio_root=args.audio_root,
+            transcript_root=args.transcript_root
+        )
+    logger.info(
+        f"Indexed {segments} segments from {files} of {len(paths)} file(s) into {args.index} "
+        f"in {datetime.now() - start_time}"
+    )
+
+COMMANDS = {
+    "serve": serve,
+    "snapshot": snapshot,
+    "autotune": autotune,
+    "search": search,
+    "index": index,
+}
+
+def main() -> None:
+    setup_logging()
+
+    # Subcommands are opt-in; plain `main.py --input ...` keeps transcribing
+    argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+    else:
+        transcribe(argv)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,64 @@
+# tests/conftest.py
+"""
+Shared fixtures: a tiny random Whisper checkpoint and synthetic recordings.
+
+The checkpoint from ``utils.tiny_checkpoint`` has Whisper's tokenizer layout
+and generation config, so every decoding path runs without downloading
+weights. Its transcripts are meaningless, which is fine for tests that
+compare two paths on the same audio.
+"""
+import sys
+from pathlib import Path
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from config.settings import CONFIG  # noqa: E402
+
+SAMPLE_RATE = CONFIG['audio'].sample_rate
+
+def synthetic_audio(seconds: float, seed: int = 0) -> np.ndarray:
+    """Mono float32 samples: tone bursts over low noise, so windows differ from each other."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    bursts = (np.sin(2 * np.pi * 0.25 * t) > 0).astype(np.float32)
+    tone = 0.3 * np.sin(2 * np.pi * (220 + 40 * seed) * t) * bursts
+    return (tone + 0.02 * rng.standard_normal(len(t))).astype(np.float32)
+
+# Random weights rarely emit EOS, so every window would run to Whisper's 448 tokens
+MAX_LENGTH = 48
+
+def tiny_checkpoint(directory: Path, **kwargs) -> Path:
+    """A tiny checkpoint whose windows decode at most ``MAX_LENGTH`` tokens."""
+    from transformers import GenerationConfig
+    from utils.tiny_checkpoint import create_tiny_checkpoint
+    path = create_tiny_checkpoint(directory, **kwargs)
+    generation_config = GenerationConfig.from_pretrained(path)
+    generation_config.max_length = MAX_LENGTH
+    generation_config.save_pretrained(path)
+    return path
+
+@pytest.fixture(scope="session")
+def make_checkpoint():
+    """The :func:`tiny_checkpoint` factory, for tests that need a second model."""
+    return tiny_checkpoint
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory) -> Path:
+    return tiny_checkpoint(tmp_path_factory.mktemp("tiny-whisper"))
+
+@pytest.fixture(scope="session")
+def resources(tiny_model):
+    from core.model_handler import ModelHandler
+    return ModelHandler.initialize(str(tiny_model), "cpu", "fp32", batch_size=2)
+
+@pytest.fixture(scope="session")
+def make_audio():
+    """The :func:`synthetic_audio` factory, for tests that need several recordings."""
+    return synthetic_audio
+
+@pytest.fixture(scope="session")
+def audio() -> np.ndarray:
+    """A recording of three 30-second windows."""
+    return synthetic_audio(65.0)
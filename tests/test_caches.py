@@ -0,0 +1,97 @@
+# tests/test_caches.py
+import os
+import numpy as np
+from core.batch_processor import BatchProcessor
+from utils.feature_cache import FeatureCache
+from utils.result_cache import ResultCache
+
+def entries(directory, pattern):
+    return sorted(path.stem for path in directory.glob(pattern))
+
+def disk_bytes(directory, pattern):
+    return sum(path.stat().st_size for path in directory.glob(pattern))
+
+def result(text):
+    return {"text": text, "chunks": [{"timestamp": [0.0, 1.0], "text": text}]}
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    keys = [f"{i:02d}" + "0" * 62 for i in range(4)]
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    cache.put(keys[0], result("a" * 100))
+    entry_bytes = disk_bytes(tmp_path, '*/*.json')
+    cache.max_bytes = cache.budget.max_bytes = 3 * entry_bytes
+
+    for key in keys[1:3]:
+        cache.put(key, result("b" * 100))
+    for age, key in zip((300, 200, 100), keys):
+        stamp = os.path.getmtime(cache._entry_path(key)) - age
+        os.utime(cache._entry_path(key), (stamp, stamp))
+    # A hit makes the oldest entry the most recently used
+    assert cache.get(keys[0]) == result("a" * 100)
+
+    cache.put(keys[3], result("c" * 100))
+    assert entries(tmp_path, '*/*.json') == [keys[0], keys[2], keys[3]]
+    assert cache.get(keys[1]) is None
+    assert cache.budget._total == disk_bytes(tmp_path, '*/*.json') == 3 * entry_bytes
+
+def test_overwriting_an_entry_counts_its_size_once(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    other = "f" * 64
+    cache.put(other, result("x" * 100))
+    entry_bytes = disk_bytes(tmp_path, '*/*.json')
+    cache.max_bytes = cache.budget.max_bytes = 2 * entry_bytes
+    scans = []
+    scan = cache.budget._scan
+    monkeypatch.setattr(cache.budget, "_scan", lambda: scans.append(1) or scan())
+
+    key = "e" * 64
+    for text in ("y" * 100, "z" * 100, "w" * 100):
+        cache.put(key, result(text))
+    # Both entries fit, so the running total never called for a scan
+    assert scans == []
+    assert entries(tmp_path, '*/*.json') == [key, other]
+    assert cache.budget._total == disk_bytes(tmp_path, '*/*.json')
+    assert cache.get(key) == result("w" * 100)
+
+def test_changed_parameters_miss_the_result_cache(resources, tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    audio = np.zeros(16000, dtype=np.float32)
+
+    def key(**options):
+        processor = BatchProcessor(resources, "en", "transcribe", cache=cache, **options)
+        return ResultCache.make_key(audio, processor._cache_params(processor.variants[0]))
+
+    cache.put(key(), result("segments"))
+    assert cache.get(key()) == result("segments")
+    assert key(timestamps="word") != key()
+    assert cache.get(key(timestamps="word")) is None
+    # Options that do not change the result share the entry
+    assert key(prefetch=4, engine="overlap") == key()
+
+def test_feature_cache_evicts_least_recently_used(tmp_path):
+    shape = (2, 80, 3000)
+    cache = FeatureCache(tmp_path, max_bytes=1 << 40)
+
+    def store(key, value):
+        entry = cache.create(key, shape)
+        entry.write([0, 1], np.full(shape, value, dtype=np.float32))
+        assert entry.commit()
+
+    keys = [f"{i:02d}" + "0" * 62 for i in range(3)]
+    store(keys[0], 0.0)
+    entry_bytes = disk_bytes(tmp_path, '*/*.npy')
+    cache.max_bytes = cache.budget.max_bytes = 2 * entry_bytes
+
+    store(keys[1], 1.0)
+    # Overwriting an entry replaces its bytes instead of adding to them
+    store(keys[1], 2.0)
+    assert entries(tmp_path, '*/*.npy') == keys[:2]
+    assert cache.budget._total == 2 * entry_bytes
+
+    stamp = os.path.getmtime(cache._entry_path(keys[1])) - 100
+    os.utime(cache._entry_path(keys[1]), (stamp, stamp))
+    store(keys[2], 3.0)
+    assert entries(tmp_path, '*/*.npy') == [keys[0], keys[2]]
+    assert cache.get(keys[1], shape) is None
+    assert float(cache.get(keys[2], shape)[1, 0, 0]) == 3.0
+    assert cache.budget._total == disk_bytes(tmp_path, '*/*.npy')
@@ -0,0 +1,31 @@
+# tests/test_engines.py
+import pytest
+from core.audio_processor import AudioProcessor
+from utils.feature_cache import FeatureCache
+
+@pytest.fixture(scope="module", params=["segment", "none", "word"])
+def timestamps(request):
+    return request.param
+
+@pytest.fixture(scope="module")
+def pipeline_result(resources, audio, timestamps):
+    return AudioProcessor.process_audio(resources.pipeline, audio, "en", "transcribe", timestamps)
+
+def test_overlapped_matches_pipeline(resources, audio, timestamps, pipeline_result):
+    result = AudioProcessor.process_audio_overlapped(resources, audio, "en", "transcribe", batch_size=2,
+                                                     timestamps=timestamps)
+    assert result == pipeline_result
+
+def test_direct_matches_pipeline(resources, audio, timestamps, pipeline_result):
+    result = AudioProcessor.process_audio_direct(resources, audio, "en", "transcribe", batch_size=2,
+                                                 timestamps=timestamps)
+    assert result == pipeline_result
+
+def test_direct_from_feature_cache_matches_pipeline(resources, audio, timestamps, pipeline_result, tmp_path):
+    cache = FeatureCache(tmp_path, max_bytes=1 << 30)
+    for _ in range(2):
+        # The first run fills the cache, the second reads every window from it
+        result = AudioProcessor.process_audio_direct(resources, audio, "en", "transcribe", batch_size=2,
+                                                     timestamps=timestamps, feature_cache=cache)
+        assert result == pipeline_result
+    assert list(tmp_path.glob('*/*.npy'))
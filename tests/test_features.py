@@ -0,0 +1,31 @@
+# tests/test_features.py
+import pytest
+import torch
+from core.chunking import Chunker
+from core.features import MelFrontEnd
+
+@pytest.fixture
+def chunks(audio):
+    # Full windows and a short last one, which both paths zero-pad
+    return [audio[w.start:w.end] for w in Chunker.iter_windows(len(audio))] + [audio[:7 * 16000]]
+
+def test_mel_front_end_matches_feature_extractor(resources, chunks):
+    extractor = resources.processor.feature_extractor
+    expected = extractor(chunks, sampling_rate=extractor.sampling_rate, return_tensors="pt",
+                         return_attention_mask=True)
+
+    features = MelFrontEnd(extractor)(chunks)
+
+    assert features["input_features"].dtype == torch.float32
+    torch.testing.assert_close(features["input_features"], expected["input_features"], rtol=0, atol=1e-5)
+    assert torch.equal(features["attention_mask"], expected["attention_mask"].to(torch.int32))
+
+def test_windows_in_blocks_match_one_call(resources, audio):
+    windows = list(Chunker.iter_windows(len(audio)))
+    front_end = MelFrontEnd(resources.processor.feature_extractor, block_windows=2)
+
+    features = front_end.windows(audio, [w.start for w in windows], [w.end for w in windows])
+
+    expected = front_end([audio[w.start:w.end] for w in windows])
+    assert torch.equal(features["input_features"], expected["input_features"])
+    assert torch.equal(features["attention_mask"], expected["attention_mask"])
@@ -0,0 +1,92 @@
+# tests/test_file_handlers.py
+import json
+import pytest
+from config.settings import CONFIG
+from core.audio_processor import AudioProcessor
+from utils.file_handlers import WRITERS, OutputHandler, SegmentWriter, save_results
+
+RESULT = {
+    "text": " Hello there. Last words",
+    "chunks": [
+        {"timestamp": (0.0, 2.5), "text": " Hello there."},
+        # Left open by the pipeline at the end of the recording
+        {"timestamp": (3725.1229, None), "text": " Last words"},
+    ],
+}
+
+def test_format_timestamp():
+    assert OutputHandler._format_timestamp(3725.1229) == "01:02:05.123"
+    assert OutputHandler._format_timestamp(3725.1229, separator=",") == "01:02:05,123"
+    # Rounds to the nearest millisecond, carrying into the seconds
+    assert OutputHandler._format_timestamp(59.9996) == "00:01:00.000"
+    assert OutputHandler._format_timestamp(0.0) == "00:00:00.000"
+
+def test_close_segments_fills_a_missing_final_end():
+    closed = OutputHandler.close_segments(RESULT["chunks"], 3730.004)
+    assert closed[-1]["timestamp"] == (3725.1229, 3730.0)
+    assert closed[0] is RESULT["chunks"][0]
+    assert RESULT["chunks"][-1]["timestamp"] == (3725.1229, None)
+    # Without the duration the segment ends where it starts
+    assert OutputHandler.close_segments(RESULT["chunks"], None)[-1]["timestamp"] == (3725.1229, 3725.1229)
+    assert OutputHandler.close_segments([], 10.0) == []
+
+def test_every_format_is_written_exactly(tmp_path):
+    paths = save_results(RESULT, tmp_path / "talk.wav", formats=("vtt", "srt", "tsv", "json", "txt"), duration=3730.0)
+    assert {name: path.name for name, path in paths.items()} == {
+        "vtt": "talk.vtt", "srt": "talk.srt", "tsv": "talk.tsv", "json": "talk.json", "txt": "talk.txt"
+    }
+    contents = {name: path.read_text(encoding="utf-8") for name, path in paths.items()}
+
+    assert contents["vtt"] == (
+        "WEBVTT\n\n"
+        "1\n00:00:00.000 --> 00:00:02.500\nHello there.\n\n"
+        "2\n01:02:05.123 --> 01:02:10.000\nLast words\n\n"
+    )
+    assert contents["srt"] == (
+        "1\n00:00:00,000 --> 00:00:02,500\nHello there.\n\n"
+        "2\n01:02:05,123 --> 01:02:10,000\nLast words\n\n"
+    )
+    assert contents["tsv"] == "start\tend\ttext\n0\t2500\tHello there.\n3725123\t3730000\tLast words\n"
+    assert json.loads(contents["json"]) == {"segments": [
+        {"id": 1, "start": 0.0, "end": 2.5, "text": "Hello there."},
+        {"id": 2, "start": 3725.1229, "end": 3730.0, "text": "Last words"},
+    ]}
+    assert contents["txt"] == "Hello there. Last words"
+
+def test_empty_result(tmp_path):
+    paths = save_results({"text": "", "chunks": []}, tmp_path / "silence.wav", formats=("json", "vtt", "txt"))
+    assert json.loads(paths["json"].read_text(encoding="utf-8")) == {"segments": []}
+    assert paths["vtt"].read_text(encoding="utf-8") == "WEBVTT\n\n"
+    assert paths["txt"].read_text(encoding="utf-8") == ""
+
+def test_writers_must_write_segments():
+    with pytest.raises(TypeError):
+        SegmentWriter(None)
+
+    class Incomplete(SegmentWriter):
+        suffix = ".x"
+
+    with pytest.raises(TypeError):
+        Incomplete(None)
+    assert all(issubclass(writer, SegmentWriter) for writer in WRITERS.values())
+
+def test_text_is_written_from_the_result_text(tmp_path):
+    # Word chunks are stitched on their own and need not join into the text
+    result = {
+        "text": " Hello there world.",
+        "chunks": [
+            {"timestamp": (0.0, 0.4), "text": " Hello"},
+            {"timestamp": (0.4, 0.8), "text": " there"},
+            {"timestamp": (0.7, 0.8), "text": " there"},
+            {"timestamp": (0.8, 1.2), "text": " world."},
+        ],
+    }
+    paths = save_results(result, tmp_path / "words.wav", formats=("txt", "tsv"))
+    assert paths["txt"].read_text(encoding="utf-8") == "Hello there world."
+    assert paths["tsv"].read_text(encoding="utf-8").count("\n") == 5
+
+def test_word_timestamps_text(resources, audio, tmp_path):
+    result = AudioProcessor.process_audio(resources.pipeline, audio, "en", "transcribe", "word")
+    duration = len(audio) / CONFIG['audio'].sample_rate
+    paths = save_results(result, tmp_path / "words.wav", formats=("txt", "vtt"), duration=duration)
+    assert paths["txt"].read_text(encoding="utf-8") == result["text"].strip()
@@ -0,0 +1,42 @@
+# tests/test_journal.py
+import json
+import pytest
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker
+from utils.journal import ChunkJournal
+
+def tear_after_first_entry(journal):
+    """Keep the first line and half of the second, as a crash mid-write would."""
+    lines = journal.path.read_text(encoding='utf-8').splitlines(keepends=True)
+    journal.path.write_text(lines[0] + lines[1][:len(lines[1]) // 2], encoding='utf-8')
+    return lines
+
+def test_load_discards_torn_last_line(tmp_path):
+    journal = ChunkJournal(tmp_path, "job")
+    journal.append([(0, [1, 2], (0, 5)), (1, [3], (5, 5)), (2, [4, 5], (5, 0))])
+    complete = tear_after_first_entry(journal)[0]
+
+    assert journal.load() == {0: ([1, 2], (0, 5))}
+    # The torn bytes are cut off, so the next entry starts on a fresh line
+    assert journal.path.read_text(encoding='utf-8') == complete
+    journal.append([(1, [3], (5, 5))])
+    assert set(journal.load()) == {0, 1}
+
+def test_load_missing_journal(tmp_path):
+    assert ChunkJournal(tmp_path, "job").load() == {}
+
+@pytest.mark.parametrize("timestamps", ["segment", "word"])
+def test_resume_after_torn_line_matches_full_run(resources, audio, tmp_path, timestamps):
+    windows = len(list(Chunker.iter_windows(len(audio))))
+    journal = ChunkJournal(tmp_path, "job")
+    full = AudioProcessor.process_audio_overlapped(resources, audio, "en", "transcribe", batch_size=1,
+                                                   journal=journal, timestamps=timestamps)
+    tear_after_first_entry(journal)
+
+    resumed = AudioProcessor.process_audio_overlapped(resources, audio, "en", "transcribe", batch_size=1,
+                                                      journal=journal, timestamps=timestamps)
+
+    assert resumed == full
+    # Only the windows after the intact entry are decoded again, so each is recorded once
+    entries = [json.loads(line) for line in journal.path.read_text(encoding='utf-8').splitlines()]
+    assert sorted(entry["index"] for entry in entries) == list(range(windows))
@@ -0,0 +1,44 @@
+# tests/test_long_file.py
+import shutil
+import wave
+import numpy as np
+import pytest
+from config.settings import CONFIG
+from core.audio_converter import AudioConverter
+from core.audio_processor import AudioProcessor
+from core.variants import Variant
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+
+@pytest.fixture
+def wav_path(tmp_path, audio):
+    path = tmp_path / "recording.wav"
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(CONFIG['audio'].sample_rate)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+    return path
+
+def test_mapped_pcm_matches_in_memory_decode(wav_path, tmp_path):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    mapped = AudioConverter.decode_to_mapped_pcm(wav_path, spool)
+
+    assert isinstance(mapped, np.memmap)
+    assert np.array_equal(mapped, AudioConverter.decode_to_pcm(wav_path))
+    # The spool file is unlinked as soon as it is mapped
+    assert not list(spool.iterdir())
+    # Dropping resident pages never changes the samples
+    expected = np.array(mapped)
+    AudioConverter.release_mapped(mapped, len(mapped))
+    assert np.array_equal(mapped, expected)
+
+def test_long_audio_matches_pipeline(resources, wav_path):
+    mapped = AudioConverter.decode_to_mapped_pcm(wav_path)
+
+    result = AudioProcessor.process_long_audio(resources, mapped, [Variant("en", "transcribe")], batch_size=2)[0]
+
+    expected = AudioProcessor.process_audio(resources.pipeline, AudioConverter.decode_to_pcm(wav_path),
+                                            "en", "transcribe")
+    assert result == expected
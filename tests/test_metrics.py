@@ -0,0 +1,53 @@
+# tests/test_metrics.py
+import json
+import logging
+import pytest
+import torch
+from utils.metrics import PREFIX, Metrics
+
+def test_span_records_and_totals(caplog):
+    metrics = Metrics()
+    with caplog.at_level(logging.DEBUG, logger="utils.metrics"):
+        with metrics.span("decode", input="talk.wav") as span:
+            span["tokens"] = 12
+        with pytest.raises(ValueError):
+            with metrics.span("decode"):
+                raise ValueError("bad audio")
+
+    records = [json.loads(record.getMessage()) for record in caplog.records]
+    assert [record["stage"] for record in records] == ["decode", "decode"]
+    assert records[0]["input"] == "talk.wav" and records[0]["tokens"] == 12
+    assert records[0]["duration_s"] >= 0 and records[0]["peak_rss_bytes"] > 0
+    assert "error" not in records[0]
+    assert records[1]["error"] == "bad audio"
+
+    # Failed spans count towards the totals as well
+    text = metrics.to_prometheus()
+    assert f'{PREFIX}_stage_duration_seconds_count{{stage="decode"}} 2' in text.splitlines()
+
+def test_prometheus_export(tmp_path):
+    metrics = Metrics()
+    metrics.observe("encoder", 0.5)
+    metrics.observe("encoder", 1.5)
+    metrics.increment("tokens_generated", 40)
+    metrics.increment("tokens_generated", 2)
+
+    lines = metrics.to_prometheus().splitlines()
+    assert f'{PREFIX}_stage_duration_seconds_sum{{stage="encoder"}} 2.000000' in lines
+    assert f'{PREFIX}_stage_duration_seconds_count{{stage="encoder"}} 2' in lines
+    assert f'{PREFIX}_stage_duration_max_seconds{{stage="encoder"}} 1.500000' in lines
+    assert f"# TYPE {PREFIX}_tokens_generated_total counter" in lines
+    assert f"{PREFIX}_tokens_generated_total 42" in lines
+
+    path = tmp_path / "metrics" / "whisper.prom"
+    metrics.write_prometheus(path)
+    assert path.read_text(encoding="utf-8") == metrics.to_prometheus()
+    assert [p.name for p in path.parent.iterdir()] == ["whisper.prom"]
+
+def test_instrument_module_times_every_forward():
+    metrics = Metrics()
+    module = torch.nn.Linear(4, 4)
+    metrics.instrument_module(module, "linear")
+    for _ in range(3):
+        module(torch.zeros(1, 4))
+    assert f'{PREFIX}_stage_duration_seconds_count{{stage="linear"}} 3' in metrics.to_prometheus().splitlines()
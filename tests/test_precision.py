@@ -0,0 +1,31 @@
+# tests/test_precision.py
+import pytest
+import torch
+from core.audio_processor import AudioProcessor
+from core.model_handler import ModelHandler
+
+@pytest.mark.parametrize("precision, device, dtype", [
+    ("fp32", "cpu", torch.float32),
+    ("bf16", "cpu", torch.bfloat16),
+    ("dynamic-int8", "cpu", torch.float32),
+    ("auto", "cpu", torch.float32),
+    ("auto", "cuda", torch.float16),
+])
+def test_torch_dtype(precision, device, dtype):
+    assert ModelHandler.get_torch_dtype(device, precision) == dtype
+
+def test_resolve_precision_rejects_unsupported_combinations():
+    with pytest.raises(ValueError):
+        ModelHandler.resolve_precision("fp8", "cpu")
+    with pytest.raises(ValueError):
+        ModelHandler.resolve_precision("dynamic-int8", "cuda")
+    assert ModelHandler.resolve_precision("fp32", "cpu") == "fp32"
+
+def test_dynamic_int8_quantizes_every_linear_layer(tiny_model, audio):
+    resources = ModelHandler.initialize(str(tiny_model), "cpu", "dynamic-int8")
+
+    modules = list(resources.model.modules())
+    assert any(hasattr(module, "_packed_params") for module in modules)
+    assert not any(type(module) is torch.nn.Linear for module in modules)
+    result = AudioProcessor.process_audio(resources.pipeline, audio[:16000 * 10], "en", "transcribe")
+    assert isinstance(result["text"], str)
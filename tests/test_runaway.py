@@ -0,0 +1,135 @@
+# tests/test_runaway.py
+import copy
+import random
+import pytest
+import torch
+from core.runaway import RunawayGuard
+
+MAX_LENGTH = 48
+
+@pytest.fixture
+def make_guard(resources):
+    """Build a guard on the tiny checkpoint's tokenizer, with short loops and no zlib check by default."""
+    def make(num_beams: int = 1, **kwargs) -> RunawayGuard:
+        generation_config = copy.deepcopy(resources.model.generation_config)
+        generation_config.num_beams = num_beams
+        params = {"max_repeats": 3, "min_tokens": 6, "max_ngram": 4, "compression_ratio": 0.0, **kwargs}
+        return RunawayGuard(resources.processor.tokenizer, generation_config, MAX_LENGTH, **params)
+    return make
+
+@pytest.fixture
+def tokens(resources):
+    tokenizer = resources.processor.tokenizer
+    generation_config = resources.model.generation_config
+    ids = {
+        name: tokenizer.convert_tokens_to_ids(f"<|{name}|>")
+        for name in ("startoftranscript", "en", "transcribe", "notimestamps")
+    }
+    ids["eos"] = generation_config.eos_token_id
+    ids["timestamp_begin"] = generation_config.no_timestamps_token_id + 1
+    ids["vocab"] = len(tokenizer)
+    ids["words"] = tokenizer(" the quick brown fox jumps over the lazy dog", add_special_tokens=False).input_ids
+    return ids
+
+def prompt(tokens, timed: bool = True):
+    ids = [tokens["startoftranscript"], tokens["en"], tokens["transcribe"]]
+    return ids if timed else ids + [tokens["notimestamps"]]
+
+def step(guard, tokens, rows):
+    """Run one decoding step; returns the token forced on each row, or None where the scores were left alone."""
+    scores = torch.zeros(len(rows), tokens["vocab"])
+    # The most likely timestamp, which is the one used to close a segment
+    scores[:, tokens["timestamp_begin"] + 10] = 1.0
+    out = guard(torch.tensor(rows), scores)
+    return [int(row.argmax()) if torch.isfinite(row).sum() == 1 else None for row in out]
+
+def test_loop_closes_the_open_segment_then_ends_the_window(make_guard, tokens):
+    guard = make_guard()
+    a, b = tokens["words"][:2]
+    closing = tokens["timestamp_begin"] + 10
+    start = prompt(tokens) + [tokens["timestamp_begin"]]
+    guard.set_begin_index(3)
+
+    sequence = start
+    for token in [a, b, a, b, a]:
+        sequence = sequence + [token]
+        assert step(guard, tokens, [sequence]) == [None]
+    # The sixth token completes three copies of a two-token n-gram inside an open segment
+    sequence = sequence + [b]
+    assert step(guard, tokens, [sequence]) == [closing]
+    sequence = sequence + [closing]
+    assert step(guard, tokens, [sequence]) == [tokens["eos"]]
+    assert guard.snapshot() == {"windows_stopped": 1, "tokens_saved": MAX_LENGTH - len(sequence)}
+
+    # A finished hypothesis is left alone and not counted again
+    sequence = sequence + [tokens["eos"]]
+    assert step(guard, tokens, [sequence]) == [None]
+    assert guard.snapshot()["windows_stopped"] == 1
+
+def test_untimed_loop_ends_the_window_and_is_counted_per_pass(make_guard, tokens):
+    guard = make_guard()
+    a = tokens["words"][0]
+    guard.set_begin_index(4)
+    sequence = prompt(tokens, timed=False)
+    results = []
+    for _ in range(6):
+        sequence = sequence + [a]
+        results.append(step(guard, tokens, [sequence])[0])
+    # One token needs min_tokens copies
+    assert results == [None] * 5 + [tokens["eos"]]
+
+    guard.set_begin_index(4)
+    assert step(guard, tokens, [sequence]) == [tokens["eos"]]
+    assert guard.snapshot() == {"windows_stopped": 2, "tokens_saved": 2 * (MAX_LENGTH - len(sequence))}
+
+def test_beams_follow_their_parent_and_count_the_window_once(make_guard, tokens):
+    guard = make_guard(num_beams=2)
+    a, b, c, d, e = tokens["words"][:5]
+    looping = prompt(tokens, timed=False) + [a, b, a, b, a, b]
+    other = prompt(tokens, timed=False) + [c, d, c, e, d, c]
+    guard.set_begin_index(4)
+    for length in range(5, len(looping) + 1):
+        # Beam search swaps the two beams at every step
+        rows = [looping[:length], other[:length]] if length % 2 else [other[:length], looping[:length]]
+        forced = step(guard, tokens, rows)
+    assert forced == [None, tokens["eos"]]
+    assert guard.snapshot()["windows_stopped"] == 1
+
+    # Both beams of one window looping count as one stopped window; the second window is counted on its own
+    guard.set_begin_index(4)
+    assert step(guard, tokens, [looping, looping, looping, other]) == [tokens["eos"]] * 3 + [None]
+    assert guard.snapshot()["windows_stopped"] == 3
+
+def test_compressible_text_ends_the_window(make_guard, tokens):
+    guard = make_guard(max_repeats=0, compression_ratio=1.5)
+    # A phrase longer than max_ngram: only the zlib check can see it repeat
+    phrase = tokens["words"][:6]
+    sequence = prompt(tokens, timed=False)
+    guard.set_begin_index(4)
+    stopped_at = None
+    for token in phrase * 6:
+        sequence = sequence + [token]
+        if step(guard, tokens, [sequence]) == [tokens["eos"]]:
+            stopped_at = len(sequence) - 4
+            break
+    text = sequence[4:]
+    assert stopped_at is not None and stopped_at % 8 == 0
+    assert guard.is_compressible(text) and not guard.is_compressible(text[:stopped_at - 8])
+    assert not make_guard(max_repeats=0).enabled
+
+@pytest.mark.parametrize("num_beams", [1, 3])
+def test_incremental_state_matches_the_whole_sequence(make_guard, tokens, num_beams):
+    """Every step gives the same scores as a guard that checks the whole sequence from scratch."""
+    rng = random.Random(num_beams)
+    alphabet = tokens["words"][:2] + [tokens["timestamp_begin"]]
+    incremental = make_guard(num_beams=num_beams, compression_ratio=1.2)
+    scratch = make_guard(num_beams=num_beams, compression_ratio=1.2)
+    rows = [prompt(tokens) for _ in range(4 * num_beams)]
+    incremental.set_begin_index(3)
+    for _ in range(MAX_LENGTH - 3):
+        # Each beam continues a random beam of its own window
+        rows = [list(rows[row - row % num_beams + rng.randrange(num_beams)]) for row in range(len(rows))]
+        rows = [row + [rng.choice(alphabet)] for row in rows]
+        # A new pass per step, so the second guard starts from the tokens every time
+        scratch.set_begin_index(3)
+        assert step(incremental, tokens, rows) == step(scratch, tokens, rows)
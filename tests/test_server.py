@@ -0,0 +1,122 @@
+# tests/test_server.py
+import threading
+import numpy as np
+import pytest
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker
+from core.server import MicroBatcher
+
+@pytest.fixture
+def recorded_batches(monkeypatch):
+    """Record (windows, task) of every generate call."""
+    calls = []
+    generate = Chunker.generate
+
+    def record(resources, features, generate_kwargs, *args, **kwargs):
+        calls.append((len(features["input_features"]), generate_kwargs["task"]))
+        return generate(resources, features, generate_kwargs, *args, **kwargs)
+
+    monkeypatch.setattr(Chunker, "generate", staticmethod(record))
+    return calls
+
+def test_concurrent_requests_share_batches_by_task(resources, recorded_batches, make_audio):
+    clips = [make_audio(35.0, seed) for seed in (1, 2, 3)]
+    windows = [len(list(Chunker.iter_windows(len(clip)))) for clip in clips]
+    # Wide enough to hold every window, with a deadline the submissions easily beat
+    batcher = MicroBatcher(resources, batch_size=sum(windows), max_wait_s=30.0)
+    try:
+        futures = [
+            batcher.submit(clips[0], "en", "transcribe"),
+            batcher.submit(clips[1], "en", "transcribe"),
+            batcher.submit(clips[2], "en", "translate"),
+        ]
+        results = [future.result(timeout=300) for future in futures]
+        metrics = batcher.metrics()
+    finally:
+        batcher.close()
+
+    # One collected batch, split into one generate call per task
+    assert recorded_batches == [(windows[0] + windows[1], "transcribe"), (windows[2], "translate")]
+    assert metrics["batches"] == 2
+    assert metrics["windows"] == sum(windows)
+    assert metrics["requests_completed"] == 3
+    assert metrics["requests_in_flight"] == 0
+
+    # Each request gets the result of decoding it on its own
+    for clip, task, result in zip(clips, ("transcribe", "transcribe", "translate"), results):
+        alone = AudioProcessor.process_audio(resources.pipeline, clip, "en", task)
+        assert result["text"] == alone["text"]
+        assert [tuple(chunk["timestamp"]) for chunk in result["chunks"]] == \
+            [tuple(chunk["timestamp"]) for chunk in alone.get("chunks", [])]
+
+def test_batch_runs_when_deadline_passes(resources, recorded_batches, make_audio):
+    clip = make_audio(10.0)
+    batcher = MicroBatcher(resources, batch_size=8, max_wait_s=0.05)
+    try:
+        result = batcher.submit(clip, "en", "transcribe").result(timeout=300)
+    finally:
+        batcher.close()
+    assert recorded_batches == [(1, "transcribe")]
+    assert set(result) >= {"text", "chunks"}
+
+def test_empty_audio_is_rejected(resources):
+    batcher = MicroBatcher(resources, batch_size=2, max_wait_s=0.01)
+    try:
+        with pytest.raises(ValueError):
+            batcher.submit(np.zeros(0, dtype=np.float32), "en", "transcribe").result(timeout=10)
+    finally:
+        batcher.close()
+
+def test_windows_of_a_failed_request_are_not_decoded(resources, make_audio, monkeypatch):
+    calls = []
+
+    def failing(resources, features, generate_kwargs, *args, **kwargs):
+        calls.append(len(features["input_features"]))
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(Chunker, "generate", staticmethod(failing))
+    clip = make_audio(65.0)
+    batcher = MicroBatcher(resources, batch_size=1, max_wait_s=0.01)
+    try:
+        with pytest.raises(RuntimeError):
+            batcher.submit(clip, "en", "transcribe").result(timeout=60)
+    finally:
+        # Runs every queued window before stopping
+        batcher.close()
+
+    assert len(list(Chunker.iter_windows(len(clip)))) == 3
+    assert calls == [1]
+    metrics = batcher.metrics()
+    assert metrics["requests_failed"] == 1
+    assert metrics["requests_in_flight"] == 0
+
+def test_windows_of_a_cancelled_request_are_not_decoded(resources, make_audio, monkeypatch):
+    calls = []
+    started = threading.Event()
+    proceed = threading.Event()
+    generate = Chunker.generate
+
+    def blocking(resources, features, generate_kwargs, *args, **kwargs):
+        calls.append(len(features["input_features"]))
+        started.set()
+        proceed.wait(60)
+        return generate(resources, features, generate_kwargs, *args, **kwargs)
+
+    monkeypatch.setattr(Chunker, "generate", staticmethod(blocking))
+    batcher = MicroBatcher(resources, batch_size=1, max_wait_s=0.01)
+    try:
+        future = batcher.submit(make_audio(65.0), "en", "transcribe")
+        assert started.wait(60)
+        # The client gives up while the first of its three windows is decoded
+        assert future.cancel()
+        proceed.set()
+        result = batcher.submit(make_audio(10.0, 1), "en", "transcribe").result(timeout=300)
+    finally:
+        batcher.close()
+
+    assert calls == [1, 1]
+    assert set(result) >= {"text", "chunks"}
+    metrics = batcher.metrics()
+    assert metrics["requests_completed"] == 1
+    assert metrics["requests_failed"] == 1
+    assert metrics["requests_in_flight"] == 0
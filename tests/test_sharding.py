@@ -0,0 +1,23 @@
+# tests/test_sharding.py
+from core.audio_processor import AudioProcessor
+from core.model_handler import ModelHandler
+from core.sharding import ShardedTranscriber
+from core.variants import Variant
+
+def test_shard_workers_on_shared_weights_match_one_process(tiny_model, audio):
+    # Its own resources: sharing moves the weights of the model to shared memory
+    resources = ModelHandler.initialize(str(tiny_model), "cpu", "fp32", batch_size=2)
+    shared = ModelHandler.share_weights(resources.model)
+    assert all(tensor.is_shared() for tensor in shared["tensors"].values())
+
+    variants = Variant.expand("en", ["transcribe", "translate"])
+    with ShardedTranscriber(str(tiny_model), "fp32", shards=2, threads_per_shard=1, batch_size=2,
+                            shared=shared) as sharder:
+        assert len(sharder.split(list(range(3)))) == 2
+        results = sharder.transcribe(resources, audio, variants, "segment")
+
+    assert results == [
+        AudioProcessor.process_audio_overlapped(resources, audio, variant.language, variant.task, batch_size=2,
+                                                timestamps="segment")
+        for variant in variants
+    ]
@@ -0,0 +1,46 @@
+# tests/test_speculative.py
+import pytest
+import torch
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker
+from core.model_handler import ModelHandler
+
+def decode(resources, audio, batch_size=1):
+    """Token ids of every window, without batch padding."""
+    generate_kwargs = AudioProcessor.build_generate_kwargs("en", "transcribe")
+    windows = list(Chunker.iter_windows(len(audio)))
+    pad_token_id = resources.model.generation_config.pad_token_id
+    tokens = []
+    for i in range(0, len(windows), batch_size):
+        features = Chunker.extract_features(resources, [audio[w.start:w.end] for w in windows[i:i + batch_size]])
+        tokens.extend(row[row != pad_token_id] for row in Chunker.generate(resources, features, generate_kwargs))
+    return tokens
+
+@pytest.fixture(scope="module")
+def greedy_tokens(tiny_model, audio):
+    resources = ModelHandler.initialize(str(tiny_model), "cpu", "fp32")
+    resources.pipeline.generation_config.num_beams = 1
+    resources.pipeline.generation_config.do_sample = False
+    return decode(resources, audio)
+
+@pytest.fixture(scope="module")
+def draft_model(tmp_path_factory, make_checkpoint):
+    # Different size and weights, so most drafts are rejected
+    return make_checkpoint(tmp_path_factory.mktemp("tiny-draft"), d_model=8, seed=1)
+
+@pytest.mark.parametrize("assistant", ["copy", "draft"])
+def test_speculative_tokens_equal_greedy(tiny_model, draft_model, audio, greedy_tokens, assistant):
+    assistant_path = tiny_model if assistant == "copy" else draft_model
+    resources = ModelHandler.initialize(str(tiny_model), "cpu", "fp32", str(assistant_path))
+    before = resources.speculative.snapshot()
+
+    tokens = decode(resources, audio)
+
+    assert len(tokens) == len(greedy_tokens)
+    for assisted, greedy in zip(tokens, greedy_tokens):
+        assert torch.equal(assisted, greedy)
+    stats = resources.speculative.summarize(before, resources.speculative.snapshot())
+    assert stats["emitted_tokens"] > 0
+    if assistant == "copy":
+        # A copy of the main model predicts every token it verifies
+        assert stats["acceptance_rate"] == 1.0
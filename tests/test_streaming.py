@@ -0,0 +1,41 @@
+# tests/test_streaming.py
+import numpy as np
+from config.settings import CONFIG
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker, StreamingStitcher
+
+def decode_windows(resources, audio, batch_size=2):
+    """(token ids, stride) of every window, as the batch path stitches them."""
+    generate_kwargs = AudioProcessor.build_generate_kwargs("en", "transcribe")
+    windows = list(Chunker.iter_windows(len(audio)))
+    outputs = []
+    for i in range(0, len(windows), batch_size):
+        batch = windows[i:i + batch_size]
+        features = Chunker.extract_features(resources, [audio[w.start:w.end] for w in batch])
+        tokens = Chunker.generate(resources, features, generate_kwargs)
+        outputs.extend((window_tokens, window.stride) for window, window_tokens in zip(batch, tokens))
+    return outputs
+
+def test_streaming_stitcher_matches_stitch(resources, audio):
+    outputs = decode_windows(resources, audio)
+    stitcher = StreamingStitcher(resources)
+    segments = []
+    for tokens, stride in outputs:
+        segments.extend(stitcher.feed(tokens, stride))
+    segments.extend(stitcher.finish())
+
+    expected = Chunker.stitch(resources, outputs)["chunks"]
+    assert len(expected) > 1
+    assert segments == expected
+
+def test_stream_segments_match_pipeline(resources, audio):
+    # Blocks that do not line up with the windows
+    blocks = np.array_split(audio, 17)
+    segments = list(AudioProcessor.stream_segments(resources, blocks, "en", "transcribe", batch_size=2))
+
+    expected = AudioProcessor.process_audio(resources.pipeline, audio, "en", "transcribe")["chunks"]
+    start, end = expected[-1]["timestamp"]
+    if end is None:
+        # The stream closes a final open segment at the end of the audio
+        expected[-1] = {**expected[-1], "timestamp": (start, round(len(audio) / CONFIG['audio'].sample_rate, 2))}
+    assert segments == expected
@@ -0,0 +1,149 @@
+# tests/test_transcript_index.py
+import pytest
+from utils.transcript_index import TranscriptIndex
+
+def result(*segments):
+    """A ``{'text', 'chunks'}`` result of (start, end, text) segments."""
+    chunks = [{'timestamp': (start, end), 'text': text} for start, end, text in segments]
+    return {'text': "".join(chunk['text'] for chunk in chunks), 'chunks': chunks}
+
+@pytest.fixture
+def index(tmp_path):
+    with TranscriptIndex(tmp_path / "index.db") as index:
+        index.add("/audio/talk.wav", result((0.0, 4.5, " The quick brown fox."), (4.5, 9.0, " Jumps over the dog.")),
+                  model="tiny", language="en", task="transcribe")
+        index.add("/audio/talk.wav", result((0.0, 9.0, " Der schnelle braune Fuchs.")),
+                  model="tiny", language="de", task="translate")
+        index.add("/other/meeting.wav", result((60.0, 65.25, " A quick sync on the fox project.")),
+                  model="tiny", language="en", task="transcribe")
+        yield index
+
+def texts(rows):
+    return [row['text'] for row in rows]
+
+def test_add_stores_segments_in_milliseconds(index):
+    rows = index.search(source="/audio/talk.wav", language="en")
+    assert [(row['start_ms'], row['end_ms']) for row in rows] == [(0, 4500), (4500, 9000)]
+    assert texts(rows) == ["The quick brown fox.", "Jumps over the dog."]
+
+def test_add_without_chunks_indexes_one_untimed_segment(index):
+    assert index.add("/audio/untimed.wav", {'text': " Just text.", 'chunks': []}) == 1
+    rows = index.search(source="/audio/untimed.wav")
+    assert [(row['start_ms'], row['end_ms'], row['text']) for row in rows] == [(None, None, "Just text.")]
+
+def test_add_replaces_same_source_model_language_and_task(index):
+    assert index.add("/audio/talk.wav", result((0.0, 3.0, " A new transcript.")),
+                     model="tiny", language="en", task="transcribe") == 1
+
+    assert texts(index.search(source="/audio/talk.wav", language="en")) == ["A new transcript."]
+    # The replaced segments are gone from the full-text index too
+    assert index.search("brown") == []
+    assert texts(index.search(source="/audio/talk.wav", language="de")) == ["Der schnelle braune Fuchs."]
+
+def test_search_matches_every_word(index):
+    assert sorted(texts(index.search("quick fox"))) == ["A quick sync on the fox project.", "The quick brown fox."]
+    assert texts(index.search("fox dog")) == []
+    # Words are quoted, so FTS5 operators in them are plain text
+    assert index.search("fox OR dog") == []
+
+def test_search_raw_query(index):
+    assert sorted(texts(index.search("brown OR dog", raw=True))) == ["Jumps over the dog.", "The quick brown fox."]
+    assert texts(index.search('"quick brown"', raw=True)) == ["The quick brown fox."]
+    assert texts(index.search("schnell*", raw=True)) == ["Der schnelle braune Fuchs."]
+
+def test_search_invalid_raw_query_raises_value_error(index):
+    with pytest.raises(ValueError):
+        index.search('"unbalanced', raw=True)
+
+def test_search_filters(index):
+    assert texts(index.search("fox", source="/other/*")) == ["A quick sync on the fox project."]
+    assert texts(index.search(task="translate")) == ["Der schnelle braune Fuchs."]
+    assert index.search(model="large") == []
+    assert len(index.search(limit=2)) == 2
+
+def test_search_time_range_overlaps_segments(index):
+    rows = index.search(source="/audio/talk.wav", language="en", start_ms=5000, end_ms=6000)
+    assert texts(rows) == ["Jumps over the dog."]
+    # A segment ending exactly at the start of the range still overlaps it
+    rows = index.search(source="/audio/talk.wav", language="en", start_ms=4500)
+    assert texts(rows) == ["The quick brown fox.", "Jumps over the dog."]
+    assert texts(index.search(start_ms=61000)) == ["A quick sync on the fox project."]
+
+def test_group_words_splits_at_sentences_pauses_and_length():
+    words = [
+        {'timestamp': (0.0, 0.4), 'text': " Hello"},
+        {'timestamp': (0.4, 0.8), 'text': " there."},
+        {'timestamp': (0.9, 1.2), 'text': " After"},
+        {'timestamp': (3.0, 3.5), 'text': " a pause"},
+        {'timestamp': (3.6, 9.0), 'text': " and"},
+        {'timestamp': (9.0, 15.0), 'text': " on"},
+        {'timestamp': (15.0, None), 'text': " forever"},
+    ]
+    segments = TranscriptIndex.group_words(words, max_gap_s=1.0, max_duration_s=10.0)
+    assert segments == [
+        {'timestamp': (0.0, 0.8), 'text': " Hello there."},
+        {'timestamp': (0.9, 1.2), 'text': " After"},
+        {'timestamp': (3.0, 9.0), 'text': " a pause and"},
+        {'timestamp': (9.0, 15.0), 'text': " on forever"},
+    ]
+
+def test_read_vtt(tmp_path):
+    path = tmp_path / "talk.vtt"
+    path.write_text(
+        "WEBVTT\n\n"
+        "1\n00:00:01.000 --> 00:00:02.500 align:start\nFirst cue\non two lines\n\n"
+        "01:02.250 --> 1:01:02.750\nSecond cue\n",
+        encoding='utf-8'
+    )
+    assert TranscriptIndex.read_vtt(path) == [
+        {'timestamp': (1.0, 2.5), 'text': "First cue on two lines"},
+        {'timestamp': (62.25, 3662.75), 'text': "Second cue"},
+    ]
+
+def test_import_vtt_without_recordings_uses_the_vtt_paths(tmp_path):
+    cue = "WEBVTT\n\n00:00.000 --> 00:02.000\n{}\n"
+    first = tmp_path / "first.vtt"
+    second = tmp_path / "second.vtt"
+    first.write_text(cue.format("First words"), encoding='utf-8')
+    second.write_text(cue.format("Second words"), encoding='utf-8')
+    unreadable = tmp_path / "broken.vtt"
+    unreadable.write_bytes(b"\xff\xfe\xfa")
+
+    with TranscriptIndex(tmp_path / "index.db") as index:
+        assert index.import_vtt([first, unreadable, second], model="tiny", batch_files=1) == (2, 2)
+        rows = index.search("words")
+        assert sorted((row['source'], row['model'], row['text']) for row in rows) == [
+            (str(first.resolve()), "tiny", "First words"),
+            (str(second.resolve()), "tiny", "Second words"),
+        ]
+
+def test_import_vtt_indexes_under_the_recording(tmp_path):
+    audio = tmp_path / "audio"
+    transcripts = tmp_path / "transcripts"
+    (audio / "day1").mkdir(parents=True)
+    (transcripts / "day1").mkdir(parents=True)
+    recording = audio / "day1" / "talk.wav"
+    recording.write_bytes(b"")
+    cue = "WEBVTT\n\n00:00.000 --> 00:02.000\n{}\n"
+    (transcripts / "day1" / "talk.vtt").write_text(cue.format("Original words"), encoding='utf-8')
+    (transcripts / "day1" / "talk.de.translate.vtt").write_text(cue.format("Translated words"), encoding='utf-8')
+    orphan = transcripts / "orphan.vtt"
+    orphan.write_text(cue.format("Orphan words"), encoding='utf-8')
+
+    with TranscriptIndex(tmp_path / "index.db") as index:
+        files, segments = index.import_vtt(sorted(transcripts.rglob("*.vtt")), model="tiny",
+                                           audio_root=audio, transcript_root=transcripts)
+        assert (files, segments) == (3, 3)
+
+        rows = index.search("words", source=str(recording.resolve()))
+        assert sorted((row['language'], row['task'], row['text']) for row in rows) == [
+            ("", "", "Original words"),
+            ("de", "translate", "Translated words"),
+        ]
+        assert [row['source'] for row in index.search("orphan")] == [str(orphan.resolve())]
+
+        # Transcribing the recording again replaces what was imported for it
+        index.add(recording.resolve(), result((0.0, 2.0, " Fresh words")), model="tiny")
+        assert sorted(texts(index.search("words", source=str(recording.resolve())))) == [
+            "Fresh words", "Translated words"
+        ]
@@ -0,0 +1,34 @@
+# tests/test_tuning_profile.py
+import socket
+from utils.tuning_profile import TuningProfile
+
+def profile(**overrides):
+    return {"model": "openai/whisper-tiny", "device": "cpu", "precision": "fp32", "batch_size": 8, **overrides}
+
+def test_save_load_round_trip(tmp_path):
+    path = TuningProfile.save(profile(), tmp_path)
+
+    assert path.parent == tmp_path
+    assert path.name.startswith(socket.gethostname() + "-")
+    assert TuningProfile.load("openai/whisper-tiny", "cpu", "fp32", tmp_path) == profile()
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_profiles_are_keyed_by_host_model_device_and_precision(tmp_path, monkeypatch):
+    TuningProfile.save(profile(), tmp_path)
+    TuningProfile.save(profile(precision="int8", batch_size=4), tmp_path)
+
+    assert TuningProfile.load("openai/whisper-tiny", "cpu", "int8", tmp_path)["batch_size"] == 4
+    assert TuningProfile.load("openai/whisper-tiny", "cpu", "fp32", tmp_path)["batch_size"] == 8
+    assert TuningProfile.load("openai/whisper-base", "cpu", "fp32", tmp_path) is None
+    assert TuningProfile.load("openai/whisper-tiny", "cuda", "fp32", tmp_path) is None
+    # Another machine sharing the directory does not pick up this host's profiles
+    monkeypatch.setattr(socket, "gethostname", lambda: "other-host")
+    assert TuningProfile.load("openai/whisper-tiny", "cpu", "fp32", tmp_path) is None
+
+def test_invalid_profiles_are_ignored(tmp_path):
+    path = TuningProfile.save(profile(), tmp_path)
+    path.write_text("{not json", encoding='utf-8')
+    assert TuningProfile.load("openai/whisper-tiny", "cpu", "fp32", tmp_path) is None
+
+    TuningProfile.save(profile(batch_size=0), tmp_path)
+    assert TuningProfile.load("openai/whisper-tiny", "cpu", "fp32", tmp_path) is None
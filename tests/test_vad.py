@@ -0,0 +1,77 @@
+# tests/test_vad.py
+import numpy as np
+import pytest
+from core.vad import SpeechTimeline, VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+
+def voiced(seconds):
+    """A 150 Hz voice with harmonics through the speech band."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return sum(0.1 * np.sin(2 * np.pi * 150 * k * t) for k in range(2, 12)).astype(np.float32)
+
+def silence(seconds, seed=0):
+    return (1e-4 * np.random.default_rng(seed).standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+@pytest.fixture
+def timeline():
+    # Speech at 1-5 s and 14-18 s of a 20 s recording
+    return SpeechTimeline(
+        packed_starts=[0, 4 * SAMPLE_RATE],
+        original_starts=[1 * SAMPLE_RATE, 14 * SAMPLE_RATE],
+        lengths=[4 * SAMPLE_RATE, 4 * SAMPLE_RATE],
+        total_samples=20 * SAMPLE_RATE,
+        sample_rate=SAMPLE_RATE,
+    )
+
+def test_restore_maps_chunks_onto_original_time(timeline):
+    result = {'text': "abcde", 'chunks': [
+        {'timestamp': (0.0, 2.0), 'text': "a"},
+        # Ends exactly where the first region stops and the second starts
+        {'timestamp': (2.0, 4.0), 'text': "b"},
+        {'timestamp': (4.0, 6.5), 'text': "c"},
+        {'timestamp': (3.5, 4.5), 'text': "d"},
+        {'timestamp': (6.5, None), 'text': "e"},
+    ]}
+    restored = timeline.restore(result)
+    assert [chunk['timestamp'] for chunk in restored['chunks']] == [
+        (1.0, 3.0),
+        (3.0, 5.0),
+        (14.0, 16.5),
+        (4.5, 14.5),
+        (16.5, None),
+    ]
+    assert [chunk['text'] for chunk in restored['chunks']] == list("abcde")
+    assert restored['text'] == result['text']
+    assert timeline.skipped_seconds == 12.0
+
+def test_to_original_start_on_boundary_belongs_to_next_region(timeline):
+    assert timeline.to_original(4.0) == 14.0
+    assert timeline.to_original(4.0, is_end=True) == 5.0
+    # Times past the packed audio stay inside the last region
+    assert timeline.to_original(9.0, is_end=True) == 18.0
+
+def test_pack_removes_silence_and_restores_original_offsets():
+    audio = np.concatenate([voiced(4.0), silence(10.0), voiced(4.0)])
+    packed, timeline = VoiceActivityDetector().pack(audio)
+
+    assert len(timeline.lengths) == 2
+    first_start, second_start = timeline.original_starts
+    assert first_start == 0
+    # The gap is padded on both sides but most of it is skipped
+    assert 13.0 <= second_start / SAMPLE_RATE <= 14.0
+    assert 8.0 <= timeline.skipped_seconds <= 10.0
+    assert np.array_equal(packed, np.concatenate([
+        audio[start:start + length] for start, length in zip(timeline.original_starts, timeline.lengths)
+    ]))
+
+    boundary = timeline.packed_starts[1] / SAMPLE_RATE
+    restored = timeline.restore({'text': "", 'chunks': [
+        {'timestamp': (1.0, boundary), 'text': "first"},
+        {'timestamp': (boundary, boundary + 2.0), 'text': "second"},
+    ]})
+    first_end = (timeline.original_starts[0] + timeline.lengths[0]) / SAMPLE_RATE
+    assert [chunk['timestamp'] for chunk in restored['chunks']] == [
+        (1.0, round(first_end, 2)),
+        (round(second_start / SAMPLE_RATE, 2), round(second_start / SAMPLE_RATE + 2.0, 2)),
+    ]
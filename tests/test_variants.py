@@ -0,0 +1,60 @@
+# tests/test_variants.py
+import threading
+import torch
+from core.audio_processor import AudioProcessor
+from core.chunking import Chunker
+from core.variants import SharedEncoder, Variant
+from utils.metrics import METRICS
+
+def test_variants_match_separate_runs(resources, audio):
+    variants = Variant.expand("en", ["transcribe", "translate"])
+    before = METRICS._counters.get("encoder_windows_reused", 0)
+    results = AudioProcessor.process_audio_variants(resources, audio, variants, batch_size=2)
+    reused = METRICS._counters.get("encoder_windows_reused", 0) - before
+
+    assert results == [
+        AudioProcessor.process_audio_overlapped(resources, audio, variant.language, variant.task, batch_size=2)
+        for variant in variants
+    ]
+    # At least every window of the second variant is decoded from the encoder outputs of the first
+    assert reused >= len(list(Chunker.iter_windows(len(audio))))
+
+def test_only_the_owning_thread_is_served_shared_outputs(resources):
+    encoder = resources.model.get_encoder()
+    config = resources.model.config
+    generator = torch.Generator().manual_seed(0)
+    features = torch.randn(1, config.num_mel_bins, 2 * config.max_source_positions, generator=generator)
+    with torch.inference_mode():
+        expected = encoder(features).last_hidden_state
+
+    entered = threading.Event()
+    other_results = []
+
+    def other_thread():
+        # Runs while the context below is open: computes its own output
+        with torch.inference_mode():
+            other_results.append(encoder(features).last_hidden_state)
+
+    def other_context():
+        with SharedEncoder(resources.model):
+            entered.set()
+
+    with torch.inference_mode(), SharedEncoder(resources.model) as shared:
+        encoder(features)
+        assert torch.equal(encoder(features).last_hidden_state, expected)
+        assert shared.reused == 1
+
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+        assert shared.reused == 1
+        assert torch.equal(other_results[0], expected)
+
+        # A second context on the same encoder waits for this one
+        waiting = threading.Thread(target=other_context)
+        waiting.start()
+        assert not entered.wait(0.2)
+
+    waiting.join(timeout=10)
+    assert entered.is_set()
+    assert "forward" not in encoder.__dict__
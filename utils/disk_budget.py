@@ -0,0 +1,106 @@
+# utils/disk_budget.py
+from pathlib import Path
+from typing import List, Optional, Tuple
+import logging
+import threading
+import time
+from config.settings import CONFIG
+
+logger = logging.getLogger(__name__)
+
+class DiskBudget:
+    """
+    Size limit of a directory of cache entries, enforced by evicting the least recently used.
+
+    Entries are the files matching ``pattern``; their modification time is
+    their last use. The directory is scanned once, when the first entry is
+    added, and from then on a running total is kept, so adding an entry
+    costs no directory scan until the total goes over ``max_bytes``. Only
+    then is the directory scanned again, which also picks up what other
+    processes sharing it have written, and the oldest entries are removed
+    until the total fits.
+
+    Temporary files matching ``temp_pattern`` count towards the total but
+    are never evicted while they may still be written. A temporary file not
+    modified for ``stale_after_s`` was left by an interrupted writer, and is
+    deleted by every scan.
+    """
+
+    def __init__(
+            self,
+            directory: Path,
+            pattern: str,
+            max_bytes: int,
+            label: str = "cache",
+            temp_pattern: str = '*/*.tmp',
+            stale_after_s: float = CONFIG['cache'].stale_temp_s
+    ):
+        self.directory = directory
+        self.pattern = pattern
+        self.max_bytes = max_bytes
+        self.label = label
+        self.temp_pattern = temp_pattern
+        self.stale_after_s = stale_after_s
+        self._total: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _scan(self) -> Tuple[List[Tuple[float, int, Path]], int]:
+        """Return the entries as (mtime, size, path) and the bytes held by live temporary files."""
+        entries = []
+        for path in self.directory.glob(self.pattern):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        temp_bytes = 0
+        stale_before = time.time() - self.stale_after_s
+        for path in self.directory.glob(self.temp_pattern):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime < stale_before:
+                path.unlink(missing_ok=True)
+                logger.info(f"Removed {self.label} temporary file {path} left by an interrupted run")
+            else:
+                temp_bytes += stat.st_size
+        return entries, temp_bytes
+
+    @staticmethod
+    def entry_size(path: Path) -> int:
+        """Size of the entry at ``path``, 0 if there is none; taken before an entry is overwritten."""
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def added(self, size: int, replaced: int = 0) -> None:
+        """
+        Account for an entry of ``size`` bytes and evict old entries if over budget.
+
+        Args:
+            size: Bytes of the entry written
+            replaced: Bytes of the entry it overwrote, if the key was already stored
+        """
+        with self._lock:
+            if self._total is None:
+                entries, temp_bytes = self._scan()
+                self._total = sum(entry_size for _, entry_size, _ in entries) + temp_bytes
+            else:
+                self._total += size - replaced
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the directory fits in ``max_bytes``."""
+        entries, temp_bytes = self._scan()
+        total = sum(size for _, size, _ in entries) + temp_bytes
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.debug(f"Evicted {self.label} entry {path.name}")
+        self._total = total
@@ -0,0 +1,118 @@
+# utils/feature_cache.py
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+import logging
+import os
+import tempfile
+import numpy as np
+from utils.disk_budget import DiskBudget
+from utils.result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+class FeatureCache:
+    """
+    Content-addressed store of the log-mel features of every window of a recording.
+
+    An entry is one ``.npy`` array of shape (windows, mel bins, frames) in
+    float32, keyed by a hash of the decoded audio, the mel parameters and the
+    window layout. Nothing about the model, language or task is in the key,
+    so every model with the same mel configuration reuses the features. Entries
+    are memory-mapped when read, so a batch only pages in its own windows. The
+    least recently used entries are evicted once the total size exceeds
+    ``max_bytes``; a hit refreshes the entry's modification time.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int):
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.budget = DiskBudget(self.directory, '*/*.npy', max_bytes, "feature cache")
+
+    @staticmethod
+    def make_key(
+            audio: np.ndarray,
+            params: Dict[str, Any],
+            release: Optional[Callable[[int], None]] = None
+    ) -> str:
+        """Build the key of the features of ``audio``; ``params`` holds the mel parameters and window layout."""
+        return ResultCache.make_key(audio, {"features": params}, release)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.npy"
+
+    def get(self, key: str, shape: Sequence[int]) -> Optional[np.ndarray]:
+        """Return the memory-mapped features for ``key``, or None on a miss or when the shape differs."""
+        path = self._entry_path(key)
+        try:
+            features = np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable feature cache entry {path}: {str(e)}")
+            path.unlink(missing_ok=True)
+            return None
+        if features.shape != tuple(shape) or features.dtype != np.float32:
+            logger.warning(f"Discarding feature cache entry {path} of shape {features.shape}, expected {tuple(shape)}")
+            del features
+            path.unlink(missing_ok=True)
+            return None
+
+        # Mark as recently used for eviction
+        os.utime(path)
+        return features
+
+    def create(self, key: str, shape: Tuple[int, ...]) -> "FeatureCacheEntry":
+        """Start a new entry for ``key`` whose windows are filled in as they are computed."""
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return FeatureCacheEntry(self, path, shape)
+
+class FeatureCacheEntry:
+    """
+    A feature cache entry being written.
+
+    Windows are written into a memory-mapped temporary file, so the features
+    of a long recording never have to be held in memory at once. The entry
+    becomes visible on :meth:`commit`, and only once every window has been
+    written; a run that decodes just some windows, such as a resumed job,
+    leaves no entry behind.
+    """
+
+    def __init__(self, cache: FeatureCache, path: Path, shape: Tuple[int, ...]):
+        self.cache = cache
+        self.path = path
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        os.close(fd)
+        self.tmp_path = Path(tmp_name)
+        self.features = np.lib.format.open_memmap(self.tmp_path, mode='w+', dtype=np.float32, shape=shape)
+        self.written = np.zeros(shape[0], dtype=bool)
+
+    def write(self, indices: Sequence[int], features: np.ndarray) -> None:
+        """Store the features of the windows at ``indices``."""
+        self.features[list(indices)] = features
+        self.written[list(indices)] = True
+        # Writes through the memory map may not touch the mtime; keep the file from looking abandoned
+        os.utime(self.tmp_path)
+
+    def commit(self) -> bool:
+        """Publish the entry if every window was written, else discard it; returns whether it was published."""
+        if not self.written.all():
+            self.discard()
+            return False
+        try:
+            self.features.flush()
+            self.features = None
+            size = self.tmp_path.stat().st_size
+            replaced = DiskBudget.entry_size(self.path)
+            os.replace(self.tmp_path, self.path)
+        except Exception:
+            self.tmp_path.unlink(missing_ok=True)
+            raise
+        self.cache.budget.added(size, replaced)
+        return True
+
+    def discard(self) -> None:
+        """Drop the entry and its temporary file."""
+        self.features = None
+        self.tmp_path.unlink(missing_ok=True)
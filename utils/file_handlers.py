@@ -1,10 +1,133 @@
 # utils/file_handlers.py
+from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Dict, List, Union, Optional
+from typing import Callable, Dict, List, Sequence, TextIO, Type, Union, Optional
+import json
 import logging
+from config.settings import CONFIG
+from utils.metrics import METRICS
 
 logger = logging.getLogger(__name__)
 
+class SegmentWriter(ABC):
+    """
+    One output format, written a segment at a time to an open file.
+
+    Subclasses implement :meth:`write_segment`, are registered under a format
+    name with :func:`register_writer` and only ever hold the current segment,
+    so results with hundreds of thousands of segments are written without
+    building the whole file in memory.
+    """
+    suffix = ""
+    timed = True  # whether the format needs segment timestamps
+
+    def __init__(self, handle: TextIO):
+        self.handle = handle
+        self.count = 0
+
+    def begin(self) -> None:
+        """Write anything that precedes the first segment."""
+
+    @abstractmethod
+    def write_segment(self, segment: Dict[str, Union[str, List[float]]]) -> None:
+        """Write one segment of ``{'timestamp': (start, end), 'text': ...}``."""
+
+    def end(self) -> None:
+        """Write anything that follows the last segment."""
+
+WRITERS: Dict[str, Type[SegmentWriter]] = {}
+
+def register_writer(name: str) -> Callable[[Type[SegmentWriter]], Type[SegmentWriter]]:
+    """Class decorator that makes a :class:`SegmentWriter` available as ``--formats name``."""
+    def register(writer: Type[SegmentWriter]) -> Type[SegmentWriter]:
+        WRITERS[name] = writer
+        return writer
+    return register
+
+@register_writer("vtt")
+class VttWriter(SegmentWriter):
+    suffix = ".vtt"
+
+    def begin(self) -> None:
+        self.handle.write("WEBVTT\n\n")
+
+    def write_segment(self, segment: Dict[str, Union[str, List[float]]]) -> None:
+        self.count += 1
+        start_time = OutputHandler._format_timestamp(segment['timestamp'][0])
+        end_time = OutputHandler._format_timestamp(segment['timestamp'][1])
+        self.handle.write(f"{self.count}\n{start_time} --> {end_time}\n{segment['text'].strip()}\n\n")
+
+@register_writer("srt")
+class SrtWriter(SegmentWriter):
+    suffix = ".srt"
+
+    def write_segment(self, segment: Dict[str, Union[str, List[float]]]) -> None:
+        self.count += 1
+        start_time = OutputHandler._format_timestamp(segment['timestamp'][0], separator=",")
+        end_time = OutputHandler._format_timestamp(segment['timestamp'][1], separator=",")
+        self.handle.write(f"{self.count}\n{start_time} --> {end_time}\n{segment['text'].strip()}\n\n")
+
+@register_writer("tsv")
+class TsvWriter(SegmentWriter):
+    """Start and end in integer milliseconds, then the text, as openai-whisper writes TSV."""
+    suffix = ".tsv"
+
+    def begin(self) -> None:
+        self.handle.write("start\tend\ttext\n")
+
+    def write_segment(self, segment: Dict[str, Union[str, List[float]]]) -> None:
+        self.count += 1
+        start, end = (round(value * 1000) for value in segment['timestamp'])
+        text = " ".join(segment['text'].split())
+        self.handle.write(f"{start}\t{end}\t{text}\n")
+
+@register_writer("json")
+class JsonWriter(SegmentWriter):
+    """``{"segments": [{"id", "start", "end", "text"}, ...]}`` with times in seconds."""
+    suffix = ".json"
+
+    def begin(self) -> None:
+        self.handle.write('{"segments": [')
+
+    def write_segment(self, segment: Dict[str, Union[str, List[float]]]) -> None:
+        self.count += 1
+        start, end = segment['timestamp']
+        self.handle.write("\n  " if self.count == 1 else ",\n  ")
+        self.handle.write(json.dumps(
+            {"id": self.count, "start": start, "end": end, "text": segment['text'].strip()},
+            ensure_ascii=False
+        ))
+
+    def end(self) -> None:
+        self.handle.write("\n]}\n" if self.count else "]}\n")
+
+@register_writer("txt")
+class TextWriter(SegmentWriter):
+    """
+    Plain text without timestamps.
+
+    :func:`save_results` writes the result's text as one segment. Streaming
+    mode writes its segments one by one, and segment-level texts joined
+    together are the pipeline's text. Trailing whitespace is held back until
+    the next segment arrives, which strips the text at both ends without
+    buffering it.
+    """
+    suffix = ".txt"
+    timed = False
+
+    def __init__(self, handle: TextIO):
+        super().__init__(handle)
+        self._pending_whitespace = ""
+
+    def write_segment(self, segment: Dict[str, Union[str, List[float]]]) -> None:
+        text = segment['text'] if self.count else segment['text'].lstrip()
+        if not text:
+            return
+        self.count += 1
+        stripped = text.rstrip()
+        self.handle.write(self._pending_whitespace + stripped if stripped else "")
+        self._pending_whitespace = text[len(stripped):] if stripped else self._pending_whitespace + text
+
 class OutputHandler:
     @staticmethod
     def write_vtt(
@@ -18,19 +141,9 @@ class OutputHandler:
             chunks: List of dictionaries containing text and timestamp information
             output_path: Path to the output VTT file
         """
-        try:
-            with output_path.open('w', encoding='utf-8') as f:
-                f.write("WEBVTT\n\n")
-                for i, chunk in enumerate(chunks, start=1):
-                    start_time = OutputHandler._format_timestamp(chunk['timestamp'][0])
-                    end_time = OutputHandler._format_timestamp(chunk['timestamp'][1])
-                    f.write(f"{i}\n")
-                    f.write(f"{start_time} --> {end_time}\n")
-                    f.write(f"{chunk['text'].strip()}\n\n")
-            logger.info(f"VTT file written to {output_path}")
-        except Exception as e:
-            logger.error(f"Failed to write VTT file: {str(e)}")
-            raise
+        with StreamingOutputWriter({"vtt": output_path}, flush=False) as writer:
+            for chunk in OutputHandler.close_segments(chunks, None):
+                writer.write_segment(chunk)
 
     @staticmethod
     def write_text(
@@ -44,45 +157,73 @@ class OutputHandler:
             text: The transcribed/translated text
             output_path: Path to the output text file
         """
-        try:
-            with output_path.open('w', encoding='utf-8') as f:
-                f.write(text.strip())
-            logger.info(f"Text file written to {output_path}")
-        except Exception as e:
-            logger.error(f"Failed to write text file: {str(e)}")
-            raise
+        with StreamingOutputWriter({"txt": output_path}, flush=False) as writer:
+            writer.write_segment({'timestamp': (None, None), 'text': text})
 
     @staticmethod
-    def _format_timestamp(seconds: float) -> str:
+    def close_segments(
+            segments: List[Dict[str, Union[str, List[float]]]],
+            duration: Optional[float]
+    ) -> List[Dict[str, Union[str, List[float]]]]:
         """
-        Format timestamp in HH:MM:SS format.
+        Close a final segment that the pipeline left without an end timestamp.
+
+        The end becomes ``duration``, the length of the audio in seconds, as in
+        streaming mode; without it, the segment's start. Untimed segments and
+        the caller's segments are left as they are.
+
+        Args:
+            segments: Segments of a result
+            duration: Length of the audio in seconds, if known
+
+        Returns:
+            The segments, with a copy of the last one if it was closed
+        """
+        if not segments:
+            return segments
+        start, end = segments[-1]['timestamp']
+        if start is None or end is not None:
+            return segments
+        end = round(duration, 2) if duration is not None else start
+        return segments[:-1] + [{**segments[-1], 'timestamp': (start, max(end, start))}]
+
+    @staticmethod
+    def _format_timestamp(seconds: float, separator: str = ".") -> str:
+        """
+        Format timestamp in HH:MM:SS.mmm format.
 
         Args:
             seconds: Time in seconds
+            separator: Character between seconds and milliseconds ("," for SRT)
 
         Returns:
             Formatted timestamp string
         """
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        seconds = int(seconds % 60)
-        milliseconds = int((seconds % 1) * 1000)
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+        # Whole milliseconds avoid the float error of splitting off the fraction
+        hours, remainder = divmod(round(seconds * 1000), 3_600_000)
+        minutes, remainder = divmod(remainder, 60_000)
+        seconds, milliseconds = divmod(remainder, 1000)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
 
     @staticmethod
     def get_output_paths(
             input_path: Path,
-            output_path: Optional[Path] = None
-    ) -> tuple[Path, Path]:
+            output_path: Optional[Path] = None,
+            formats: Sequence[str] = CONFIG['output'].formats,
+            variant: Optional[str] = None
+    ) -> Dict[str, Path]:
         """
-        Generate output file paths for both VTT and text files.
+        Generate an output file path for every requested format.
 
         Args:
             input_path: Original input file path
             output_path: Optional specified output path
+            formats: Names of registered output formats
+            variant: Label added before the suffix, e.g. "translate" for
+                ``talk.translate.vtt``, when a recording is decoded several ways
 
         Returns:
-            Tuple of (vtt_path, text_path)
+            Dictionary of format name to output path
         """
         if output_path:
             # If output path is specified, use it as a base
@@ -91,33 +232,121 @@ class OutputHandler:
             # Otherwise use input path as a base
             base_path = input_path.parent / input_path.stem
 
-        vtt_path = base_path.with_suffix('.vtt')
-        text_path = base_path.with_suffix('.txt')
+        unknown = [name for name in formats if name not in WRITERS]
+        if unknown:
+            raise ValueError(f"Unknown output format(s): {', '.join(unknown)}")
+        if variant:
+            return {name: base_path.with_name(f"{base_path.name}.{variant}{WRITERS[name].suffix}") for name in formats}
+        return {name: base_path.with_suffix(WRITERS[name].suffix) for name in formats}
+
+class StreamingOutputWriter:
+    """
+    Write segments to every requested output format in one pass.
+
+    Each format has its own buffered file. In streaming mode the files are
+    flushed after every segment, so readers tailing them see captions while
+    the recording is still being transcribed. Use as a context manager.
+    """
+
+    def __init__(
+            self,
+            paths: Dict[str, Path],
+            flush: bool = True,
+            buffer_bytes: int = CONFIG['output'].write_buffer_bytes
+    ):
+        self.paths = paths
+        self.flush = flush
+        self.buffer_bytes = buffer_bytes
+        self._handles: List[TextIO] = []
+        self._writers: List[SegmentWriter] = []
+        self._count = 0
+
+    def __enter__(self) -> "StreamingOutputWriter":
+        try:
+            for name, path in self.paths.items():
+                handle = path.open('w', encoding='utf-8', buffering=self.buffer_bytes)
+                self._handles.append(handle)
+                writer = WRITERS[name](handle)
+                writer.begin()
+                self._writers.append(writer)
+            self._flush()
+        except Exception as e:
+            logger.error(f"Failed to open outputs: {str(e)}")
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        self.close(completed=exc_type is None)
 
-        return vtt_path, text_path
+    def _flush(self) -> None:
+        if self.flush:
+            for handle in self._handles:
+                handle.flush()
+
+    def write_segment(self, segment: Dict[str, Union[str, List[float]]]) -> None:
+        """Append one finished segment to every output."""
+        self._count += 1
+        for writer in self._writers:
+            writer.write_segment(segment)
+        self._flush()
+
+    def close(self, completed: bool = True) -> None:
+        if not self._handles:
+            return
+        try:
+            if completed:
+                for writer in self._writers:
+                    writer.end()
+        finally:
+            for handle in self._handles:
+                handle.close()
+            self._handles = []
+            self._writers = []
+        if completed:
+            logger.info(f"Wrote {self._count} segments to {', '.join(map(str, self.paths.values()))}")
 
 def save_results(
         result: Dict[str, Union[str, List[Dict]]],
         input_path: Path,
-        output_path: Optional[Path] = None
-) -> tuple[Path, Path]:
+        output_path: Optional[Path] = None,
+        formats: Sequence[str] = CONFIG['output'].formats,
+        variant: Optional[str] = None,
+        duration: Optional[float] = None
+) -> Dict[str, Path]:
     """
-    Save processing results in both VTT and text formats.
+    Save processing results in every requested format.
 
     Args:
         result: Dictionary containing processing results
         input_path: Original input file path
         output_path: Optional specified output path
+        formats: Names of registered output formats, e.g. ("vtt", "txt")
+        variant: Label of the language and task the result was decoded for,
+            added to the file names when a recording is decoded several ways
+        duration: Length of the audio in seconds, the end of a final segment
+            that the pipeline left open
 
     Returns:
-        Tuple of paths where results were saved (vtt_path, text_path)
+        Dictionary of format name to the path it was saved to
     """
-    vtt_path, text_path = OutputHandler.get_output_paths(input_path, output_path)
-
-    # Save VTT format with timestamps
-    OutputHandler.write_vtt(result['chunks'], vtt_path)
+    paths = OutputHandler.get_output_paths(input_path, output_path, formats, variant)
+    segments = OutputHandler.close_segments(result['chunks'], duration)
+    timed_paths = {name: path for name, path in paths.items() if WRITERS[name].timed}
+    untimed_paths = {name: path for name, path in paths.items() if not WRITERS[name].timed}
 
-    # Save plain text format
-    OutputHandler.write_text(result['text'], text_path)
+    with METRICS.span("write_output", input=str(input_path), segments=len(segments), formats=list(formats)):
+        try:
+            if timed_paths:
+                with StreamingOutputWriter(timed_paths, flush=False) as writer:
+                    for chunk in segments:
+                        writer.write_segment(chunk)
+            if untimed_paths:
+                # The text as decoded; word chunks joined together need not spell it the same way
+                with StreamingOutputWriter(untimed_paths, flush=False) as writer:
+                    writer.write_segment({'timestamp': (None, None), 'text': result['text']})
+        except Exception as e:
+            logger.error(f"Failed to write outputs: {str(e)}")
+            raise
 
-    return vtt_path, text_path
+    return paths
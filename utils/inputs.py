@@ -0,0 +1,56 @@
+# utils/inputs.py
+from glob import glob
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+from config.settings import CONFIG
+
+MANIFEST_SUFFIXES = {'.txt', '.lst', '.list', '.manifest'}
+
+class InputResolver:
+    """Expansion of the command line's input specifications; kept free of heavy imports."""
+
+    @staticmethod
+    def resolve(specs: Iterable[Union[str, Path]], extensions: Optional[Iterable[str]] = None) -> List[Path]:
+        """
+        Expand input specifications into an ordered list of audio files.
+
+        Each spec may be a single file, a directory (searched recursively for known
+        audio extensions), a glob pattern, or a manifest file listing one path per line.
+        ``extensions`` replaces the audio extensions, e.g. ``(".vtt",)`` to find captions.
+        """
+        kind = "audio files" if extensions is None else "files"
+        extensions = CONFIG['audio'].audio_extensions if extensions is None else tuple(extensions)
+        inputs: List[Path] = []
+
+        for spec in specs:
+            path = Path(spec)
+            if path.is_dir():
+                inputs.extend(sorted(
+                    p for p in path.rglob('*') if p.is_file() and p.suffix.lower() in extensions
+                ))
+            elif path.is_file() and path.suffix.lower() in MANIFEST_SUFFIXES:
+                inputs.extend(InputResolver._read_manifest(path))
+            elif path.exists():
+                inputs.append(path)
+            elif any(char in str(spec) for char in '*?['):
+                inputs.extend(sorted(Path(p) for p in glob(str(spec), recursive=True) if Path(p).is_file()))
+            else:
+                raise FileNotFoundError(f"Input file not found: {path}")
+
+        # Preserve order but drop files listed more than once
+        unique = list(dict.fromkeys(inputs))
+        if not unique:
+            raise FileNotFoundError(f"No {kind} matched: {', '.join(map(str, specs))}")
+        return unique
+
+    @staticmethod
+    def _read_manifest(manifest_path: Path) -> List[Path]:
+        """Read a manifest of audio paths; relative entries are resolved against the manifest."""
+        paths = []
+        for line in manifest_path.read_text(encoding='utf-8').splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = Path(line)
+            paths.append(path if path.is_absolute() else manifest_path.parent / path)
+        return paths
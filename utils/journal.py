@@ -0,0 +1,65 @@
+# utils/journal.py
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class ChunkJournal:
+    """
+    Append-only record of the windows of one job that have been decoded.
+
+    The journal is named after the job's key, a hash of the decoded audio and
+    every parameter that influences the output (the result cache key), so a
+    restarted run of the same job finds it again. Each line holds the token
+    ids and stride of one window, and with word timestamps the time of every
+    token, and is flushed to disk before the next batch runs. A line cut
+    short by a crash is ignored and its window decoded again.
+    """
+
+    def __init__(self, directory: Union[str, Path], key: str):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f"{key}.jsonl"
+
+    def load(self) -> Dict[int, Tuple]:
+        """Return the recorded windows as ``{index: (token ids, stride[, token times])}``."""
+        try:
+            text = self.path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return {}
+
+        complete, _, partial = text.rpartition("\n")
+        if partial:
+            # Cut off a line left unfinished by a crash so new entries start on a fresh line
+            logger.warning(f"Discarding an incomplete journal entry in {self.path}")
+            os.truncate(self.path, len((complete + "\n").encode('utf-8')) if complete else 0)
+
+        done = {}
+        for line in complete.splitlines():
+            entry = json.loads(line)
+            timings = (entry["token_timestamps"],) if "token_timestamps" in entry else ()
+            done[entry["index"]] = (entry["tokens"], tuple(entry["stride"]), *timings)
+        return done
+
+    def append(self, entries: List[Tuple]) -> None:
+        """Durably record decoded windows as (index, token ids, stride[, token times])."""
+        lines = "".join(
+            json.dumps({
+                "index": index,
+                "tokens": tokens,
+                "stride": list(stride),
+                **({"token_timestamps": timings[0]} if timings else {}),
+            }) + "\n"
+            for index, tokens, stride, *timings in entries
+        )
+        with self.path.open('a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def remove(self) -> None:
+        """Delete the journal once the job's outputs have been written."""
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,204 @@
+# utils/metrics.py
+"""
+Per-stage timing spans, counters and their export.
+
+Every span is emitted as one JSON log record on this module's logger, and
+the running totals can be rendered in the Prometheus text exposition format.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import torch
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "whisper_gpu"
+
+def peak_rss_bytes() -> int:
+    """High-water mark of this process's resident memory."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return usage if sys.platform == "darwin" else usage * 1024
+
+def cuda_peak_bytes() -> Optional[int]:
+    """High-water mark of CUDA memory allocated by torch, if CUDA is in use."""
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        return torch.cuda.max_memory_allocated()
+    return None
+
+@dataclass
+class _StageTotals:
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+class Metrics:
+    """Thread-safe registry of stage timings and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, _StageTotals] = {}
+        self._counters: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time a stage and emit it as a structured log record.
+
+        The yielded dict is included in the record, so callers can add values
+        that are only known once the stage has run, such as token counts.
+        Stages are also labelled for ``torch.profiler`` traces.
+
+        Args:
+            stage: Stage name, used as the Prometheus ``stage`` label
+            **fields: Extra values to include in the log record
+
+        Yields:
+            Mutable dict of record fields
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            with torch.profiler.record_function(stage):
+                yield fields
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(stage, elapsed)
+
+            record = {
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "event": "span",
+                "stage": stage,
+                "duration_s": round(elapsed, 6),
+                "peak_rss_bytes": peak_rss_bytes(),
+            }
+            cuda_peak = cuda_peak_bytes()
+            if cuda_peak is not None:
+                record["cuda_peak_bytes"] = cuda_peak
+            if error is not None:
+                record["error"] = str(error)
+            record.update(fields)
+            logger.debug(json.dumps(record, default=str))
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Add a timing to the stage totals without emitting a log record."""
+        with self._lock:
+            totals = self._stages.setdefault(stage, _StageTotals())
+            totals.count += 1
+            totals.seconds += seconds
+            totals.max_seconds = max(totals.max_seconds, seconds)
+
+    def instrument_module(self, module: torch.nn.Module, stage: str) -> None:
+        """
+        Time every forward call of ``module`` into the totals of ``stage``.
+
+        Used for the encoder and decoder, whose calls are too frequent to log
+        one by one. On GPUs kernels run asynchronously, so these times are
+        approximate; use a profiler capture for exact device times.
+        """
+        local = threading.local()
+
+        def before(*_) -> None:
+            local.start = time.perf_counter()
+
+        def after(*_) -> None:
+            self.observe(stage, time.perf_counter() - local.start)
+
+        module.register_forward_pre_hook(before)
+        module.register_forward_hook(after)
+
+    def increment(self, counter: str, value: float = 1) -> None:
+        """Add ``value`` to a monotonically increasing counter."""
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def to_prometheus(self) -> str:
+        """Render the current totals in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {name: _StageTotals(t.count, t.seconds, t.max_seconds) for name, t in self._stages.items()}
+            counters = dict(self._counters)
+
+        lines = [
+            f"# HELP {PREFIX}_stage_duration_seconds Wall time spent in each processing stage.",
+            f"# TYPE {PREFIX}_stage_duration_seconds summary",
+        ]
+        for name, totals in sorted(stages.items()):
+            lines.append(f'{PREFIX}_stage_duration_seconds_sum{{stage="{name}"}} {totals.seconds:.6f}')
+            lines.append(f'{PREFIX}_stage_duration_seconds_count{{stage="{name}"}} {totals.count}')
+        lines += [
+            f"# HELP {PREFIX}_stage_duration_max_seconds Longest single run of each processing stage.",
+            f"# TYPE {PREFIX}_stage_duration_max_seconds gauge",
+        ]
+        for name, totals in sorted(stages.items()):
+            lines.append(f'{PREFIX}_stage_duration_max_seconds{{stage="{name}"}} {totals.max_seconds:.6f}')
+
+        for name, value in sorted(counters.items()):
+            lines += [f"# TYPE {PREFIX}_{name}_total counter", f"{PREFIX}_{name}_total {value:g}"]
+
+        lines += [
+            f"# HELP {PREFIX}_peak_rss_bytes High-water mark of resident memory.",
+            f"# TYPE {PREFIX}_peak_rss_bytes gauge",
+            f"{PREFIX}_peak_rss_bytes {peak_rss_bytes()}",
+        ]
+        cuda_peak = cuda_peak_bytes()
+        if cuda_peak is not None:
+            lines += [
+                f"# HELP {PREFIX}_cuda_peak_allocated_bytes High-water mark of CUDA memory allocated by torch.",
+                f"# TYPE {PREFIX}_cuda_peak_allocated_bytes gauge",
+                f"{PREFIX}_cuda_peak_allocated_bytes {cuda_peak}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Union[str, Path]) -> None:
+        """Atomically write the totals to a file, e.g. for node_exporter's textfile collector."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.to_prometheus(), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+def log_records_to(path: Union[str, Path]) -> None:
+    """Write span records as JSON lines to ``path`` instead of the console log."""
+    handler = logging.FileHandler(path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+
+@contextmanager
+def profile(output_dir: Union[str, Path], row_limit: int = 30) -> Iterator[None]:
+    """
+    Capture a ``torch.profiler`` trace of the enclosed code.
+
+    Writes a Chrome trace (open in chrome://tracing or Perfetto) and a table
+    of the most expensive operators to ``output_dir``.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+    with torch.profiler.profile(activities=activities) as profiler:
+        yield
+
+    profiler.export_chrome_trace(str(output_dir / "trace.json"))
+    sort_by = "self_cuda_time_total" if len(activities) > 1 else "self_cpu_time_total"
+    (output_dir / "operators.txt").write_text(
+        profiler.key_averages().table(sort_by=sort_by, row_limit=row_limit), encoding='utf-8'
+    )
+
+METRICS = Metrics()
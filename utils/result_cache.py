@@ -0,0 +1,111 @@
+# utils/result_cache.py
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import numpy as np
+from utils.disk_budget import DiskBudget
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """
+    Content-addressed store of pipeline results on disk.
+
+    Entries are keyed by a hash of the decoded audio and every parameter that
+    influences the output, so the same clip under a different name is a hit.
+    The least recently used entries are evicted once the total size exceeds
+    ``max_bytes``; a hit refreshes the entry's modification time.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int):
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.budget = DiskBudget(self.directory, '*/*.json', max_bytes, "cache")
+
+    @staticmethod
+    def make_key(
+            audio: np.ndarray,
+            params: Dict[str, Any],
+            release: Optional[Callable[[int], None]] = None,
+            block_samples: int = 1 << 20
+    ) -> str:
+        """
+        Build the cache key for decoded audio and the parameters used to process it.
+
+        Args:
+            audio: Decoded mono samples
+            params: Model name, language, task, generate kwargs and any other
+                option that changes the result
+            release: Called with the number of samples hashed so far after
+                every block, so memory-mapped audio can drop pages behind
+            block_samples: Samples hashed per block
+
+        Returns:
+            Hex digest identifying the result
+        """
+        return ResultCache.make_keys(audio, [params], release, block_samples)[0]
+
+    @staticmethod
+    def make_keys(
+            audio: np.ndarray,
+            params: Sequence[Dict[str, Any]],
+            release: Optional[Callable[[int], None]] = None,
+            block_samples: int = 1 << 20
+    ) -> List[str]:
+        """Build the key of every set of ``params`` for the same audio, which is hashed only once."""
+        digest = hashlib.sha256()
+        for start in range(0, len(audio), block_samples):
+            block = np.ascontiguousarray(audio[start:start + block_samples], dtype=np.float32)
+            digest.update(memoryview(block).cast('B'))
+            if release is not None:
+                release(start + len(block))
+        keys = []
+        for entry in params:
+            key = digest.copy()
+            key.update(json.dumps(entry, sort_keys=True, default=str).encode('utf-8'))
+            keys.append(key.hexdigest())
+        return keys
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for ``key``, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with path.open('r', encoding='utf-8') as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {str(e)}")
+            path.unlink(missing_ok=True)
+            return None
+
+        # Mark as recently used for eviction
+        os.utime(path)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store ``result`` under ``key`` and evict old entries if over budget."""
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_name)
+            replaced = DiskBudget.entry_size(path)
+            os.replace(tmp_name, path)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        self.budget.added(size, replaced)
@@ -0,0 +1,140 @@
+# utils/tiny_checkpoint.py
+"""
+Build a tiny, randomly initialised Whisper checkpoint for offline testing.
+
+The tokenizer is a byte-level vocabulary with Whisper's special and timestamp
+tokens, so language/task prompts, timestamp decoding and stitching behave as
+they do with the real models. Transcripts are meaningless.
+
+Usage:
+    python -m utils.tiny_checkpoint /tmp/tiny-whisper
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Union
+import torch
+from transformers import (
+    GenerationConfig,
+    WhisperConfig,
+    WhisperFeatureExtractor,
+    WhisperForConditionalGeneration,
+    WhisperProcessor,
+    WhisperTokenizer,
+)
+from transformers.models.whisper.tokenization_whisper import LANGUAGES
+
+logger = logging.getLogger(__name__)
+
+NUM_TIMESTAMP_TOKENS = 1501
+
+def _byte_vocabulary() -> Dict[str, int]:
+    """GPT-2 style byte-to-unicode table, one token per byte and no merges."""
+    printable = (
+        list(range(ord("!"), ord("~") + 1))
+        + list(range(ord("¡"), ord("¬") + 1))
+        + list(range(ord("®"), ord("ÿ") + 1))
+    )
+    codepoints = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            codepoints.append(256 + extra)
+            extra += 1
+    return {chr(codepoint): index for index, codepoint in enumerate(codepoints)}
+
+def create_tiny_checkpoint(
+        output_dir: Union[str, Path],
+        d_model: int = 16,
+        layers: int = 1,
+        seed: int = 0
+) -> Path:
+    """
+    Write a tiny Whisper model, processor and generation config to ``output_dir``.
+
+    Args:
+        output_dir: Directory to write the checkpoint to
+        d_model: Hidden size of the encoder and decoder
+        layers: Number of encoder and decoder layers
+        seed: Seed for the random weights
+
+    Returns:
+        The checkpoint directory
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    vocab = _byte_vocabulary()
+    special_tokens = (
+        ["<|startoftranscript|>"]
+        + [f"<|{code}|>" for code in LANGUAGES]
+        + ["<|translate|>", "<|transcribe|>", "<|startoflm|>", "<|startofprev|>", "<|nospeech|>", "<|notimestamps|>"]
+    )
+
+    tokenizer = WhisperTokenizer(vocab=vocab, merges=[], pad_token="<|endoftext|>")
+    tokenizer.add_special_tokens({"additional_special_tokens": special_tokens})
+    tokenizer.add_tokens([f"<|{i * 0.02:.2f}|>" for i in range(NUM_TIMESTAMP_TOKENS)])
+    processor = WhisperProcessor(feature_extractor=WhisperFeatureExtractor(feature_size=80), tokenizer=tokenizer)
+
+    token_id = tokenizer.convert_tokens_to_ids
+    eos_id = token_id("<|endoftext|>")
+    start_id = token_id("<|startoftranscript|>")
+
+    config = WhisperConfig(
+        vocab_size=len(tokenizer),
+        num_mel_bins=80,
+        d_model=d_model,
+        encoder_layers=layers,
+        decoder_layers=layers,
+        encoder_attention_heads=2,
+        decoder_attention_heads=2,
+        encoder_ffn_dim=d_model * 2,
+        decoder_ffn_dim=d_model * 2,
+        max_source_positions=1500,
+        max_target_positions=448,
+        decoder_start_token_id=start_id,
+        pad_token_id=eos_id,
+        bos_token_id=eos_id,
+        eos_token_id=eos_id,
+    )
+
+    torch.manual_seed(seed)
+    model = WhisperForConditionalGeneration(config)
+    model.generation_config = GenerationConfig(
+        decoder_start_token_id=start_id,
+        bos_token_id=eos_id,
+        eos_token_id=eos_id,
+        pad_token_id=eos_id,
+        max_length=448,
+        lang_to_id={f"<|{code}|>": token_id(f"<|{code}|>") for code in LANGUAGES},
+        task_to_id={"transcribe": token_id("<|transcribe|>"), "translate": token_id("<|translate|>")},
+        no_timestamps_token_id=token_id("<|notimestamps|>"),
+        prev_sot_token_id=token_id("<|startofprev|>"),
+        is_multilingual=True,
+        max_initial_timestamp_index=50,
+        suppress_tokens=[],
+        begin_suppress_tokens=[eos_id],
+        alignment_heads=[[layers - 1, 0]],
+        forced_decoder_ids=None,
+    )
+
+    model.save_pretrained(output_dir)
+    processor.save_pretrained(output_dir)
+    (output_dir / "tiny_checkpoint.json").write_text(
+        json.dumps({"d_model": d_model, "layers": layers, "seed": seed}), encoding='utf-8'
+    )
+    logger.info(f"Tiny Whisper checkpoint written to {output_dir}")
+    return output_dir
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a tiny random Whisper checkpoint for offline tests")
+    parser.add_argument("output", type=Path, help="Directory to write the checkpoint to")
+    parser.add_argument("--d-model", type=int, default=16, help="Hidden size")
+    parser.add_argument("--layers", type=int, default=1, help="Encoder and decoder layers")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the weights")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    create_tiny_checkpoint(args.output, args.d_model, args.layers, args.seed)
@@ -0,0 +1,401 @@
+# utils/transcript_index.py
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import logging
+import os
+import re
+import sqlite3
+from config.settings import CONFIG
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    model TEXT NOT NULL DEFAULT '',
+    language TEXT NOT NULL DEFAULT '',
+    task TEXT NOT NULL DEFAULT '',
+    indexed_at TEXT NOT NULL,
+    UNIQUE (source, model, language, task)
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    transcript_id INTEGER NOT NULL REFERENCES transcripts (id),
+    start_ms INTEGER,
+    end_ms INTEGER,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_by_time ON segments (transcript_id, start_ms);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Punctuation that ends a sentence, and so a segment regrouped from words
+SENTENCE_END = ('.', '!', '?', '。', '！', '？')
+
+TASKS = ("transcribe", "translate")
+
+# A cue timing line: HH:MM:SS.mmm or MM:SS.mmm on each side, optionally followed by cue settings
+CUE_TIMING = re.compile(r"^\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})")
+
+class TranscriptIndex:
+    """
+    SQLite database of transcript segments with a full-text index.
+
+    Every transcript is stored once per source file, model, language and task;
+    indexing the same combination again replaces its segments. Segments keep
+    their times in integer milliseconds, with an index for time-range queries,
+    and their text is indexed by an FTS5 table. The segments of a transcript
+    are written in one transaction, and an import of many files commits every
+    ``batch_files`` files. Use as a context manager.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        try:
+            # WAL lets searches run while a batch job keeps indexing
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            self.connection.close()
+            if "fts5" in str(e):
+                raise RuntimeError("The transcript index needs an SQLite build with FTS5") from e
+            raise RuntimeError(f"Cannot open the transcript index {self.path}: {str(e)}") from e
+
+    def __enter__(self) -> "TranscriptIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    @staticmethod
+    def _milliseconds(seconds: Optional[float]) -> Optional[int]:
+        return None if seconds is None else round(seconds * 1000)
+
+    def _insert(
+            self,
+            source: str,
+            segments: Sequence[Dict[str, Any]],
+            model: Optional[str],
+            language: Optional[str],
+            task: Optional[str]
+    ) -> int:
+        key = (source, model or "", language or "", task or "")
+        row = self.connection.execute(
+            "SELECT id FROM transcripts WHERE source = ? AND model = ? AND language = ? AND task = ?", key
+        ).fetchone()
+        if row is not None:
+            self.connection.execute("DELETE FROM segments WHERE transcript_id = ?", row)
+            self.connection.execute("DELETE FROM transcripts WHERE id = ?", row)
+        transcript_id = self.connection.execute(
+            "INSERT INTO transcripts (source, model, language, task, indexed_at) VALUES (?, ?, ?, ?, ?)",
+            (*key, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        ).lastrowid
+        rows = [
+            (transcript_id, self._milliseconds(segment['timestamp'][0]),
+             self._milliseconds(segment['timestamp'][1]), segment['text'].strip())
+            for segment in segments
+            if segment['text'].strip()
+        ]
+        self.connection.executemany(
+            "INSERT INTO segments (transcript_id, start_ms, end_ms, text) VALUES (?, ?, ?, ?)", rows
+        )
+        return len(rows)
+
+    def add(
+            self,
+            source: Union[str, Path],
+            result: Dict[str, Any],
+            model: Optional[str] = None,
+            language: Optional[str] = None,
+            task: Optional[str] = None
+    ) -> int:
+        """
+        Index the segments of one transcription result in a single transaction.
+
+        Args:
+            source: Input file the result was transcribed from
+            result: ``{'text', 'chunks'}`` result as passed to ``save_results``;
+                a result without chunks is indexed as one untimed segment
+            model: Model the result was decoded with
+            language: Language code of the result
+            task: Task of the result (transcribe or translate)
+
+        Returns:
+            Number of segments indexed
+        """
+        segments = result['chunks']
+        if not segments and result['text']:
+            segments = [{'timestamp': (None, None), 'text': result['text']}]
+        with self.connection:
+            return self._insert(str(source), segments, model, language, task)
+
+    @staticmethod
+    def group_words(
+            words: Sequence[Dict[str, Any]],
+            max_gap_s: float = CONFIG['index'].word_segment_gap_s,
+            max_duration_s: float = CONFIG['index'].word_segment_max_s
+    ) -> List[Dict[str, Any]]:
+        """
+        Regroup the word chunks of a ``--timestamps word`` result into segments.
+
+        Searches match the words of one segment, so a result indexed word by
+        word could never match more than one word. A segment ends after a
+        word that ends a sentence, before a pause longer than ``max_gap_s``,
+        and before a word that would make it longer than ``max_duration_s``.
+
+        Args:
+            words: Word chunks, each with a (start, end) timestamp in seconds
+            max_gap_s: Longest pause inside one segment
+            max_duration_s: Longest segment
+
+        Returns:
+            Segments with the concatenated text and the span of their words
+        """
+        segments: List[Dict[str, Any]] = []
+        current: List[Dict[str, Any]] = []
+
+        def close() -> None:
+            start = current[0]['timestamp'][0]
+            end = next((w['timestamp'][1] for w in reversed(current) if w['timestamp'][1] is not None), None)
+            segments.append({'timestamp': (start, end), 'text': "".join(w['text'] for w in current)})
+            current.clear()
+
+        for word in words:
+            start = word['timestamp'][0]
+            if current and start is not None:
+                first = current[0]['timestamp'][0]
+                last = current[-1]['timestamp'][1]
+                if (last is not None and start - last > max_gap_s) or (
+                        first is not None and (word['timestamp'][1] or start) - first > max_duration_s):
+                    close()
+            current.append(word)
+            if word['text'].strip().endswith(SENTENCE_END):
+                close()
+        if current:
+            close()
+        return segments
+
+    @staticmethod
+    def _seconds(timestamp: str) -> float:
+        """Seconds of a ``HH:MM:SS.mmm`` or ``MM:SS.mmm`` cue time."""
+        *hours, minutes, seconds = timestamp.replace(",", ".").split(":")
+        return int(hours[0] if hours else 0) * 3600 + int(minutes) * 60 + float(seconds)
+
+    @staticmethod
+    def read_vtt(path: Union[str, Path]) -> List[Dict[str, Any]]:
+        """Read the cues of a WebVTT file as segments with times in seconds."""
+        segments = []
+        blocks = re.split(r"\n\s*\n", Path(path).read_text(encoding='utf-8-sig').replace("\r\n", "\n"))
+        for block in blocks:
+            lines = block.strip().split("\n")
+            for i, line in enumerate(lines):
+                timing = CUE_TIMING.match(line)
+                if timing:
+                    text = " ".join(part.strip() for part in lines[i + 1:] if part.strip())
+                    segments.append({
+                        'timestamp': (TranscriptIndex._seconds(timing.group(1)),
+                                      TranscriptIndex._seconds(timing.group(2))),
+                        'text': text,
+                    })
+                    break
+        return segments
+
+    @staticmethod
+    def find_audio(
+            vtt_path: Path,
+            audio_root: Optional[Path] = None,
+            transcript_root: Optional[Path] = None
+    ) -> Tuple[Optional[Path], List[str]]:
+        """
+        Find the recording a VTT file was transcribed from.
+
+        The recording is looked for next to the VTT file, where transcription
+        writes its outputs by default. With ``audio_root``, it is looked for
+        at the VTT's path relative to ``transcript_root`` under ``audio_root``
+        instead, which inverts the mirroring of a run with several inputs and
+        ``--output``. The recording is an audio file with the VTT's stem; for
+        outputs of several variants, such as ``talk.de.translate.vtt``, the
+        labels after the stem are dropped one by one until a file matches.
+
+        Args:
+            vtt_path: Resolved path of the VTT file
+            audio_root: Directory holding the recordings
+            transcript_root: Directory the VTT paths are taken relative to
+
+        Returns:
+            Tuple of (the resolved recording or None, the variant labels dropped to find it)
+        """
+        directory = vtt_path.parent
+        if audio_root is not None:
+            if not vtt_path.is_relative_to(transcript_root):
+                return None, []
+            directory = audio_root / vtt_path.parent.relative_to(transcript_root)
+        extensions = CONFIG['audio'].audio_extensions
+        stem = vtt_path.stem
+        labels: List[str] = []
+        while True:
+            for extension in extensions:
+                candidate = directory / f"{stem}{extension}"
+                if candidate.is_file():
+                    return candidate.resolve(), labels
+            if "." not in stem:
+                return None, []
+            stem, label = stem.rsplit(".", 1)
+            labels.insert(0, label)
+
+    def import_vtt(
+            self,
+            paths: Iterable[Path],
+            model: Optional[str] = None,
+            language: Optional[str] = None,
+            task: Optional[str] = None,
+            batch_files: int = CONFIG['index'].batch_files,
+            audio_root: Optional[Path] = None,
+            transcript_root: Optional[Path] = None
+    ) -> Tuple[int, int]:
+        """
+        Index existing WebVTT files, committing every ``batch_files`` files.
+
+        Each file is indexed under the resolved path of the recording it was
+        transcribed from, as found by :meth:`find_audio`, which is the source
+        a transcription with ``--index`` uses. Indexing the recording again
+        with the same model, language and task then replaces the imported
+        segments. A variant label dropped to find the recording gives the
+        task, if it is one, or else the language, unless they are given. A
+        VTT file without a recording is indexed under its own path, and one
+        that cannot be read is logged and skipped.
+
+        Args:
+            paths: VTT files to import
+            model: Model the transcripts were made with
+            language: Language of the transcripts
+            task: Task of the transcripts
+            batch_files: Files added per transaction
+            audio_root: Directory holding the recordings, see :meth:`find_audio`
+            transcript_root: Directory the VTT paths are taken relative to with
+                ``audio_root``; by default the deepest directory holding them all
+
+        Returns:
+            Tuple of (files indexed, segments indexed)
+        """
+        paths = [Path(path).resolve() for path in paths]
+        if audio_root is not None:
+            audio_root = Path(audio_root).resolve()
+            transcript_root = (Path(transcript_root).resolve() if transcript_root is not None
+                               else Path(os.path.commonpath([path.parent for path in paths])))
+        files = 0
+        segments = 0
+        pending = 0
+        try:
+            for path in paths:
+                try:
+                    cues = self.read_vtt(path)
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.warning(f"Skipping {path}: {str(e)}")
+                    continue
+                audio, labels = self.find_audio(path, audio_root, transcript_root)
+                file_task, file_language = task, language
+                for label in labels:
+                    if label in TASKS:
+                        file_task = file_task or label
+                    else:
+                        file_language = file_language or label
+                if audio is None:
+                    logger.warning(f"No recording found for {path}; indexing it under its own path")
+                segments += self._insert(str(audio or path), cues, model, file_language, file_task)
+                files += 1
+                pending += 1
+                if pending >= batch_files:
+                    self.connection.commit()
+                    logger.info(f"Indexed {files} files, {segments} segments")
+                    pending = 0
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return files, segments
+
+    def search(
+            self,
+            query: Optional[str] = None,
+            source: Optional[str] = None,
+            model: Optional[str] = None,
+            language: Optional[str] = None,
+            task: Optional[str] = None,
+            start_ms: Optional[int] = None,
+            end_ms: Optional[int] = None,
+            limit: int = CONFIG['index'].search_limit,
+            raw: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Find segments by text and time.
+
+        Args:
+            query: Words that must all occur in a segment, or with ``raw`` an
+                FTS5 query (phrases in double quotes, OR, NOT, NEAR, prefix*);
+                None matches every segment
+            source: Only segments of this source file; ``*`` and ``?`` are wildcards
+            model: Only segments decoded with this model
+            language: Only segments in this language
+            task: Only segments of this task
+            start_ms: Only segments that end at or after this time
+            end_ms: Only segments that start at or before this time
+            limit: Maximum number of segments returned
+            raw: Pass ``query`` to FTS5 as it is
+
+        Returns:
+            Matching segments, best matches first when there is a query and in
+            source and time order otherwise
+        """
+        conditions = []
+        params: List[Any] = []
+        if source is not None:
+            conditions.append("t.source GLOB ?")
+            params.append(source)
+        for column, value in (("model", model), ("language", language), ("task", task)):
+            if value is not None:
+                conditions.append(f"t.{column} = ?")
+                params.append(value)
+        if start_ms is not None:
+            conditions.append("COALESCE(s.end_ms, s.start_ms) >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            conditions.append("s.start_ms <= ?")
+            params.append(end_ms)
+
+        columns = "t.source, t.model, t.language, t.task, s.start_ms, s.end_ms, s.text"
+        if query:
+            match = query if raw else " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+            sql = (f"SELECT {columns} FROM segments_fts f JOIN segments s ON s.id = f.rowid "
+                   f"JOIN transcripts t ON t.id = s.transcript_id "
+                   f"WHERE segments_fts MATCH ?{''.join(' AND ' + c for c in conditions)} "
+                   f"ORDER BY f.rank, t.source, s.start_ms LIMIT ?")
+            params = [match, *params, limit]
+        else:
+            sql = (f"SELECT {columns} FROM segments s JOIN transcripts t ON t.id = s.transcript_id"
+                   f"{' WHERE ' + ' AND '.join(conditions) if conditions else ''} "
+                   f"ORDER BY t.source, s.start_ms LIMIT ?")
+            params.append(limit)
+
+        try:
+            rows = self.connection.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query {query!r}: {str(e)}") from e
+        keys = ("source", "model", "language", "task", "start_ms", "end_ms", "text")
+        return [dict(zip(keys, row)) for row in rows]
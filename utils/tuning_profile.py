@@ -0,0 +1,74 @@
+# utils/tuning_profile.py
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+import json
+import logging
+import os
+import re
+import socket
+import tempfile
+from config.settings import CONFIG
+
+logger = logging.getLogger(__name__)
+
+class TuningProfile:
+    """
+    Batch size chosen by ``main.py autotune`` for one host, model, device and precision.
+
+    Profiles are small JSON files named after the host and the model, so a
+    cache directory shared between machines keeps one profile per machine.
+    """
+
+    @staticmethod
+    def path_for(
+            model_name: str,
+            device: str,
+            precision: str,
+            directory: Union[str, Path] = CONFIG['tuning'].profile_directory
+    ) -> Path:
+        """Location of the profile for ``model_name`` on this host."""
+        slug = re.sub(r"[^A-Za-z0-9.]+", "-", f"{model_name}-{device}-{precision}").strip("-")
+        return Path(directory).expanduser() / f"{socket.gethostname()}-{slug}.json"
+
+    @classmethod
+    def load(
+            cls,
+            model_name: str,
+            device: str,
+            precision: str,
+            directory: Union[str, Path] = CONFIG['tuning'].profile_directory
+    ) -> Optional[Dict[str, Any]]:
+        """Return the saved profile, or None if this combination has not been tuned here."""
+        path = cls.path_for(model_name, device, precision, directory)
+        try:
+            profile = json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable tuning profile {path}: {str(e)}")
+            return None
+        if not isinstance(profile.get("batch_size"), int) or profile["batch_size"] < 1:
+            logger.warning(f"Ignoring tuning profile {path} without a valid batch size")
+            return None
+        return profile
+
+    @classmethod
+    def save(
+            cls,
+            profile: Dict[str, Any],
+            directory: Union[str, Path] = CONFIG['tuning'].profile_directory
+    ) -> Path:
+        """Write ``profile`` for its model, device and precision and return its path."""
+        path = cls.path_for(profile["model"], profile["device"], profile["precision"], directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so a concurrent run never reads half a profile
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(profile, f, indent=2)
+            os.replace(tmp_name, path)
+        except Exception:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return path